@@ -1,16 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from typing import Dict, Hashable, List, Optional
 from app.models.chat import ChatMessage, ChatResponse
-from app.services.gemini_service import GeminiService, get_gemini_service
-from app.services.rag_service import RAGService
+from app.services.gemini_service import FALLBACK_RESPONSES, GeminiService, get_gemini_service
+from app.services.partitions import normalize_filter
+from app.services.rag_service import RAGService, get_rag_service, get_rag_service_provider
+from app.services.response_cache import create_response_cache
+from app.services.safety import is_flagged
+from app.services.session_store import create_session_store
 from app.core.config import Settings
+import json
 import logging
 import sqlite3
 from datetime import datetime
 
 router = APIRouter()
 settings = Settings()
-rag_service = RAGService(settings)
+session_store = create_session_store(settings)
+response_cache = create_response_cache(settings)
 
 # Ensure feedback table exists
 conn = sqlite3.connect('feedback.db')
@@ -25,10 +32,122 @@ c.execute('''CREATE TABLE IF NOT EXISTS feedback (
 conn.commit()
 conn.close()
 
+def _build_gemini_input(user_message: str, context_chunks: List[Dict]) -> str:
+    """
+    Compose the message sent to Gemini from the user's message and retrieved context.
+
+    Args:
+        user_message (str): The user's message.
+        context_chunks (List[Dict]): Chunks returned by the RAG service.
+
+    Returns:
+        str: The model input.
+    """
+    context_text = ""
+    for i, chunk in enumerate(context_chunks, 1):
+        title = chunk.get('source', '')
+        context_text += f"[{i}] {chunk['text']} (Source: {title})\n"
+    if not context_text:
+        return user_message
+    return (
+        f"Context from therapy guides:\n{context_text}\n"
+        "Use the above context to answer the user's question. "
+        "If the context is not relevant, answer from your own knowledge.\n\n"
+        f"User: {user_message}"
+    )
+
+def _retrieval_filter(message: ChatMessage) -> Optional[Dict]:
+    """
+    Metadata filter for a request: its own filter, with the persona's default
+    corpora (PERSONA_SOURCE_TYPES) when it names none.
+    """
+    requested = message.filter
+    types = requested.types if requested and requested.types else settings.PERSONA_SOURCE_TYPES.get(message.persona)
+    filter = {}
+    if types:
+        filter["type"] = types
+    if requested and requested.sources:
+        filter["source"] = requested.sources
+    return filter or None
+
+async def _retrieve_context(rag_service: RAGService, message: ChatMessage) -> List[Dict]:
+    """
+    Retrieve the chunks for the prompt: RAG_TOP_K of them, or the RERANK_TOP_K
+    best after cross-encoder reranking when it is enabled, then merged,
+    deduplicated and trimmed to CONTEXT_MAX_TOKENS.
+    """
+    top_k = settings.RERANK_TOP_K if rag_service.reranker is not None else settings.RAG_TOP_K
+    matches = await rag_service.aquery(message.message, top_k=top_k, filter=_retrieval_filter(message))
+    return await rag_service.aassemble_context(message.message, matches)
+
+def _response_cache_key(message: ChatMessage, history: list) -> Optional[Hashable]:
+    """
+    Key of the semantic response cache for a request, or None when the request
+    must not use it: the cache is disabled, the conversation is past
+    RESPONSE_CACHE_MAX_HISTORY turns, or the message is flagged by the safety check.
+    """
+    if response_cache.max_size <= 0 or len(history) > settings.RESPONSE_CACHE_MAX_HISTORY:
+        return None
+    if is_flagged(message.message):
+        return None
+    return message.persona, normalize_filter(_retrieval_filter(message))
+
+async def _cached_response(rag_service: RAGService, message: ChatMessage, history: list) -> tuple:
+    """
+    Look the message up in the semantic response cache.
+
+    Returns:
+        tuple: (cache key, message embedding, cached response); the key is None
+        when the cache does not apply and the response is None on a miss
+    """
+    key = _response_cache_key(message, history)
+    if key is None:
+        return None, None, None
+    # Shared with retrieval through the embedding cache, so a miss costs no extra encode
+    embedding = await rag_service.aembed_query(message.message)
+    return key, embedding, response_cache.get(key, embedding)
+
+def _cache_response(key: Optional[Hashable], embedding, response_text: str) -> None:
+    if key is not None and response_text not in FALLBACK_RESPONSES:
+        response_cache.set(key, embedding, response_text)
+
+def _resolve_session(message: ChatMessage) -> tuple:
+    """
+    Look up the conversation history for a request.
+
+    Known sessions use the server-side history. Requests without a session id,
+    or with one that is unknown or expired, start a new session seeded with any
+    history the client sent. New session ids are always issued by the server, so
+    a client cannot choose the id of a session (session fixation).
+
+    Args:
+        message (ChatMessage): The user's message.
+
+    Returns:
+        tuple: (session_id, history)
+    """
+    if message.session_id:
+        history = session_store.get_history(message.session_id)
+        if history is not None:
+            return message.session_id, history
+    session_id = session_store.new_session_id()
+    history = [{"role": "user", "text": text} for text in message.history]
+    if history:
+        session_store.append(session_id, history)
+    return session_id, history
+
+def _record_turn(session_id: str, user_message: str, response_text: str) -> None:
+    """Append the latest user/model exchange to the session."""
+    session_store.append(session_id, [
+        {"role": "user", "text": user_message},
+        {"role": "model", "text": response_text},
+    ])
+
 @router.post("/chat", response_model=ChatResponse, tags=["Chat"])
 async def chat_with_bot(
     message: ChatMessage,
     gemini_service: GeminiService = Depends(get_gemini_service),
+    rag_service: RAGService = Depends(get_rag_service),
 ) -> ChatResponse:
     """
     Main chat endpoint to interact with the chatbot.
@@ -36,39 +155,114 @@ async def chat_with_bot(
     Args:
         message (ChatMessage): The user's message.
         gemini_service (GeminiService): The Gemini service dependency.
+        rag_service (RAGService): The retrieval service dependency.
 
 
     Returns:
         ChatResponse: The chatbot's response.
     """
     try:
-        # 1. Query RAG for context
-        context_chunks = rag_service.query(message.message, top_k=5)
-        context_text = ""
-        for i, chunk in enumerate(context_chunks, 1):
-            title = chunk.get('source', '')
-            context_text += f"[{i}] {chunk['text']} (Source: {title})\n"
-        # 2. Compose the message for Gemini
-        if context_text:
-            gemini_input = (
-                f"Context from therapy guides:\n{context_text}\n"
-                "Use the above context to answer the user's question. "
-                "If the context is not relevant, answer from your own knowledge.\n\n"
-                f"User: {message.message}"
+        session_id, history = _resolve_session(message)
+        # 0. Reuse the answer to a near-identical opening message
+        cache_key, embedding, response_text = await _cached_response(rag_service, message, history)
+        if response_text is None:
+            # 1. Query RAG for context
+            context_chunks = await _retrieve_context(rag_service, message)
+            # 2. Compose the message for Gemini
+            gemini_input = _build_gemini_input(message.message, context_chunks)
+            # 3. Call Gemini
+            response_text = await gemini_service.generate_response(
+                message=gemini_input,
+                history=history,
+                persona=message.persona
             )
-        else:
-            gemini_input = message.message
-        # 3. Call Gemini
-        response_text = await gemini_service.generate_response(
-            message=gemini_input,
-            history=message.history,
-            persona=message.persona
-        )
-        return ChatResponse(response=response_text)
+            _cache_response(cache_key, embedding, response_text)
+        _record_turn(session_id, message.message, response_text)
+        return ChatResponse(response=response_text, session_id=session_id)
     except Exception as e:
         logging.error(f"Error in chat endpoint: {e}")
         raise HTTPException(status_code=500, detail="An internal error occurred.")
 
+@router.post("/chat/stream", tags=["Chat"])
+async def chat_stream(
+    message: ChatMessage,
+    gemini_service: GeminiService = Depends(get_gemini_service),
+    rag_service: RAGService = Depends(get_rag_service),
+) -> StreamingResponse:
+    """
+    Streaming variant of the chat endpoint using Server-Sent Events.
+
+    Each model fragment is sent as ``data: {"token": "..."}`` and the stream
+    ends with an ``event: done`` message. The session id is returned in the
+    ``X-Session-Id`` header.
+
+    Args:
+        message (ChatMessage): The user's message.
+        gemini_service (GeminiService): The Gemini service dependency.
+        rag_service (RAGService): The retrieval service dependency.
+
+    Returns:
+        StreamingResponse: A ``text/event-stream`` of response tokens.
+    """
+    try:
+        session_id, history = _resolve_session(message)
+        cache_key, embedding, cached = await _cached_response(rag_service, message, history)
+        if cached is None:
+            context_chunks = await _retrieve_context(rag_service, message)
+            gemini_input = _build_gemini_input(message.message, context_chunks)
+    except Exception as e:
+        logging.error(f"Error in chat stream endpoint: {e}")
+        raise HTTPException(status_code=500, detail="An internal error occurred.")
+
+    async def event_stream():
+        if cached is not None:
+            # A cache hit is sent as a single fragment
+            yield f"data: {json.dumps({'token': cached})}\n\n"
+            _record_turn(session_id, message.message, cached)
+            yield "event: done\ndata: {}\n\n"
+            return
+        tokens = []
+        fallback = None
+        async for token in gemini_service.stream_response(
+            message=gemini_input,
+            history=history,
+            persona=message.persona
+        ):
+            if token in FALLBACK_RESPONSES:
+                # The model failed or said nothing: the client is told, but it is not part of the reply
+                fallback = token
+            else:
+                tokens.append(token)
+            yield f"data: {json.dumps({'token': token})}\n\n"
+        response_text = "".join(tokens)
+        if fallback is None:
+            _cache_response(cache_key, embedding, response_text)
+        _record_turn(session_id, message.message, response_text or fallback)
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Session-Id": session_id},
+    )
+
+@router.get("/metrics", tags=["Metrics"])
+async def metrics_endpoint(request: Request):
+    """
+    Runtime metrics for the retrieval pipeline (embedding batches, cache hit rates).
+    Does not load the retrieval service if it is not loaded yet.
+
+    Returns:
+        dict: Metrics keyed by component.
+    """
+    provider = get_rag_service_provider(request.app)
+    service = provider.service
+    metrics = service.stats() if service is not None else {}
+    metrics["response_cache"] = response_cache.stats()
+    metrics["rag_status"] = provider.status()
+    metrics["rag_load_seconds"] = provider.load_seconds
+    return metrics
+
 @router.post("/feedback", tags=["Feedback"])
 async def feedback_endpoint(request: Request):
     data = await request.json()
@@ -1,13 +1,97 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     """
     Application settings, loaded from environment variables.
     """
     GEMINI_API_KEY: str
-    PINECONE_API_KEY: str
+    PINECONE_API_KEY: Optional[str] = None  # Only required for the pinecone backend
     PINECONE_ENV: str = "gcp-starter"  # Default to free tier environment
+    PINECONE_INDEX_NAME: str = "therapy-knowledge"
+
+    # Vector store
+    VECTOR_STORE_BACKEND: str = "pinecone"  # "pinecone" or "local"
+    LOCAL_INDEX_DIR: str = "vector_index"
+    LOCAL_INDEX_NLIST: int = 0  # IVF clusters for the local index, 0 = exact search
+    LOCAL_INDEX_NPROBE: int = 8  # IVF clusters scanned per query
+
+    # Embedding model
+    EMBEDDING_BACKEND: str = "torch"  # "torch" (SentenceTransformer fp32) or "onnx" (int8 ONNX Runtime)
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    ONNX_MODEL_DIR: str = "models/all-MiniLM-L6-v2-onnx"  # Written by scripts/export_onnx_embedder.py
+    ONNX_MODEL_FILE: str = "model_int8.onnx"
+    ONNX_THREADS: int = 0  # Intra-op threads, 0 = ONNX Runtime default
+
+    # Retrieval
+    RAG_WARMUP: bool = True  # Load the RAG service in the background at startup (else on first request)
+    RAG_WORKER_THREADS: int = 4  # Bounded pool for query embedding off the event loop
+    EMBED_BATCHING_ENABLED: bool = True  # Coalesce concurrent query embeddings
+    EMBED_BATCH_MAX_SIZE: int = 32
+    EMBED_BATCH_MAX_WAIT_MS: float = 5.0
+    QUERY_CACHE_SIZE: int = 1024  # Entries per cache (embeddings, results); 0 disables
+    QUERY_CACHE_TTL_SECONDS: float = 3600.0
+    RETRIEVAL_MODE: str = "hybrid"  # "dense", "sparse" (BM25) or "hybrid" (both, fused by reciprocal rank)
+    LEXICAL_INDEX_DIR: str = "lexical_index"  # BM25 index built alongside the vectors during ingestion
+    HYBRID_CANDIDATES: int = 20  # Results per ranking fused in hybrid mode
+    RRF_K: int = 60  # Reciprocal rank fusion constant
+    RAG_TOP_K: int = 5  # Chunks put into the chat prompt
+    PERSONA_SOURCE_TYPES: Dict[str, List[str]] = {}  # Corpora a persona searches by default, e.g. {"professional": ["pdf", "web"]}
+    RERANK_ENABLED: bool = False  # Retrieve RERANK_CANDIDATES, keep the RERANK_TOP_K a cross-encoder ranks best
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 50  # Scored in one batched forward pass
+    RERANK_TOP_K: int = 3  # Replaces RAG_TOP_K when reranking
+    RERANK_MAX_LENGTH: int = 256  # Query + chunk tokens per pair
+    RERANK_TIMEOUT_MS: float = 150.0  # Budget per request; on timeout the retrieval order is kept
+    CONTEXT_ASSEMBLY_ENABLED: bool = True  # Merge overlapping chunks, drop repeats (MMR), trim to CONTEXT_MAX_TOKENS
+    CONTEXT_MAX_TOKENS: int = 1000  # Retrieved context in the prompt
+    CONTEXT_MMR_LAMBDA: float = 0.7  # 1 = relevance only, lower favours diverse chunks
+    CONTEXT_DUPLICATE_THRESHOLD: float = 0.92  # Cosine similarity at which a chunk repeats another
+
+    # Gemini
+    GEMINI_MAX_CONCURRENCY: int = 16  # Concurrent model calls per process
+    GEMINI_SHUTDOWN_TIMEOUT_SECONDS: float = 30.0
+    CONTEXT_TOKEN_BUDGET: int = 8000  # Persona prompt + RAG context + message + history
+    HISTORY_RECENT_TURNS: int = 10  # Newest turns kept verbatim
+    HISTORY_SUMMARY_MAX_TOKENS: int = 400  # Rolling summary of older turns
+
+    # Semantic response cache (whole chat pipeline, first turns only)
+    RESPONSE_CACHE_SIZE: int = 512  # Cached responses, 0 disables
+    RESPONSE_CACHE_TTL_SECONDS: float = 86400.0
+    RESPONSE_CACHE_THRESHOLD: float = 0.95  # Cosine similarity of message embeddings to reuse a response
+    RESPONSE_CACHE_MAX_HISTORY: int = 0  # Turns of history a request may have and still use the cache
+
+    # Conversation sessions
+    SESSION_BACKEND: str = "memory"  # "memory", "sqlite" or "redis"
+    SESSION_DB_PATH: str = "sessions.db"
+    SESSION_REDIS_URL: str = "redis://localhost:6379/0"
+    SESSION_TTL_SECONDS: float = 86400.0
+    SESSION_MAX_SESSIONS: int = 10000  # In-memory backend only
+
+    # Ingestion
+    INGEST_WORKERS: int = 0  # PDF parser processes, 0 = CPU count
+    INGEST_BATCH_SIZE: int = 512  # Chunks per embed + upsert batch, split across encoder processes
+    HF_BATCH_SIZE: int = 1000  # Dataset rows per Arrow record batch
+    EMBED_PROCESSES: int = 0  # Encoder processes on CPU, sharing the cores as torch threads; 0 = every core (every GPU when present)
+    EMBED_ENCODE_BATCH_SIZE: int = 64  # Texts per model forward pass
+    EMBED_UPSERT_WORKERS: int = 2  # Concurrent vector-store upserts
+    INGEST_CHECKPOINT_PATH: str = "ingest_checkpoint.json"
+    INGEST_MANIFEST_PATH: str = "ingest_manifest.json"  # Chunk ids stored per source
+    CHUNK_MAX_TOKENS: int = 200  # Chunk size in model tokens, capped at what the model reads (254)
+    CHUNK_OVERLAP_TOKENS: int = 32
+    BOILERPLATE_MIN_PAGES: int = 3  # Lines repeated on this many pages of a site are dropped
+    BOILERPLATE_STATE_PATH: str = "boilerplate_lines.json"  # Lines per crawled page, so unchanged pages still count
+    DEDUPE_ENABLED: bool = True  # Skip near-duplicate chunks (MinHash + LSH) before embedding
+    DEDUPE_THRESHOLD: float = 0.85  # Estimated Jaccard similarity of word 3-grams
+    DEDUPE_INDEX_PATH: str = "dedupe_index.npz"  # Signatures of stored chunks
+
+    # Web crawling
+    CRAWL_PER_DOMAIN_CONCURRENCY: int = 4
+    CRAWL_MIN_INTERVAL_SECONDS: float = 0.25  # Politeness gap between requests to one domain
+    CRAWL_MAX_RETRIES: int = 3
+    CRAWL_MAX_RETRY_AFTER_SECONDS: float = 60.0  # Cap on a server's Retry-After
+    CRAWL_TIMEOUT_SECONDS: float = 20.0
+    HTTP_CACHE_DIR: str = "http_cache"  # ETag/Last-Modified + compressed bodies
     
     # Paths
     THERAPY_GUIDES_DIR: str = "Therapy_Guides"
@@ -1,11 +1,35 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.api.v1 import chat
+from app.core.config import settings
+from app.services.gemini_service import create_gemini_service
+from app.services.rag_service import RAGServiceProvider, get_rag_service_provider
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create long-lived clients once at startup and shut them down gracefully.
+
+    The RAG service (embedding model, vector store) is not loaded here, so the
+    server binds immediately; with RAG_WARMUP it loads in the background.
+    """
+    app.state.gemini_service = create_gemini_service()
+    app.state.rag_provider = RAGServiceProvider(settings)
+    if settings.RAG_WARMUP:
+        app.state.rag_provider.start()
+    yield
+    await app.state.gemini_service.aclose(timeout=settings.GEMINI_SHUTDOWN_TIMEOUT_SECONDS)
+    app.state.rag_provider.close()
+
 
 app = FastAPI(
     title="Therapeutic Chatbot API",
     description="An API for providing therapeutic support through AI personas.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS configuration
@@ -39,4 +63,18 @@ async def health_check():
     Returns:
         dict: A dictionary with the status of the server.
     """
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/ready", tags=["Health"])
+async def readiness_check():
+    """
+    Readiness endpoint: 200 once the RAG service is loaded, 503 before.
+
+    Unlike /health it reflects whether chat requests can be served without
+    waiting for the model to load.
+
+    Returns:
+        dict: The RAG service status ("ready", "loading", "failed" or "not_started").
+    """
+    status = get_rag_service_provider(app).status()
+    return JSONResponse({"status": status}, status_code=200 if status == "ready" else 503)
\ No newline at end of file
@@ -1,5 +1,16 @@
 from pydantic import BaseModel, Field
-from typing import Literal
+from typing import Literal, Optional
+
+class RetrievalFilter(BaseModel):
+    """
+    Restricts which knowledge-base chunks a chat request retrieves.
+    """
+    types: Optional[list[Literal["pdf", "web", "hf"]]] = Field(
+        None,
+        description="Corpora to search: therapy guide PDFs, scraped web pages, Hugging Face datasets."
+    )
+    sources: Optional[list[str]] = Field(None, description="Only chunks from these files, URLs or datasets.")
+
 
 class ChatMessage(BaseModel):
     """
@@ -8,10 +19,19 @@ class ChatMessage(BaseModel):
     message: str = Field(..., min_length=1)
     history: list[str] = []
     persona: Literal["professional", "companion", "yap"] = Field(..., description="Persona to use for this session.")
+    session_id: Optional[str] = Field(
+        None,
+        description="Server-side session to continue. When set, history is kept by the server and need not be resent; unknown or expired ids are replaced by a new one."
+    )
+    filter: Optional[RetrievalFilter] = Field(
+        None,
+        description="Limit retrieval to some corpora or sources (default: the persona's PERSONA_SOURCE_TYPES, else all)."
+    )
 
 
 class ChatResponse(BaseModel):
     """
     Represents a response from the chatbot.
     """
-    response: str
\ No newline at end of file
+    response: str
+    session_id: Optional[str] = None
\ No newline at end of file
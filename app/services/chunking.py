@@ -0,0 +1,361 @@
+"""
+Chunking aligned to the embedding model's tokenizer.
+
+``TokenChunker`` measures text with the model's (fast, batched) tokenizer and
+cuts it into windows that never exceed what the model reads, so no chunk is
+silently truncated at embedding time. It records chunk lengths per source in
+a ``LengthHistogram``.
+
+Scraped web pages go through ``WebChunker`` first: lines repeated across many
+pages of the same site (newsletter prompts, disclaimers, related-link blurbs)
+are dropped, and the remaining lines are packed into chunks that fit the
+token limit, so no vector is spent on a lone sentence. The lines seen on each
+page are persisted, so an incremental crawl that only re-fetches a few
+changed pages still recognises the site's boilerplate.
+"""
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+import hashlib
+import json
+import os
+import re
+
+SENTENCE_END = re.compile(r"[.!?:;]$")
+
+
+def split_lines(text: str) -> List[str]:
+    """Non-empty, stripped lines of a text."""
+    return [line.strip() for line in text.split('\n') if line.strip()]
+
+
+def _normalize(line: str) -> str:
+    return re.sub(r"\s+", " ", line).strip().lower()
+
+
+def _domain(source: str) -> str:
+    return urlparse(source).netloc.lower().removeprefix("www.")
+
+
+def _line_hash(normalized_line: str) -> str:
+    return hashlib.blake2b(normalized_line.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class BoilerplateFilter:
+    """
+    Detects lines that recur across many pages of one site.
+
+    Only lines of at least ``min_words`` words are candidates, so short text
+    fragments (headings, link texts split out of a sentence) are never dropped.
+    With a ``path``, the candidate lines (hashed) of every page fitted so far
+    are kept on disk, and counts cover those pages as well as the new ones:
+    the outcome does not depend on which pages changed since the last crawl.
+    """
+
+    def __init__(self, min_pages: int = 3, min_words: int = 5, path: Optional[str] = None):
+        """
+        Args:
+            min_pages: Pages of the same domain a line must appear on to count as boilerplate
+            min_words: Shorter lines are always kept
+            path: JSON file the per-page lines are persisted to (None keeps them in memory)
+        """
+        self.min_pages = min_pages
+        self.min_words = min_words
+        self.path = Path(path) if path else None
+        # source -> hashes of its candidate lines
+        self._pages: Dict[str, List[str]] = {}
+        self._boilerplate: Dict[str, set] = {}
+        if self.path is not None and self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("min_words") == min_words:
+                self._pages = state["pages"]
+
+    def fit(self, documents: Iterable[Dict]) -> "BoilerplateFilter":
+        """
+        Record the candidate lines of each document (replacing what an earlier
+        fit saw for the same source), then count, per domain, on how many
+        distinct known pages each line appears.
+        """
+        for doc in documents:
+            lines = {_normalize(line) for line in split_lines(doc["text"])}
+            self._pages[doc["metadata"]["source"]] = sorted(
+                _line_hash(line) for line in lines if len(line.split()) >= self.min_words
+            )
+        counts: Dict[str, Counter] = {}
+        for source, hashes in self._pages.items():
+            counts.setdefault(_domain(source), Counter()).update(hashes)
+        self._boilerplate = {
+            domain: {line for line, n in domain_counts.items() if n >= self.min_pages}
+            for domain, domain_counts in counts.items()
+        }
+        return self
+
+    def forget(self, sources: Iterable[str]) -> None:
+        """Stop counting pages that no longer exist (takes effect on the next fit)."""
+        for source in sources:
+            self._pages.pop(source, None)
+
+    def sources(self) -> List[str]:
+        """Pages whose lines are known."""
+        return list(self._pages)
+
+    def save(self) -> None:
+        """Persist the per-page lines atomically (no-op without a path)."""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"min_words": self.min_words, "pages": self._pages}, f)
+        os.replace(tmp_path, self.path)
+
+    def clean(self, source: str, lines: List[str]) -> List[str]:
+        """Drop boilerplate lines and repeats of a line within the same page."""
+        boilerplate = self._boilerplate.get(_domain(source), set())
+        kept, seen = [], set()
+        for line in lines:
+            key = _normalize(line)
+            if _line_hash(key) in boilerplate or (len(line.split()) >= self.min_words and key in seen):
+                continue
+            seen.add(key)
+            kept.append(line)
+        return kept
+
+    def stats(self) -> Dict[str, int]:
+        """Number of boilerplate lines detected per domain."""
+        return {domain: len(lines) for domain, lines in self._boilerplate.items()}
+
+
+class LengthHistogram:
+    """Chunk lengths in tokens, bucketed per source."""
+
+    def __init__(self, bin_width: int = 32):
+        self.bin_width = bin_width
+        self._bins: Dict[str, Counter] = {}
+        self._totals: Dict[str, List[int]] = {}  # source -> [count, sum, max]
+
+    def add(self, source: str, lengths: Iterable[int]) -> None:
+        bins = self._bins.setdefault(source, Counter())
+        totals = self._totals.setdefault(source, [0, 0, 0])
+        for length in lengths:
+            bins[length // self.bin_width] += 1
+            totals[0] += 1
+            totals[1] += length
+            totals[2] = max(totals[2], length)
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per source: chunk count, mean and max length, and counts per length bin."""
+        return {
+            source: {
+                "chunks": count,
+                "mean_tokens": round(total / count, 1) if count else 0.0,
+                "max_tokens": longest,
+                "bins": {
+                    f"{b * self.bin_width}-{(b + 1) * self.bin_width - 1}": n
+                    for b, n in sorted(self._bins[source].items())
+                },
+            }
+            for source, (count, total, longest) in self._totals.items()
+        }
+
+    def report(self) -> str:
+        """Human-readable summary, one line per source."""
+        lines = []
+        for source, entry in self.summary().items():
+            bins = ", ".join(f"{label}: {n}" for label, n in entry["bins"].items())
+            lines.append(
+                f"{source}: {entry['chunks']} chunks, mean {entry['mean_tokens']} / max {entry['max_tokens']} tokens [{bins}]"
+            )
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        self._bins.clear()
+        self._totals.clear()
+
+
+class TokenChunker:
+    def __init__(
+        self,
+        tokenizer,
+        max_tokens: int,
+        overlap_tokens: int = 0,
+        histogram: Optional[LengthHistogram] = None,
+    ):
+        """
+        Args:
+            tokenizer: Fast Hugging Face tokenizer of the embedding model
+            max_tokens: Hard upper bound of a chunk, excluding special tokens
+            overlap_tokens: Tokens repeated between consecutive chunks of one text
+            histogram: Where chunk lengths are recorded per source
+        """
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.histogram = histogram if histogram is not None else LengthHistogram()
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Token lengths of several texts in one batched tokenizer call."""
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False, verbose=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def _encode(self, texts: List[str]) -> List[List[Tuple[int, int]]]:
+        encoded = self.tokenizer(
+            texts, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+        )
+        return [[(a, b) for a, b in offsets if b > a] for offsets in encoded["offset_mapping"]]
+
+    def _windows(self, text: str, offsets: List[Tuple[int, int]], max_tokens: int) -> List[str]:
+        """Cut one text at whitespace between tokens, preferring sentence and line ends."""
+        n = len(offsets)
+        if n <= max_tokens:
+            return [text[offsets[0][0]:offsets[-1][1]]] if n else []
+        # Token i may start a chunk if whitespace precedes it (never inside a word)
+        boundary = [i == 0 or offsets[i][0] > offsets[i - 1][1] for i in range(n)]
+
+        def sentence_break(i: int) -> bool:
+            gap = text[offsets[i - 1][1]:offsets[i][0]]
+            return "\n" in gap or bool(SENTENCE_END.search(text[offsets[i - 1][0]:offsets[i - 1][1]]))
+
+        chunks = []
+        start = 0
+        while start < n:
+            end = start + max_tokens
+            if end >= n:
+                end = n
+            else:
+                candidates = [i for i in range(end, start, -1) if boundary[i]]
+                preferred = [i for i in candidates if i >= start + max_tokens * 2 // 3 and sentence_break(i)]
+                if preferred:
+                    end = preferred[0]
+                elif candidates:
+                    end = candidates[0]
+            chunks.append(text[offsets[start][0]:offsets[end - 1][1]])
+            if end >= n:
+                break
+            next_start = end
+            if self.overlap_tokens:
+                back = [i for i in range(end - self.overlap_tokens, end) if i > start and boundary[i]]
+                if back:
+                    next_start = back[0]
+            start = next_start
+        return chunks
+
+    def split_texts(
+        self,
+        texts: List[str],
+        sources: Optional[List[str]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> List[List[str]]:
+        """
+        Split several texts with one batched tokenizer pass.
+
+        Texts that already fit are returned unchanged. Every chunk is re-measured
+        and split again if re-tokenization made it longer than the limit.
+
+        Args:
+            texts: Texts to split
+            sources: Histogram key per text (lengths are not recorded if omitted)
+            max_tokens: Override of the chunk limit (e.g. the model limit for unchunked rows)
+
+        Returns:
+            The chunks of each text, in input order
+        """
+        limit = max_tokens or self.max_tokens
+        lengths = self.count_tokens(texts)
+        result: List[Optional[List[str]]] = [
+            ([t] if n else []) if n <= limit else None for t, n in zip(texts, lengths)
+        ]
+        long_idx = [i for i, r in enumerate(result) if r is None]
+        if long_idx:
+            offsets = self._encode([texts[i] for i in long_idx])
+            for i, text_offsets in zip(long_idx, offsets):
+                result[i] = self._windows(texts[i], text_offsets, limit)
+
+        # Guarantee: no chunk exceeds the limit after re-tokenization
+        for i in long_idx:
+            chunks = result[i]
+            for _ in range(3):
+                chunk_lengths = self.count_tokens(chunks)
+                if max(chunk_lengths, default=0) <= limit:
+                    break
+                fixed = []
+                for chunk, n in zip(chunks, chunk_lengths):
+                    if n <= limit:
+                        fixed.append(chunk)
+                    else:
+                        fixed.extend(self._windows(chunk, self._encode([chunk])[0], max(1, 2 * limit - n - 1)))
+                chunks = fixed
+            result[i] = chunks
+
+        if sources is not None:
+            for source, chunks, length in zip(sources, result, lengths):
+                if chunks:
+                    self.histogram.add(source, [length] if length <= limit else self.count_tokens(chunks))
+        return result
+
+    def split_text(self, text: str, source: Optional[str] = None) -> List[str]:
+        """Split one text; see ``split_texts``."""
+        return self.split_texts([text], [source] if source else None)[0]
+
+
+class WebChunker:
+    def __init__(
+        self,
+        chunker: TokenChunker,
+        boilerplate: BoilerplateFilter = None,
+    ):
+        """
+        Args:
+            chunker: Measures lines and splits lines that exceed its limit on their own
+            boilerplate: Filter applied to every document before packing
+        """
+        self.chunker = chunker
+        self.boilerplate = boilerplate
+
+    def chunk_document(self, document: Dict) -> List[Dict]:
+        """
+        Pack the lines of one document into chunks within the chunker's limit.
+
+        Args:
+            document: {"text": ..., "metadata": {...}} as returned by the scrapers
+
+        Returns:
+            Chunks sharing the document's metadata
+        """
+        metadata = document["metadata"]
+        lines = split_lines(document["text"])
+        if self.boilerplate is not None:
+            lines = self.boilerplate.clean(metadata["source"], lines)
+
+        max_tokens = self.chunker.max_tokens
+        pieces: List[str] = []
+        for line_chunks in self.chunker.split_texts(lines):
+            pieces.extend(line_chunks)
+        lengths = self.chunker.count_tokens(pieces)
+
+        texts, current, current_tokens = [], [], 0
+        for piece, tokens in zip(pieces, lengths):
+            if current and current_tokens + tokens > max_tokens:
+                texts.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+        if current:
+            texts.append("\n".join(current))
+        self.chunker.histogram.add(_domain(metadata["source"]), self.chunker.count_tokens(texts))
+        return [{"text": text, "metadata": metadata} for text in texts]
+
+    def chunk_documents(self, documents: List[Dict]) -> List[Dict]:
+        """Fit the boilerplate filter on all documents, then chunk each of them."""
+        if self.boilerplate is not None:
+            self.boilerplate.fit(documents)
+        chunks = []
+        for document in documents:
+            chunks.extend(self.chunk_document(document))
+        return chunks
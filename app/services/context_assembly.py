@@ -0,0 +1,190 @@
+"""
+Assembly of retrieved chunks into the context sent to Gemini.
+
+Retrieval returns chunks that repeat each other: neighbouring chunks of one
+document share their overlap, and the Hugging Face corpora hold many
+near-identical answers. Before the prompt is built the chunks are
+    1. merged where one chunk of a source continues or contains another,
+    2. ordered by maximal marginal relevance (MMR), dropping chunks nearly
+       identical to one already chosen,
+    3. trimmed to a token budget.
+"""
+from typing import Callable, Dict, List, Optional
+import re
+
+import numpy as np
+
+from app.services.context_budget import count_tokens
+
+MIN_OVERLAP_CHARS = 20  # Shorter shared edges are coincidence, not chunk overlap
+MIN_PARTIAL_TOKENS = 40  # A chunk cut shorter than this is left out instead
+CHUNK_OVERHEAD_TOKENS = 8  # "[i] ... (Source: ...)" around each chunk in the prompt
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of ``left`` that is a prefix of ``right`` (0 if too short)."""
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    start = left.find(probe, max(0, len(left) - len(right)))
+    while start != -1:
+        if right.startswith(left[start:]):
+            return len(left) - start
+        start = left.find(probe, start + 1)
+    return 0
+
+
+def _join(a: str, b: str) -> Optional[str]:
+    """The text covering both chunks if one contains or continues the other, else None."""
+    if b in a:
+        return a
+    if a in b:
+        return b
+    overlap = _overlap(a, b)
+    if overlap:
+        return a + b[overlap:]
+    overlap = _overlap(b, a)
+    if overlap:
+        return b + a[overlap:]
+    return None
+
+
+def merge_overlapping(matches: List[Dict]) -> List[Dict]:
+    """
+    Merge chunks of the same source that overlap or contain one another.
+
+    Args:
+        matches: Chunks ('text', 'source', 'score'), best first
+
+    Returns:
+        Merged chunks, each at the position of its best part, with its best score
+    """
+    merged: List[Dict] = []
+    for match in matches:
+        current = dict(match)
+        position = len(merged)
+        i = 0
+        while i < len(merged):
+            other = merged[i]
+            text = _join(other['text'], current['text']) if other['source'] == current['source'] else None
+            if text is None:
+                i += 1
+                continue
+            current = other | {'text': text, 'score': max(other['score'], current['score'])}
+            del merged[i]
+            position = min(position, i)
+            # The grown chunk may now join one it did not touch before
+            i = 0
+        merged.insert(position, current)
+    return merged
+
+
+def mmr_order(
+    query_embedding: np.ndarray,
+    embeddings: np.ndarray,
+    lambda_: float = 0.7,
+    duplicate_threshold: float = 0.92,
+) -> List[int]:
+    """
+    Order chunks by maximal marginal relevance.
+
+    Each step picks the chunk maximizing
+    ``lambda_ * sim(query, chunk) - (1 - lambda_) * max sim(chunk, picked)``.
+
+    Args:
+        query_embedding: Embedding of the query
+        embeddings: One embedding per chunk
+        lambda_: 1 ranks by relevance only, lower values favour diversity
+        duplicate_threshold: Chunks at least this similar to a picked one are dropped
+
+    Returns:
+        Indices of the kept chunks, in MMR order
+    """
+    def unit(matrix: np.ndarray) -> np.ndarray:
+        return matrix / np.maximum(np.linalg.norm(matrix, axis=-1, keepdims=True), 1e-12)
+
+    embeddings = unit(np.asarray(embeddings, dtype=np.float32))
+    relevance = embeddings @ unit(np.asarray(query_embedding, dtype=np.float32))
+    similarity = embeddings @ embeddings.T
+    remaining = list(range(len(embeddings)))
+    picked: List[int] = []
+    while remaining:
+        if picked:
+            redundancy = similarity[np.ix_(remaining, picked)].max(axis=1)
+            keep = redundancy < duplicate_threshold
+            remaining = [r for r, k in zip(remaining, keep) if k]
+            if not remaining:
+                break
+            redundancy = redundancy[keep]
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+        scores = lambda_ * relevance[remaining] - (1 - lambda_) * redundancy
+        picked.append(remaining.pop(int(np.argmax(scores))))
+    return picked
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """The longest run of whole sentences (else words) of ``text`` within ``max_tokens``."""
+    cut = text[:max_tokens * 4 - 3]  # Room for the "..."
+    sentence_end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    if sentence_end > len(cut) // 2:
+        return cut[:sentence_end + 1]
+    return re.sub(r"\s+\S*$", "", cut) + "..."
+
+
+def trim_to_budget(matches: List[Dict], max_tokens: int) -> List[Dict]:
+    """
+    Keep chunks in order while they fit ``max_tokens``; the first one that does
+    not fit is cut at a sentence boundary if enough of it remains.
+    """
+    kept, used = [], 0
+    for match in matches:
+        cost = count_tokens(match['text']) + count_tokens(match.get('source', '')) + CHUNK_OVERHEAD_TOKENS
+        if used + cost <= max_tokens:
+            kept.append(match)
+            used += cost
+            continue
+        room = max_tokens - used - count_tokens(match.get('source', '')) - CHUNK_OVERHEAD_TOKENS
+        if room >= MIN_PARTIAL_TOKENS:
+            kept.append(match | {'text': _truncate(match['text'], room)})
+        break
+    return kept
+
+
+class ContextAssembler:
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_tokens: int = 1000,
+        mmr_lambda: float = 0.7,
+        duplicate_threshold: float = 0.92,
+    ):
+        """
+        Args:
+            encode: Embeds a list of chunk texts (same model as the query)
+            max_tokens: Budget for the retrieved context in the prompt
+            mmr_lambda: Relevance vs. diversity trade-off of the MMR ordering
+            duplicate_threshold: Cosine similarity above which a chunk counts as a repeat
+        """
+        self.encode = encode
+        self.max_tokens = max_tokens
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+
+    def assemble(self, query_embedding, matches: List[Dict]) -> List[Dict]:
+        """
+        Merge, deduplicate, order and trim retrieved chunks for the prompt.
+
+        Args:
+            query_embedding: Embedding of the user's message
+            matches: Retrieved chunks ('text', 'source', 'score'), best first
+
+        Returns:
+            The chunks to put into the prompt, most useful first
+        """
+        merged = merge_overlapping(matches)
+        if len(merged) > 1:
+            embeddings = self.encode([match['text'] for match in merged])
+            order = mmr_order(query_embedding, embeddings, self.mmr_lambda, self.duplicate_threshold)
+            merged = [merged[i] for i in order]
+        return trim_to_budget(merged, self.max_tokens)
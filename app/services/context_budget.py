@@ -0,0 +1,145 @@
+"""
+Token budgeting for the prompt sent to Gemini.
+
+The persona prompt, the RAG-augmented user message and the conversation
+history together must fit a configurable token budget. The most recent turns
+are kept verbatim; older turns are folded into a short rolling summary that is
+cached so each new turn only summarizes what was added since the last one.
+"""
+from typing import Callable, Dict, List, Optional, Union
+import hashlib
+import math
+import re
+
+from app.services.cache import TTLCache
+
+Turn = Dict[str, str]
+History = List[Union[str, Turn]]
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+def count_tokens(text: str) -> int:
+    """
+    Approximate the Gemini token count of a text.
+
+    Uses the ~4 characters per token ratio of English text, which is close
+    enough for budgeting and avoids a network call to the tokenizer.
+    """
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def _as_turn(item: Union[str, Turn]) -> Turn:
+    return item if isinstance(item, dict) else {"role": "user", "text": item}
+
+
+def extractive_summary(turns: List[Turn], max_chars_per_turn: int = 200) -> List[str]:
+    """
+    Summarize turns as one short line each: the speaker and their first sentence.
+
+    Args:
+        turns: Turns to summarize
+        max_chars_per_turn: Length cap for each line
+
+    Returns:
+        One summary line per non-empty turn
+    """
+    lines = []
+    for turn in turns:
+        text = " ".join(turn["text"].split())
+        if not text:
+            continue
+        first_sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+        if len(first_sentence) > max_chars_per_turn:
+            first_sentence = first_sentence[:max_chars_per_turn].rstrip() + "..."
+        speaker = "User" if turn["role"] == "user" else "Assistant"
+        lines.append(f"- {speaker}: {first_sentence}")
+    return lines
+
+
+class ContextBudget:
+    def __init__(
+        self,
+        max_tokens: int = 8000,
+        recent_turns: int = 10,
+        summary_max_tokens: int = 400,
+        summarizer: Callable[[List[Turn]], List[str]] = extractive_summary,
+        cache: Optional[TTLCache] = None,
+    ):
+        """
+        Args:
+            max_tokens: Budget for persona prompt + message (with RAG context) + history
+            recent_turns: Most recent turns always considered for verbatim inclusion
+            summary_max_tokens: Cap on the rolling summary of older turns
+            summarizer: Turns older turns into summary lines
+            cache: Stores summaries keyed by a rolling hash of the turns they cover
+        """
+        self.max_tokens = max_tokens
+        self.recent_turns = recent_turns
+        self.summary_max_tokens = summary_max_tokens
+        self.summarizer = summarizer
+        self.cache = cache if cache is not None else TTLCache(max_size=4096, ttl_seconds=86400)
+
+    def fit(self, prompt: str, message: str, history: History) -> List[Turn]:
+        """
+        Trim the history so the whole request fits the token budget.
+
+        Args:
+            prompt: Persona prompt
+            message: The message being sent (including RAG context)
+            history: Prior turns, oldest first
+
+        Returns:
+            An optional summary turn followed by the most recent turns verbatim
+        """
+        turns = [_as_turn(item) for item in history]
+        available = self.max_tokens - count_tokens(prompt) - count_tokens(message)
+
+        split = max(0, len(turns) - self.recent_turns)
+        older, recent = turns[:split], turns[split:]
+
+        # Drop the oldest "recent" turns into the summary until they fit
+        reserve = self.summary_max_tokens if older else 0
+        recent_tokens = sum(count_tokens(t["text"]) for t in recent)
+        while recent and recent_tokens > available - reserve:
+            moved = recent.pop(0)
+            recent_tokens -= count_tokens(moved["text"])
+            older.append(moved)
+            reserve = self.summary_max_tokens
+
+        if not older:
+            return recent
+        summary = self._summarize(older, max(0, min(self.summary_max_tokens, available - recent_tokens)))
+        if not summary:
+            return recent
+        return [{"role": "user", "text": SUMMARY_PREFIX + summary}] + recent
+
+    def _summarize(self, turns: List[Turn], max_tokens: int) -> str:
+        """Summarize turns incrementally, reusing the longest cached prefix summary."""
+        if max_tokens <= 0:
+            return ""
+        digests = []
+        digest = hashlib.sha1()
+        for turn in turns:
+            digest.update(turn["role"].encode() + b"\0" + turn["text"].encode() + b"\0")
+            digests.append(digest.copy().hexdigest())
+
+        lines: List[str] = []
+        start = 0
+        for i in range(len(digests) - 1, -1, -1):
+            cached = self.cache.get(digests[i])
+            if cached is not None:
+                lines, start = list(cached), i + 1
+                break
+        lines += self.summarizer(turns[start:])
+        self.cache.set(digests[-1], lines)
+
+        # Keep the newest lines that fit the summary budget
+        kept, used = [], 0
+        for line in reversed(lines):
+            cost = count_tokens(line) + 1
+            if used + cost > max_tokens:
+                break
+            kept.append(line)
+            used += cost
+        return "\n".join(reversed(kept))
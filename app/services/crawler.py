@@ -0,0 +1,200 @@
+"""
+Shared async HTTP crawler used by the web scrapers.
+
+One pooled ``httpx.AsyncClient`` serves every site. Requests are limited per
+domain (concurrency and a minimum interval between request starts, to stay
+polite), time out, and are retried with exponential backoff on transient
+failures. With an ``HTTPCache`` requests are conditional, and pages that
+answer 304 and are already ingested can be skipped entirely.
+"""
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+from urllib.parse import urlparse
+import asyncio
+import logging
+import random
+
+import httpx
+
+from app.core.config import Settings
+from app.services.http_cache import HTTPCache
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class FetchResult(NamedTuple):
+    url: str
+    status_code: int
+    text: str
+    not_modified: bool = False  # 304: text is the cached body
+
+
+class _DomainState:
+    def __init__(self, concurrency: int):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.lock = asyncio.Lock()
+        self.next_request_at = 0.0
+
+
+class AsyncCrawler:
+    def __init__(
+        self,
+        per_domain_concurrency: int = 4,
+        min_interval_seconds: float = 0.25,
+        max_retries: int = 3,
+        backoff_seconds: float = 1.0,
+        max_retry_after_seconds: float = 60.0,
+        timeout_seconds: float = 20.0,
+        max_connections: int = 32,
+        headers: Optional[Dict[str, str]] = None,
+        cache: Optional[HTTPCache] = None,
+        is_ingested: Optional[Callable[[str], bool]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Args:
+            per_domain_concurrency: Simultaneous requests allowed per domain
+            min_interval_seconds: Minimum gap between request starts on one domain
+            max_retries: Retries after the first attempt for transient failures
+            backoff_seconds: Base delay, doubled on every retry
+            max_retry_after_seconds: Cap on a server's Retry-After before the next attempt
+            timeout_seconds: Per-request timeout
+            max_connections: Size of the shared connection pool
+            headers: Default request headers
+            cache: On-disk cache enabling conditional GETs
+            is_ingested: Tells whether a source URL is already in the vector store
+            transport: httpx transport to send requests through (default: the network)
+        """
+        self.per_domain_concurrency = per_domain_concurrency
+        self.min_interval_seconds = min_interval_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_retry_after_seconds = max_retry_after_seconds
+        self.timeout_seconds = timeout_seconds
+        self.max_connections = max_connections
+        self.headers = headers or DEFAULT_HEADERS
+        self.cache = cache
+        self.is_ingested = is_ingested
+        self.transport = transport
+        self.unchanged_sources: Set[str] = set()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._domains: Dict[str, _DomainState] = {}
+
+    async def __aenter__(self) -> "AsyncCrawler":
+        self._client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout_seconds,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.max_connections),
+            transport=self.transport,
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._client.aclose()
+        self._client = None
+
+    def _domain(self, url: str) -> _DomainState:
+        domain = urlparse(url).netloc
+        if domain not in self._domains:
+            self._domains[domain] = _DomainState(self.per_domain_concurrency)
+        return self._domains[domain]
+
+    async def _wait_turn(self, state: _DomainState) -> None:
+        """Space request starts on one domain at least ``min_interval_seconds`` apart."""
+        loop = asyncio.get_running_loop()
+        async with state.lock:
+            delay = state.next_request_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            state.next_request_at = loop.time() + self.min_interval_seconds
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_retry_after_seconds)
+        return self.backoff_seconds * (2 ** attempt) * (1 + random.random() / 2)
+
+    async def fetch(self, url: str) -> Optional[FetchResult]:
+        """
+        GET a URL with politeness limits and retries.
+
+        Args:
+            url: Page to fetch
+
+        Returns:
+            The fetched page, or None if it could not be fetched
+        """
+        state = self._domain(url)
+        conditional = self.cache.conditional_headers(url) if self.cache else {}
+        async with state.semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._wait_turn(state)
+                response = None
+                try:
+                    response = await self._client.get(url, headers=conditional)
+                    if response.status_code == 304:
+                        cached = self.cache.load(url) if self.cache else None
+                        if cached is not None:
+                            return FetchResult(url, 304, cached, not_modified=True)
+                        # Cache entry vanished: retry unconditionally
+                        conditional = {}
+                        error = "HTTP 304 without a cached body"
+                        continue
+                    if response.status_code not in RETRY_STATUS_CODES:
+                        if response.status_code >= 400:
+                            logging.warning(f"HTTP {response.status_code} for {url}")
+                            return None
+                        if self.cache:
+                            self.cache.store(url, response.headers, response.text)
+                        return FetchResult(str(response.url), response.status_code, response.text)
+                    error = f"HTTP {response.status_code}"
+                except httpx.HTTPError as e:
+                    error = f"{type(e).__name__}: {e}"
+                if attempt < self.max_retries:
+                    delay = self._retry_delay(attempt, response)
+                    logging.info(f"Retrying {url} in {delay:.1f}s after {error}")
+                    await asyncio.sleep(delay)
+            logging.warning(f"Error fetching {url}: {error}")
+            return None
+
+    async def fetch_all(self, urls: Iterable[str]) -> List[Optional[FetchResult]]:
+        """Fetch several URLs concurrently, in input order."""
+        return await asyncio.gather(*(self.fetch(url) for url in urls))
+
+    def is_unchanged(self, source: str, page: Optional[FetchResult]) -> bool:
+        """
+        True if a page answered 304 and its source is already ingested, in which
+        case scrapers skip parsing it. Such sources are collected in
+        ``unchanged_sources`` so ingestion can leave their vectors alone.
+        """
+        if page is None or not page.not_modified or self.is_ingested is None:
+            return False
+        if not self.is_ingested(source):
+            return False
+        self.unchanged_sources.add(source)
+        return True
+
+
+def create_crawler(
+    settings: Settings,
+    use_cache: bool = True,
+    is_ingested: Optional[Callable[[str], bool]] = None
+) -> AsyncCrawler:
+    """
+    Build a crawler configured from settings. Use it as ``async with``.
+
+    Args:
+        settings: Application settings
+        use_cache: Send conditional requests using HTTP_CACHE_DIR
+        is_ingested: Tells whether a source URL is already in the vector store
+    """
+    return AsyncCrawler(
+        per_domain_concurrency=settings.CRAWL_PER_DOMAIN_CONCURRENCY,
+        min_interval_seconds=settings.CRAWL_MIN_INTERVAL_SECONDS,
+        max_retries=settings.CRAWL_MAX_RETRIES,
+        max_retry_after_seconds=settings.CRAWL_MAX_RETRY_AFTER_SECONDS,
+        timeout_seconds=settings.CRAWL_TIMEOUT_SECONDS,
+        cache=HTTPCache(settings.HTTP_CACHE_DIR) if use_cache else None,
+        is_ingested=is_ingested,
+    )
@@ -0,0 +1,173 @@
+"""
+Near-duplicate detection for ingested chunks.
+
+Each chunk gets a MinHash signature over its word shingles; locality-sensitive
+hashing (the signature cut into bands) finds candidate chunks that share a
+band, and a candidate counts as a duplicate when the estimated Jaccard
+similarity of the two signatures reaches the threshold.
+
+Signatures of every stored chunk are persisted, so a chunk is recognised as a
+duplicate of something ingested in an earlier run or from another corpus
+(e.g. an HF dataset converted to PDFs and ingested again).
+"""
+from pathlib import Path
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+import os
+import re
+import zlib
+
+import numpy as np
+
+MERSENNE_PRIME = (1 << 31) - 1
+_WORD = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = 3) -> set:
+    """Hashes of the overlapping ``size``-word sequences of a normalized text."""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {zlib.crc32(" ".join(words).encode('utf-8')) % MERSENNE_PRIME}
+    return {
+        zlib.crc32(" ".join(words[i:i + size]).encode('utf-8')) % MERSENNE_PRIME
+        for i in range(len(words) - size + 1)
+    }
+
+
+class MinHashDeduper:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 3,
+        seed: int = 1,
+    ):
+        """
+        Args:
+            path: .npz file the signatures are persisted to (None keeps them in memory)
+            threshold: Estimated Jaccard similarity from which a chunk is a duplicate
+            num_perm: Hash functions per signature
+            bands: LSH bands; more bands find candidates at lower similarity
+            shingle_size: Words per shingle
+            seed: Seed of the hash functions (signatures are only comparable under one seed)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = Path(path) if path else None
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[str]] = {}
+        if self.path is not None and self.path.exists():
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._signatures
+
+    def _params(self) -> np.ndarray:
+        return np.array([self.num_perm, self.bands, self.shingle_size, self.seed], dtype=np.int64)
+
+    def _load(self) -> None:
+        with np.load(self.path) as data:
+            if not np.array_equal(data["params"], self._params()):
+                print(f"Dedupe index {self.path} was built with other parameters; starting fresh")
+                return
+            for chunk_id, signature in zip(data["ids"].tolist(), data["signatures"]):
+                self._insert(chunk_id, signature)
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text, ``num_perm`` uint32 values."""
+        hashes = np.fromiter(shingles(text, self.shingle_size), dtype=np.uint64)
+        permuted = (hashes[:, None] * self._a + self._b) % MERSENNE_PRIME
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def _insert(self, chunk_id: str, signature: np.ndarray) -> None:
+        self._signatures[chunk_id] = signature
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, []).append(chunk_id)
+
+    def find_duplicate(self, signature: np.ndarray, ignore: Collection[str] = ()) -> Optional[str]:
+        """Id of a known chunk, other than those in ``ignore``, at least ``threshold`` similar to the signature."""
+        checked = set()
+        for key in self._band_keys(signature):
+            for candidate in self._buckets.get(key, ()):
+                if candidate in checked or candidate in ignore:
+                    continue
+                checked.add(candidate)
+                if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                    return candidate
+        return None
+
+    def add(self, chunk_id: str, text: str) -> None:
+        """Record a stored chunk without checking it."""
+        if chunk_id not in self._signatures:
+            self._insert(chunk_id, self.signature(text))
+
+    def check_and_add(self, chunk_id: str, text: str, ignore: Collection[str] = ()) -> Optional[str]:
+        """
+        Check a chunk against everything recorded and record it if it is new.
+
+        Args:
+            chunk_id: Id of the chunk
+            text: Text of the chunk
+            ignore: Recorded chunks not to match against (e.g. older versions being replaced)
+
+        Returns:
+            The id of the chunk it duplicates, or None if it was recorded
+        """
+        if chunk_id in self._signatures:
+            return None
+        signature = self.signature(text)
+        duplicate_of = self.find_duplicate(signature, ignore)
+        if duplicate_of is None:
+            self._insert(chunk_id, signature)
+        return duplicate_of
+
+    def remove(self, chunk_ids: Iterable[str]) -> None:
+        """Forget chunks deleted from the vector store, so their duplicates can take their place."""
+        for chunk_id in chunk_ids:
+            signature = self._signatures.pop(chunk_id, None)
+            if signature is None:
+                continue
+            for key in self._band_keys(signature):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.remove(chunk_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def save(self) -> None:
+        """Persist signatures atomically."""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        ids = list(self._signatures)
+        signatures = (
+            np.stack([self._signatures[i] for i in ids]) if ids
+            else np.zeros((0, self.num_perm), dtype=np.uint32)
+        )
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, ids=np.array(ids, dtype=str), signatures=signatures, params=self._params())
+        os.replace(tmp_path, self.path)
+
+    def reset(self) -> None:
+        """Forget everything, e.g. after the index was cleared."""
+        self._signatures = {}
+        self._buckets = {}
+        if self.path is not None and self.path.exists():
+            self.path.unlink()
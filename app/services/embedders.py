@@ -0,0 +1,115 @@
+"""
+Embedding model backends.
+
+``RAGService.model`` is either the PyTorch ``SentenceTransformer`` or an
+``OnnxEmbedder`` running an int8-quantized export of the same model on ONNX
+Runtime (see scripts/export_onnx_embedder.py). Both expose the parts of the
+SentenceTransformer interface the service uses: ``encode``, ``tokenizer``,
+``max_seq_length`` and ``get_sentence_embedding_dimension``.
+"""
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+from app.core.config import Settings
+
+
+class OnnxEmbedder:
+    def __init__(
+        self,
+        model_dir: str,
+        model_file: str = "model_int8.onnx",
+        max_seq_length: int = 256,
+        num_threads: int = 0,
+        normalize: bool = True,
+    ):
+        """
+        Args:
+            model_dir: Directory holding the ONNX model and the tokenizer files
+            model_file: ONNX file inside ``model_dir``
+            max_seq_length: Longest input in tokens, longer inputs are truncated
+            num_threads: ONNX Runtime intra-op threads, 0 = runtime default
+            normalize: L2-normalize embeddings, as the sentence-transformers model does
+        """
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError("EMBEDDING_BACKEND=onnx requires the 'onnxruntime' and 'transformers' packages") from e
+        model_path = Path(model_dir) / model_file
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"ONNX embedding model {model_path} not found; run scripts/export_onnx_embedder.py"
+            )
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_seq_length = max_seq_length
+        self.normalize = normalize
+        self._dimension: Optional[int] = None
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = int(self.encode(["dimension probe"]).shape[1])
+        return self._dimension
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        inputs = {name: encoded[name].astype(np.int64) for name in encoded if name in self._input_names}
+        token_embeddings = self.session.run(None, inputs)[0]
+        # Mean pooling over real tokens, as in the sentence-transformers pipeline
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings.astype(np.float32)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        Embed one text or a list of texts.
+
+        Returns:
+            A vector for a single string, otherwise a (len(sentences), dimension) array
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self._dimension or 0), dtype=np.float32)
+        # Longest first so each batch is padded to similar lengths
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        batches = [
+            self._encode_batch([texts[i] for i in order[start:start + batch_size]])
+            for start in range(0, len(texts), batch_size)
+        ]
+        sorted_embeddings = np.concatenate(batches, axis=0)
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+        self._dimension = embeddings.shape[1]
+        return embeddings[0] if single else embeddings
+
+
+def create_embedding_model(settings: Settings):
+    """
+    Load the embedding model selected by EMBEDDING_BACKEND ("torch" or "onnx").
+    """
+    backend = settings.EMBEDDING_BACKEND.lower()
+    if backend == "onnx":
+        return OnnxEmbedder(
+            settings.ONNX_MODEL_DIR,
+            model_file=settings.ONNX_MODEL_FILE,
+            num_threads=settings.ONNX_THREADS,
+        )
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(settings.EMBEDDING_MODEL)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {settings.EMBEDDING_BACKEND}")
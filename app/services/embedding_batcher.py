@@ -0,0 +1,127 @@
+"""
+Micro-batching scheduler for query embeddings.
+
+Concurrent chat requests each need one query embedding. Encoding them one at a
+time wastes the batched matrix-multiply throughput of the embedding model, so
+``EmbeddingBatcher`` coalesces queries that arrive within a short window into a
+single ``encode`` call and hands each caller back its own vector.
+"""
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+
+class EmbeddingBatcher:
+    def __init__(
+        self,
+        encode: Callable[[List[str]], List[List[float]]],
+        executor: Optional[Executor] = None,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        """
+        Args:
+            encode: Blocking function embedding a list of texts
+            executor: Pool the blocking encode call runs on (default loop executor if None)
+            max_batch_size: Largest number of queries encoded together
+            max_wait_ms: How long the first query in a batch waits for company
+        """
+        self.encode = encode
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Metrics
+        self._requests = 0
+        self._batches = 0
+        self._max_batch = 0
+        self._queue_delay_total = 0.0
+        self._queue_delay_max = 0.0
+        self._encode_time_total = 0.0
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Embed a single text, sharing the encode call with concurrent callers.
+
+        Args:
+            text: The text to embed
+
+        Returns:
+            The embedding as a list of floats
+        """
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    def _ensure_worker(self) -> None:
+        """Start the batching task on the running loop (restarting it if the loop changed)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._worker is not None and not self._worker.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._worker = loop.create_task(self._run(self._queue))
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._process(loop, batch)
+
+    async def _process(self, loop: asyncio.AbstractEventLoop, batch: list) -> None:
+        texts = [text for text, _, _ in batch]
+        started = time.perf_counter()
+        try:
+            embeddings = await loop.run_in_executor(self.executor, self.encode, texts)
+        except Exception as e:
+            logging.error(f"EmbeddingBatcher encode failed for batch of {len(batch)}: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finished = time.perf_counter()
+
+        for (_, future, _), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+        delays = [started - enqueued for _, _, enqueued in batch]
+        self._requests += len(batch)
+        self._batches += 1
+        self._max_batch = max(self._max_batch, len(batch))
+        self._queue_delay_total += sum(delays)
+        self._queue_delay_max = max(self._queue_delay_max, max(delays))
+        self._encode_time_total += finished - started
+
+    def stats(self) -> Dict[str, float]:
+        """Batch size and queue delay metrics since startup."""
+        return {
+            "requests": self._requests,
+            "batches": self._batches,
+            "avg_batch_size": self._requests / self._batches if self._batches else 0.0,
+            "max_batch_size": self._max_batch,
+            "avg_queue_delay_ms": 1000 * self._queue_delay_total / self._requests if self._requests else 0.0,
+            "max_queue_delay_ms": 1000 * self._queue_delay_max,
+            "avg_encode_ms": 1000 * self._encode_time_total / self._batches if self._batches else 0.0,
+        }
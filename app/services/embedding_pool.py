@@ -0,0 +1,162 @@
+"""
+Embedding pool for bulk ingestion.
+
+Encodes chunk batches on every CPU core (or every GPU) with the
+sentence-transformers multi-process pool, sorting texts by length so each
+model batch carries little padding, and overlaps encoding of the next batch
+with the vector-store upserts of the previous ones.
+"""
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+import math
+import os
+import time
+
+import numpy as np
+
+# Read by torch (OpenMP, MKL) when a worker process starts
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def default_devices(processes: int = 0) -> List[str]:
+    """
+    Devices to encode on: every CUDA device if there are any, otherwise
+    ``processes`` CPU workers (0 = one per core; ``EmbeddingPool`` splits the
+    cores between them, so workers do not oversubscribe the CPU).
+    """
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return [f"cuda:{i}" for i in range(torch.cuda.device_count())]
+    except ImportError:
+        pass
+    if processes <= 0:
+        processes = os.cpu_count() or 1
+    return ["cpu"] * processes
+
+
+class EmbeddingPool:
+    def __init__(
+        self,
+        model,
+        devices: Optional[List[str]] = None,
+        encode_batch_size: int = 64,
+        upsert_workers: int = 2,
+        max_pending_upserts: int = 4,
+    ):
+        """
+        Args:
+            model: SentenceTransformer used for encoding
+            devices: One worker process per entry; a single device encodes in-process
+            encode_batch_size: Texts per forward pass
+            upsert_workers: Threads running vector-store upserts concurrently
+            max_pending_upserts: Encoded batches allowed to wait for their upsert
+        """
+        self.model = model
+        self.devices = devices or default_devices()
+        self.encode_batch_size = encode_batch_size
+        self.max_pending_upserts = max(1, max_pending_upserts)
+        self._process_pool: Optional[Dict] = None
+        self._upserts = ThreadPoolExecutor(max_workers=upsert_workers, thread_name_prefix="rag-upsert")
+        self._pending: Deque[Tuple[Future, Optional[Callable[[], None]]]] = deque()
+
+        # Metrics
+        self._chunks = 0
+        self._encode_seconds = 0.0
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts, longest first so every model batch holds similar lengths.
+
+        Returns:
+            Embeddings in input order
+        """
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+        start = time.perf_counter()
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        sorted_texts = [texts[i] for i in order]
+        if len(self.devices) > 1:
+            if self._process_pool is None:
+                self._process_pool = self._start_process_pool()
+            embeddings = self.model.encode_multi_process(
+                sorted_texts,
+                self._process_pool,
+                batch_size=self.encode_batch_size,
+                chunk_size=max(self.encode_batch_size, math.ceil(len(texts) / len(self.devices))),
+            )
+        else:
+            embeddings = self.model.encode(sorted_texts, batch_size=self.encode_batch_size)
+        result = np.empty_like(embeddings)
+        result[order] = embeddings
+        self._encode_seconds += time.perf_counter() - start
+        self._chunks += len(texts)
+        return result
+
+    def _start_process_pool(self) -> Dict:
+        """
+        Start one worker per device, each limited to its share of the cores.
+
+        Without a limit every worker runs torch with a thread per core, so N
+        workers would compete with N * N threads. Thread settings already in the
+        environment are respected.
+        """
+        threads = str(max(1, (os.cpu_count() or 1) // len(self.devices)))
+        defaults = {name: threads for name in THREAD_ENV_VARS if name not in os.environ}
+        os.environ.update(defaults)
+        try:
+            return self.model.start_multi_process_pool(target_devices=self.devices)
+        finally:
+            for name in defaults:
+                os.environ.pop(name, None)
+
+    def submit_upsert(self, upsert: Callable[[], None], on_done: Optional[Callable[[], None]] = None) -> None:
+        """
+        Run an upsert in the background while the caller encodes the next batch.
+
+        ``on_done`` runs on the calling thread, in submission order, once the
+        upsert succeeded (e.g. to record the chunks in the manifest). Blocks while
+        ``max_pending_upserts`` upserts are in flight.
+        """
+        self._pending.append((self._upserts.submit(upsert), on_done))
+        while len(self._pending) > self.max_pending_upserts:
+            self._complete_oldest()
+
+    def _complete_oldest(self) -> None:
+        future, on_done = self._pending.popleft()
+        future.result()
+        if on_done is not None:
+            on_done()
+
+    def drain(self) -> None:
+        """Wait for every submitted upsert and run their callbacks."""
+        while self._pending:
+            self._complete_oldest()
+        self._finished_at = time.perf_counter()
+
+    def stats(self) -> Dict[str, float]:
+        """Chunks embedded, encode-only and end-to-end throughput in chunks/sec."""
+        wall = (self._finished_at or time.perf_counter()) - self._started_at if self._started_at else 0.0
+        return {
+            "chunks": self._chunks,
+            "devices": len(self.devices),
+            "encode_seconds": round(self._encode_seconds, 2),
+            "encode_chunks_per_sec": round(self._chunks / self._encode_seconds, 1) if self._encode_seconds else 0.0,
+            "wall_seconds": round(wall, 2),
+            "chunks_per_sec": round(self._chunks / wall, 1) if wall else 0.0,
+        }
+
+    def close(self) -> None:
+        """Finish pending upserts and stop the worker processes."""
+        try:
+            self.drain()
+        finally:
+            if self._process_pool is not None:
+                self.model.stop_multi_process_pool(self._process_pool)
+                self._process_pool = None
+            self._upserts.shutdown(wait=True)
@@ -1,50 +1,168 @@
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Union
+from fastapi import Request
 from google.generativeai import GenerativeModel, configure
+import asyncio
 import logging
 from app.prompts.personas import PERSONA_PROMPTS
+from app.services.context_budget import ContextBudget
 
 
-def _format_history(prompt: str, history: List[str]) -> list:
+History = List[Union[str, Dict[str, str]]]
+
+# Returned in place of a model answer, so callers can tell them apart (e.g. to not cache them)
+EMPTY_RESPONSE = "Sorry, I couldn't generate a response."
+ERROR_RESPONSE = "Sorry, there was an error processing your request."
+FALLBACK_RESPONSES = (EMPTY_RESPONSE, ERROR_RESPONSE)
+
+
+def _format_history(prompt: str, history: History) -> list:
     """
     Format the chat history for Gemini API. The first message is the persona prompt as a 'user' message.
-    All history items are treated as user messages for simplicity.
+    Plain string history items are treated as user messages; session turns
+    ({"role": "user" | "model", "text": ...}) keep their role.
     """
     formatted = []
     # Add persona prompt as the first user message
     formatted.append({"role": "user", "parts": [prompt]})
-    # Add each history message as a user message
     for msg in history:
-        formatted.append({"role": "user", "parts": [msg]})
+        if isinstance(msg, dict):
+            formatted.append({"role": msg["role"], "parts": [msg["text"]]})
+        else:
+            formatted.append({"role": "user", "parts": [msg]})
     return formatted
 
 class GeminiService:
-    def __init__(self, api_key: str):
+    """
+    Process-wide Gemini client.
+
+    One instance is created at app startup (see the lifespan in app.main) so the
+    configured client and its connections are reused by every request. A
+    semaphore caps concurrent model calls and ``aclose`` lets in-flight calls
+    finish on shutdown. History is trimmed to the token budget of
+    ``context_budget`` before every call.
+    """
+
+    def __init__(self, api_key: str, max_concurrency: int = 16, context_budget: Optional[ContextBudget] = None):
         configure(api_key=api_key)
         self.model = GenerativeModel('gemini-2.5-flash')
+        self.max_concurrency = max_concurrency
+        self.context_budget = context_budget or ContextBudget()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight = 0
+        self._closed = False
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Hold one of the ``max_concurrency`` model call slots."""
+        if self._closed:
+            raise RuntimeError("GeminiService is shutting down")
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            # Semaphores are bound to the loop they are first used on
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                yield
+            finally:
+                self._in_flight -= 1
+
+    async def aclose(self, timeout: float = 30.0) -> None:
+        """
+        Stop accepting new calls and wait (up to ``timeout`` seconds) for in-flight ones.
+        """
+        self._closed = True
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self._in_flight and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.05)
+        if self._in_flight:
+            logging.warning(f"GeminiService closed with {self._in_flight} call(s) still in flight")
 
-    async def generate_response(self, message: str, history: List[str], persona: str) -> str:
+    async def generate_response(self, message: str, history: History, persona: str) -> str:
         try:
             prompt = PERSONA_PROMPTS.get(persona, PERSONA_PROMPTS["professional"])
+            history = self.context_budget.fit(prompt, message, history)
             formatted_history = _format_history(prompt, history)
             chat = self.model.start_chat(history=formatted_history)
-            response = await chat.send_message_async({"role": "user", "parts": [message]})
+            async with self._slot():
+                response = await chat.send_message_async({"role": "user", "parts": [message]})
             # Extract text from Gemini response
             if hasattr(response, 'text'):
                 return response.text
             elif hasattr(response, 'candidates') and response.candidates:
                 return response.candidates[0].text
             else:
-                return "Sorry, I couldn't generate a response."
+                return EMPTY_RESPONSE
         except Exception as e:
             logging.error(f"GeminiService error: {e}")
             print("GeminiService error:", e)
-            return "Sorry, there was an error processing your request."
+            return ERROR_RESPONSE
+
+    async def stream_response(self, message: str, history: History, persona: str) -> AsyncIterator[str]:
+        """
+        Stream the model's reply as text fragments as soon as Gemini produces them.
+
+        If the call fails, the last fragment is ERROR_RESPONSE (after whatever
+        text was already sent); if the model produces no text, the only
+        fragment is EMPTY_RESPONSE, as ``generate_response`` returns it.
+
+        Yields:
+            str: Successive pieces of the response text
+        """
+        produced = False
+        try:
+            prompt = PERSONA_PROMPTS.get(persona, PERSONA_PROMPTS["professional"])
+            history = self.context_budget.fit(prompt, message, history)
+            formatted_history = _format_history(prompt, history)
+            chat = self.model.start_chat(history=formatted_history)
+            async with self._slot():
+                response = await chat.send_message_async({"role": "user", "parts": [message]}, stream=True)
+                async for chunk in response:
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. safety metadata only)
+                        continue
+                    if text:
+                        produced = True
+                        yield text
+        except Exception as e:
+            logging.error(f"GeminiService streaming error: {e}")
+            yield ERROR_RESPONSE
+            return
+        if not produced:
+            yield EMPTY_RESPONSE
 
 
 from app.core.config import settings
 
-def get_gemini_service():
+def create_gemini_service() -> GeminiService:
+    """
+    Build the process-wide GeminiService from settings.
+    """
+    return GeminiService(
+        api_key=settings.GEMINI_API_KEY,
+        max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+        context_budget=ContextBudget(
+            max_tokens=settings.CONTEXT_TOKEN_BUDGET,
+            recent_turns=settings.HISTORY_RECENT_TURNS,
+            summary_max_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS
+        )
+    )
+
+def get_gemini_service(request: Request) -> GeminiService:
     """
     Dependency injector for the GeminiService.
+
+    Returns the instance created in the app lifespan. If the lifespan has not
+    run (e.g. a TestClient used outside a ``with`` block) one is created on
+    first use and shared from then on.
     """
-    return GeminiService(api_key=settings.GEMINI_API_KEY)
\ No newline at end of file
+    service = getattr(request.app.state, "gemini_service", None)
+    if service is None:
+        service = create_gemini_service()
+        request.app.state.gemini_service = service
+    return service
@@ -0,0 +1,163 @@
+"""
+Pluggable HTML extraction for scraped articles.
+
+Scrapers only need two things from a page: the first ``<h1>`` and the text of
+one content container (a CSS selector from the domain config). Every engine
+returns exactly that, with text joined like BeautifulSoup's
+``get_text(separator='\\n', strip=True)`` and the title's parts joined by
+single spaces:
+
+- ``soup``: BeautifulSoup with the pure-Python ``html.parser`` (the original path)
+- ``lxml``: libxml2 parsing with compiled CSS selectors (needs ``lxml`` and ``cssselect``)
+- ``selectolax``: the Lexbor-based parser, fastest when installed (optional)
+
+``get_extractor("auto")`` picks the fastest engine that is installed.
+"""
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional
+
+SKIPPED_TAGS = {"script", "style", "template", "noscript"}
+
+
+class Extracted(NamedTuple):
+    title: Optional[str]  # text of the first <h1>, if any
+    text: Optional[str]   # text of the content container, None if it was not found
+
+
+def _title(text: str) -> str:
+    """Collapse the whitespace of a title joined from its inline parts."""
+    return " ".join(text.split())
+
+
+class HTMLExtractor(ABC):
+    """Base class: extract the title and one content container from a page."""
+
+    name = "base"
+
+    @abstractmethod
+    def extract(self, html: str, content_selector: str) -> Extracted:
+        """
+        Args:
+            html: Page markup
+            content_selector: CSS selector of the content container
+
+        Returns:
+            The page title and the container text
+        """
+
+
+class SoupExtractor(HTMLExtractor):
+    def __init__(self, parser: str = "html.parser"):
+        """
+        Args:
+            parser: BeautifulSoup tree builder ("html.parser", "lxml", ...)
+        """
+        from bs4 import BeautifulSoup
+        self._soup = BeautifulSoup
+        self.parser = parser
+        self.name = "soup" if parser == "html.parser" else f"soup-{parser}"
+
+    def extract(self, html: str, content_selector: str) -> Extracted:
+        soup = self._soup(html, self.parser)
+        h1 = soup.find('h1')
+        content = soup.select_one(content_selector)
+        return Extracted(
+            _title(h1.get_text(separator=' ', strip=True)) if h1 else None,
+            content.get_text(separator='\n', strip=True) if content else None,
+        )
+
+
+class LxmlExtractor(HTMLExtractor):
+    name = "lxml"
+
+    def __init__(self):
+        try:
+            import lxml.html
+            from lxml.cssselect import CSSSelector
+        except ImportError as e:
+            raise ImportError("The lxml extractor requires the 'lxml' and 'cssselect' packages") from e
+        self._fromstring = lxml.html.fromstring
+        self._selector = lru_cache(maxsize=64)(CSSSelector)
+
+    @staticmethod
+    def _text(element, separator: str) -> str:
+        parts = []
+        for node in element.iter():
+            if isinstance(node.tag, str) and node.tag not in SKIPPED_TAGS and node.text:
+                parts.append(node.text)
+            if node is not element and node.tail:
+                parts.append(node.tail)
+        return separator.join(part.strip() for part in parts if part.strip())
+
+    def extract(self, html: str, content_selector: str) -> Extracted:
+        if not html.strip():
+            return Extracted(None, None)
+        tree = self._fromstring(html)
+        h1 = next(tree.iter('h1'), None)
+        content = self._selector(content_selector)(tree)
+        return Extracted(
+            _title(self._text(h1, ' ')) if h1 is not None else None,
+            self._text(content[0], '\n') if content else None,
+        )
+
+
+class SelectolaxExtractor(HTMLExtractor):
+    name = "selectolax"
+
+    def __init__(self):
+        try:
+            from selectolax.lexbor import LexborHTMLParser
+        except ImportError as e:
+            raise ImportError("The selectolax extractor requires the 'selectolax' package") from e
+        self._parser = LexborHTMLParser
+
+    def extract(self, html: str, content_selector: str) -> Extracted:
+        tree = self._parser(html)
+        h1 = tree.css_first('h1')
+        content = tree.css_first(content_selector)
+        text = None
+        if content is not None:
+            for node in content.css(",".join(SKIPPED_TAGS)):
+                node.decompose()
+            # Drop the empty parts selectolax keeps for whitespace-only text nodes
+            text = "\n".join(line for line in content.text(separator='\n', strip=True).split("\n") if line)
+        return Extracted(_title(h1.text(separator=' ', strip=True)) if h1 is not None else None, text)
+
+
+EXTRACTORS = {
+    "selectolax": SelectolaxExtractor,
+    "lxml": LxmlExtractor,
+    "soup": SoupExtractor,
+}
+
+
+@lru_cache(maxsize=None)
+def get_extractor(name: str = "auto") -> HTMLExtractor:
+    """
+    Return a shared extractor instance.
+
+    Args:
+        name: "selectolax", "lxml", "soup" or "auto" (fastest installed engine)
+    """
+    if name != "auto":
+        if name not in EXTRACTORS:
+            raise ValueError(f"Unknown HTML extractor: {name}")
+        return EXTRACTORS[name]()
+    for engine in EXTRACTORS.values():
+        try:
+            return engine()
+        except ImportError:
+            continue
+    raise ImportError("No HTML extractor available; install beautifulsoup4 or lxml")
+
+
+def available_extractors() -> Dict[str, HTMLExtractor]:
+    """All engines that can be constructed in this environment, by name."""
+    extractors = {}
+    for name in EXTRACTORS:
+        try:
+            extractors[name] = get_extractor(name)
+        except ImportError:
+            continue
+    return extractors
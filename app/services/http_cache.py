@@ -0,0 +1,76 @@
+"""
+On-disk HTTP cache for conditional requests.
+
+For every fetched URL the cache keeps the validators (ETag / Last-Modified)
+and a gzip-compressed copy of the body. The crawler sends them back as
+If-None-Match / If-Modified-Since, and on a 304 the cached body is reused.
+"""
+from pathlib import Path
+from typing import Dict, Iterator, Mapping, Optional
+import gzip
+import hashlib
+import json
+import os
+
+
+class HTTPCache:
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _paths(self, url: str) -> tuple:
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        folder = self.directory / key[:2]
+        return folder / f"{key}.json", folder / f"{key}.html.gz"
+
+    def _meta(self, url: str) -> Optional[Dict]:
+        meta_path, body_path = self._paths(url)
+        if not meta_path.exists() or not body_path.exists():
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Validators to send with a GET for ``url`` (empty if nothing is cached)."""
+        meta = self._meta(url)
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def load(self, url: str) -> Optional[str]:
+        """Return the cached body for ``url``, or None."""
+        if self._meta(url) is None:
+            return None
+        _, body_path = self._paths(url)
+        try:
+            with gzip.open(body_path, 'rt', encoding='utf-8') as f:
+                return f.read()
+        except (OSError, EOFError):
+            return None
+
+    def urls(self) -> Iterator[str]:
+        """URLs of all cached pages."""
+        for meta_path in self.directory.glob("*/*.json"):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                yield json.load(f)["url"]
+
+    def store(self, url: str, headers: Mapping[str, str], text: str) -> None:
+        """Cache a 200 response if it carries a validator."""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        meta_path, body_path = self._paths(url)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        # Body first, then metadata: a cache entry only counts once both exist
+        tmp_body = body_path.with_suffix(".tmp")
+        with gzip.open(tmp_body, 'wt', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_body, body_path)
+        tmp_meta = meta_path.with_suffix(".tmp")
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump({"url": url, "etag": etag, "last_modified": last_modified}, f)
+        os.replace(tmp_meta, meta_path)
@@ -0,0 +1,201 @@
+"""
+Helpers for the bulk ingestion pipeline: parallel PDF text extraction,
+fixed-size batching of chunk streams, content-hash chunk ids with a manifest
+of what is already stored, and a checkpoint file so interrupted runs can resume.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import hashlib
+import json
+import os
+import time
+
+
+def chunk_id(source: str, text: str) -> str:
+    """
+    Deterministic vector id for a chunk: a hash of its source and content.
+
+    The same chunk always maps to the same id, so re-ingestion overwrites
+    instead of duplicating, and chunks from different corpora never collide.
+    """
+    return hashlib.sha256(f"{source}\n{text}".encode('utf-8')).hexdigest()[:32]
+
+
+def extract_pdf_text(pdf_path: str) -> Tuple[str, str]:
+    """
+    Extract the text of every page of a PDF.
+
+    Runs in worker processes, so it is a module-level function and errors are
+    reported rather than raised.
+
+    Args:
+        pdf_path: Path to the PDF file
+
+    Returns:
+        (pdf_path, text), with empty text if the file could not be read
+    """
+    import PyPDF2
+
+    full_text = ""
+    try:
+        with open(pdf_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            for page in pdf_reader.pages:
+                text = page.extract_text()
+                if text:
+                    full_text += text + "\n\n"
+    except Exception as e:
+        print(f"Error processing PDF {pdf_path}: {str(e)}")
+    return pdf_path, full_text
+
+
+def iter_pdf_texts(pdf_files: List[Path], workers: Optional[int] = None) -> Iterator[Tuple[Path, str]]:
+    """
+    Extract PDF texts across a process pool, yielding them in input order.
+
+    At most two files per worker are in flight, and a new one is submitted
+    as each result is taken, so extracted texts never pile up in memory when
+    the consumer (embedding) is slower than the parsers.
+
+    Args:
+        pdf_files: PDFs to parse
+        workers: Number of processes (defaults to the CPU count); 1 parses in-process
+
+    Yields:
+        (pdf_path, text) per file
+    """
+    if workers == 1 or len(pdf_files) <= 1:
+        for pdf_path in pdf_files:
+            yield pdf_path, extract_pdf_text(str(pdf_path))[1]
+        return
+    workers = workers or os.cpu_count() or 1
+    remaining = iter(pdf_files)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque(
+            (pdf_path, executor.submit(extract_pdf_text, str(pdf_path)))
+            for pdf_path in islice(remaining, 2 * workers)
+        )
+        while in_flight:
+            pdf_path, future = in_flight.popleft()
+            text = future.result()[1]
+            for next_path in islice(remaining, 1):
+                in_flight.append((next_path, executor.submit(extract_pdf_text, str(next_path))))
+            yield pdf_path, text
+
+
+def batched(items: Iterable[Dict], batch_size: int) -> Iterator[List[Dict]]:
+    """Yield successive lists of up to ``batch_size`` items from any iterable."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class IngestionCheckpoint:
+    """
+    JSON file recording which source files have been fully embedded and stored.
+
+    A file counts as done only while its size and modification time match what
+    was recorded, so edited files are picked up again on the next run.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._completed: Dict[str, Dict[str, float]] = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._completed = json.load(f).get("completed", {})
+
+    @staticmethod
+    def _fingerprint(file_path: Path) -> Dict[str, float]:
+        stat = file_path.stat()
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    def is_done(self, file_path: Path) -> bool:
+        recorded = self._completed.get(str(file_path))
+        return recorded is not None and recorded == self._fingerprint(file_path)
+
+    def mark_done(self, file_paths: Iterable[Path]) -> None:
+        """Record files as completed and persist the checkpoint atomically."""
+        for file_path in file_paths:
+            self._completed[str(file_path)] = self._fingerprint(file_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"completed": self._completed}, f)
+        os.replace(tmp_path, self.path)
+
+    def reset(self) -> None:
+        """Forget all progress, e.g. after the index was cleared."""
+        self._completed = {}
+        if self.path.exists():
+            self.path.unlink()
+
+
+class IngestManifest:
+    """
+    Local record of which chunk ids are stored for each source (file, URL or dataset).
+
+    Comparing a fresh ingest against the manifest tells which chunks are new
+    (embed and upsert), unchanged (skip) or vanished (delete).
+    """
+
+    def __init__(self, path: str, save_interval_seconds: float = 30.0):
+        self.path = Path(path)
+        self.save_interval_seconds = save_interval_seconds
+        self._sources: Dict[str, Dict] = {}
+        self._last_save = 0.0
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for source, entry in json.load(f).get("sources", {}).items():
+                    self._sources[source] = {"type": entry["type"], "ids": set(entry["ids"])}
+
+    def ids(self, source: str) -> Set[str]:
+        entry = self._sources.get(source)
+        return set(entry["ids"]) if entry else set()
+
+    def sources(self, source_type: str) -> List[str]:
+        return [source for source, entry in self._sources.items() if entry["type"] == source_type]
+
+    def add(self, source: str, source_type: str, ids: Iterable[str]) -> None:
+        """Record additional stored ids for a source."""
+        entry = self._sources.setdefault(source, {"type": source_type, "ids": set()})
+        entry["ids"].update(ids)
+
+    def set(self, source: str, source_type: str, ids: Iterable[str]) -> None:
+        """Replace the stored ids of a source."""
+        self._sources[source] = {"type": source_type, "ids": set(ids)}
+
+    def remove(self, source: str) -> Set[str]:
+        """Forget a source, returning the ids it had."""
+        entry = self._sources.pop(source, None)
+        return entry["ids"] if entry else set()
+
+    def save_due(self) -> bool:
+        """Whether the save interval has passed since the last save."""
+        return time.monotonic() - self._last_save >= self.save_interval_seconds
+
+    def save(self, force: bool = True) -> None:
+        """Persist atomically; with force=False, at most once per save interval."""
+        if not force and not self.save_due():
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"sources": {
+                source: {"type": entry["type"], "ids": sorted(entry["ids"])}
+                for source, entry in self._sources.items()
+            }}, f)
+        os.replace(tmp_path, self.path)
+        self._last_save = time.monotonic()
+
+    def reset(self) -> None:
+        """Forget everything, e.g. after the index was cleared."""
+        self._sources = {}
+        if self.path.exists():
+            self.path.unlink()
@@ -0,0 +1,374 @@
+"""
+BM25 inverted index for lexical retrieval.
+
+Dense embeddings blur exact terms ("PTSD", "DBT", worksheet titles), so the
+same chunks that go into the vector store are also indexed by their words.
+On disk the index is a directory containing:
+    index.npz       sorted vocabulary and CSR postings (per term: document
+                    indices and term frequencies), document lengths, chunk ids,
+                    the byte offset of each document record and per-document
+                    codes of the filterable metadata fields
+    docs-<n>.jsonl  one {"id", "text", "metadata"} line per document, read
+                    on demand by byte offset
+
+Loading reads only the arrays, so it takes milliseconds; queries score just
+the postings of the query terms. An index reloads when another process (an
+ingestion script next to the API) replaced index.npz, and a flush keeps the
+previous docs file, so readers still holding that generation can finish.
+``PartitionedLexicalIndex`` keeps one index per corpus, like the vector store.
+"""
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import math
+import os
+import re
+import threading
+
+import numpy as np
+
+from app.services.partitions import FILTER_FIELDS, partition_of, split_filter
+
+_TOKEN = re.compile(r"\w+")
+MAX_TERM_LENGTH = 32  # Longer "words" are ids or hashes; they would also widen the vocabulary array
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i if in into is it its me my no not of on or "
+    "so that the their them then there these they this to was we were what when which who will with "
+    "you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords."""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS and len(t) <= MAX_TERM_LENGTH]
+
+
+class BM25Index:
+    INDEX_FILE = "index.npz"
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            path: Directory of the index
+            k1: Term-frequency saturation
+            b: Document-length normalization
+        """
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._vocab = np.array([], dtype=str)
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._postings_doc = np.zeros(0, dtype=np.int32)
+        self._postings_tf = np.zeros(0, dtype=np.float32)
+        self._doc_len = np.zeros(0, dtype=np.float32)
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._offsets = np.zeros(0, dtype=np.int64)
+        # Per filterable field: sorted distinct values and each document's value index
+        self._field_values: Dict[str, np.ndarray] = {}
+        self._field_codes: Dict[str, np.ndarray] = {}
+        self._docs_file: Optional[Path] = None
+        self._generation = 0
+        self._loaded_from: Optional[Tuple[int, int]] = None  # (inode, mtime) of the index file
+        # Changes since the last flush
+        self._pending: Dict[str, Tuple[str, Dict]] = {}
+        self._deleted: set = set()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return (chunk_id in self._positions and chunk_id not in self._deleted) or chunk_id in self._pending
+
+    def _index_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = (self.path / self.INDEX_FILE).stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _refresh(self) -> None:
+        """Reload if another process flushed since this one loaded the index."""
+        if self._index_stat() != self._loaded_from:
+            self._load()
+
+    def _load(self) -> None:
+        index_path = self.path / self.INDEX_FILE
+        loaded_from = self._index_stat()
+        if loaded_from is None:
+            return
+        with np.load(index_path) as data:
+            self._vocab = data["vocab"]
+            self._indptr = data["indptr"]
+            self._postings_doc = data["postings_doc"]
+            self._postings_tf = data["postings_tf"]
+            self._doc_len = data["doc_len"]
+            self._offsets = data["offsets"]
+            self._ids = data["ids"].tolist()
+            self._generation = int(data["generation"])
+            for field in FILTER_FIELDS:
+                if f"{field}_values" in data.files:
+                    self._field_values[field] = data[f"{field}_values"]
+                    self._field_codes[field] = data[f"{field}_codes"]
+        self._positions = {chunk_id: i for i, chunk_id in enumerate(self._ids)}
+        self._docs_file = self.path / f"docs-{self._generation}.jsonl"
+        self._loaded_from = loaded_from
+
+    def add(self, chunk_id: str, text: str, metadata: Dict) -> None:
+        """Index a chunk (searchable after ``flush``). Re-adding an id replaces it."""
+        with self._lock:
+            self._pending[chunk_id] = (text, metadata)
+            self._deleted.discard(chunk_id)
+
+    def remove(self, chunk_ids: Iterable[str]) -> None:
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self._pending.pop(chunk_id, None)
+                if chunk_id in self._positions:
+                    self._deleted.add(chunk_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending = {}
+            self._deleted = set(self._ids)
+
+    def _iter_stored(self):
+        """(id, record) of every flushed document, in index order."""
+        if self._docs_file is None or not self._docs_file.exists():
+            return
+        with open(self._docs_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                yield record["id"], record
+
+    def flush(self) -> None:
+        """Rebuild the on-disk index with the pending changes and reload it."""
+        with self._lock:
+            if not self._pending and not self._deleted:
+                return
+            pending, deleted = self._pending, self._deleted
+            self._pending, self._deleted = {}, set()
+            self._refresh()
+
+            generation = self._generation + 1
+            self.path.mkdir(parents=True, exist_ok=True)
+            docs_path = self.path / f"docs-{generation}.jsonl"
+            ids, offsets, doc_len = [], [], []
+            fields: Dict[str, List[str]] = {field: [] for field in FILTER_FIELDS}
+            postings: Dict[str, List[Tuple[int, int]]] = {}
+
+            def index_document(f, chunk_id: str, text: str, metadata: Dict) -> None:
+                offsets.append(f.tell())
+                line = json.dumps({"id": chunk_id, "text": text, "metadata": metadata}, ensure_ascii=False, default=str) + "\n"
+                f.write(line.encode('utf-8'))
+                terms = Counter(tokenize(text))
+                doc = len(ids)
+                ids.append(chunk_id)
+                doc_len.append(sum(terms.values()))
+                for field, values in fields.items():
+                    values.append(str(metadata.get(field, "")))
+                for term, tf in terms.items():
+                    postings.setdefault(term, []).append((doc, tf))
+
+            with open(docs_path, 'wb') as f:
+                for chunk_id, record in self._iter_stored():
+                    if chunk_id not in deleted and chunk_id not in pending:
+                        index_document(f, chunk_id, record["text"], record["metadata"])
+                for chunk_id, (text, metadata) in pending.items():
+                    index_document(f, chunk_id, text, metadata)
+
+            vocab = sorted(postings)
+            indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+            np.cumsum([len(postings[t]) for t in vocab], out=indptr[1:])
+            flat = [entry for term in vocab for entry in postings[term]]
+            field_arrays = {}
+            for field, values in fields.items():
+                distinct, codes = np.unique(np.array(values, dtype=str), return_inverse=True)
+                field_arrays[f"{field}_values"] = distinct
+                field_arrays[f"{field}_codes"] = codes.astype(np.int32)
+            tmp_path = self.path / (self.INDEX_FILE + ".tmp")
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    vocab=np.array(vocab, dtype=str),
+                    indptr=indptr,
+                    postings_doc=np.array([d for d, _ in flat], dtype=np.int32),
+                    postings_tf=np.array([tf for _, tf in flat], dtype=np.float32),
+                    doc_len=np.array(doc_len, dtype=np.float32),
+                    offsets=np.array(offsets, dtype=np.int64),
+                    ids=np.array(ids, dtype=str),
+                    generation=np.array(generation),
+                    **field_arrays,
+                )
+            os.replace(tmp_path, self.path / self.INDEX_FILE)
+            previous_docs = self._docs_file
+            self._load()
+            # Keep the generation just replaced for readers that have not reloaded yet
+            for docs in self.path.glob("docs-*.jsonl"):
+                if docs not in (self._docs_file, previous_docs):
+                    docs.unlink(missing_ok=True)
+
+    def _documents(self, positions: Iterable[int]) -> List[Dict]:
+        """Records of flushed documents; the caller holds the lock, so offsets and file match."""
+        records = []
+        with open(self._docs_file, 'rb') as f:
+            for position in positions:
+                f.seek(int(self._offsets[position]))
+                records.append(json.loads(f.readline()))
+        return records
+
+    def _allowed(self, filter: Dict[str, Iterable[str]]) -> np.ndarray:
+        """Boolean mask of the documents passing the filter."""
+        allowed = np.ones(len(self._ids), dtype=bool)
+        for field, accepted in filter.items():
+            values = self._field_values.get(field, np.array([], dtype=str))
+            wanted = np.flatnonzero(np.isin(values, list(accepted)))
+            allowed &= np.isin(self._field_codes.get(field, np.zeros(len(self._ids), dtype=np.int32)), wanted)
+        return allowed
+
+    def query(self, text: str, top_k: int = 5, filter: Optional[Dict[str, Iterable[str]]] = None) -> List[Dict]:
+        """
+        Rank flushed documents by BM25 score.
+
+        Args:
+            text: The query text
+            top_k: Number of results to return
+            filter: Accepted values per field of FILTER_FIELDS
+
+        Returns:
+            Matches as {'id', 'score', 'metadata'} (metadata includes 'text'), best first
+        """
+        with self._lock:
+            self._refresh()
+            try:
+                return self._query(text, top_k, filter)
+            except FileNotFoundError:
+                # Another process flushed twice since the refresh
+                self._load()
+                return self._query(text, top_k, filter)
+
+    def _query(self, text: str, top_k: int, filter: Optional[Dict[str, Iterable[str]]]) -> List[Dict]:
+        n_docs = len(self._ids)
+        terms = list(dict.fromkeys(tokenize(text)))
+        if not n_docs or not terms:
+            return []
+        avg_len = float(self._doc_len.mean()) or 1.0
+        norm = self.k1 * (1 - self.b + self.b * self._doc_len / avg_len)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        positions = np.searchsorted(self._vocab, terms)
+        for term, position in zip(terms, positions):
+            if position >= len(self._vocab) or self._vocab[position] != term:
+                continue
+            start, end = self._indptr[position], self._indptr[position + 1]
+            docs = self._postings_doc[start:end]
+            tf = self._postings_tf[start:end]
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm[docs])
+
+        if filter:
+            scores[~self._allowed(filter)] = 0
+        candidates = np.flatnonzero(scores)
+        if not candidates.size:
+            return []
+        k = min(top_k, candidates.size)
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {
+                "id": record["id"],
+                "score": float(scores[position]),
+                "metadata": record["metadata"] | {"text": record["text"]},
+            }
+            for position, record in zip(top, self._documents(top))
+        ]
+
+
+class PartitionedLexicalIndex:
+    """
+    One ``BM25Index`` per partition, in sub-directories of ``path`` (the
+    unnamed partition "" lives in ``path`` itself).
+
+    Only partitions with changes are rebuilt on ``flush``. Scores come from
+    each partition's own term statistics, which is close enough for merging
+    the lists by score and fusing them with the dense ranking.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._partitions: Dict[str, BM25Index] = {}
+        if (self.path / BM25Index.INDEX_FILE).exists():
+            self.partition("")
+        for directory in self.path.glob("*"):
+            if (directory / BM25Index.INDEX_FILE).exists():
+                self.partition(directory.name)
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in self._partitions.values())
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return any(chunk_id in index for index in self._partitions.values())
+
+    def partitions(self) -> List[str]:
+        return sorted(self._partitions)
+
+    def partition(self, name: str) -> BM25Index:
+        """The index of a partition, opened on first use."""
+        with self._lock:
+            index = self._partitions.get(name)
+            if index is None:
+                index = self._partitions[name] = BM25Index(str(self.path / name if name else self.path))
+            return index
+
+    def add(self, chunk_id: str, text: str, metadata: Dict) -> None:
+        self.partition(partition_of(metadata)).add(chunk_id, text, metadata)
+
+    def remove(self, chunk_ids: Iterable[str], partition: Optional[str] = None) -> None:
+        """Remove chunks from one partition (and the unnamed one), or from all."""
+        chunk_ids = list(chunk_ids)
+        for name, index in list(self._partitions.items()):
+            if partition is None or name in (partition, ""):
+                index.remove(chunk_ids)
+
+    def clear(self, partition: Optional[str] = None) -> None:
+        for name, index in list(self._partitions.items()):
+            if partition is None or name == partition:
+                index.clear()
+
+    def flush(self) -> None:
+        for index in list(self._partitions.values()):
+            index.flush()
+
+    def query(self, text: str, top_k: int = 5, filter: Optional[Dict[str, Iterable[str]]] = None) -> List[Dict]:
+        """Best BM25 matches over the partitions the filter's 'type' allows (all by default)."""
+        partitions, rest = split_filter(filter)
+        matches = []
+        for name, index in list(self._partitions.items()):
+            if partitions is None or (name and name in partitions):
+                matches.extend(index.query(text, top_k, rest))
+            elif not name:
+                # Chunks indexed before partitioning are only told apart by their metadata
+                matches.extend(index.query(text, top_k, filter))
+        return sorted(matches, key=lambda m: -m["score"])[:top_k]
+
+
+def reciprocal_rank_fusion(rankings: List[List[Dict]], k: int = 60) -> List[Dict]:
+    """
+    Fuse ranked match lists: each match scores sum(1 / (k + rank)) over the lists it is in.
+
+    Args:
+        rankings: Match lists ({'id', 'score', 'metadata'}), best first
+        k: Damping constant; larger values flatten the rank weights
+
+    Returns:
+        The union of the matches, best fused score first, with 'score' set to it
+    """
+    fused: Dict[str, Dict] = {}
+    for ranking in rankings:
+        for rank, match in enumerate(ranking, 1):
+            entry = fused.setdefault(match["id"], {"id": match["id"], "score": 0.0, "metadata": match["metadata"]})
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda m: -m["score"])
@@ -0,0 +1,63 @@
+"""
+Partitioning of the knowledge base by corpus.
+
+Every chunk carries ``metadata['type']`` ('pdf', 'web' or 'hf'); the vector
+store and the lexical index keep one shard per type (a Pinecone namespace or a
+local sub-directory), so a search restricted to some corpora only touches their
+shards and each corpus can be rebuilt without the others. Chunks stored before
+partitioning live in the unnamed partition "".
+"""
+from typing import Dict, Iterable, Optional, Tuple, Union
+import re
+
+PARTITION_FIELD = "type"
+FILTER_FIELDS = (PARTITION_FIELD, "source")
+
+Filter = Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+
+def partition_of(metadata: Dict) -> str:
+    """The partition a chunk belongs to, safe for use as a directory name."""
+    return re.sub(r"[^\w-]", "_", str(metadata.get(PARTITION_FIELD) or ""))
+
+
+def normalize_filter(filter: Optional[Dict[str, Union[str, Iterable[str]]]]) -> Optional[Filter]:
+    """
+    Validate a metadata filter and make it hashable (for cache keys).
+
+    Args:
+        filter: Field -> accepted value or values, e.g. {"type": ["pdf", "web"]};
+            fields are combined with AND, values with OR
+
+    Returns:
+        Sorted ((field, values), ...) pairs, or None for no filter
+
+    Raises:
+        ValueError: For fields other than FILTER_FIELDS
+    """
+    if not filter:
+        return None
+    normalized = []
+    for field, values in filter.items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Cannot filter on '{field}' (supported: {', '.join(FILTER_FIELDS)})")
+        if isinstance(values, str):
+            values = [values]
+        normalized.append((field, tuple(sorted(set(values)))))
+    return tuple(sorted(normalized))
+
+
+def split_filter(filter: Optional[Dict]) -> Tuple[Optional[Tuple[str, ...]], Optional[Dict]]:
+    """
+    Separate the partition condition from the rest of a (normalized) filter.
+
+    Returns:
+        (partitions to search or None for all, remaining field conditions or None)
+    """
+    if not filter:
+        return None, None
+    rest = dict(filter)
+    partitions = rest.pop(PARTITION_FIELD, None)
+    if partitions is not None:
+        partitions = tuple(partition_of({PARTITION_FIELD: p}) for p in partitions)
+    return partitions, rest or None
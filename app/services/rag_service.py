@@ -1,44 +1,98 @@
 """
 RAG (Retrieval Augmented Generation) service for processing and retrieving therapy-related content.
 """
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
+import asyncio
+import logging
 import os
+import threading
+import time
 
-import PyPDF2
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone, ServerlessSpec
+from fastapi import Request
 from tqdm import tqdm
 import numpy as np
 
 from app.core.config import Settings
-from datasets import load_dataset
+from app.services.cache import TTLCache, normalize_query
+from app.services.chunking import BoilerplateFilter, LengthHistogram, TokenChunker, WebChunker
+from app.services.context_assembly import ContextAssembler
+from app.services.dedupe import MinHashDeduper
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedders import OnnxEmbedder, create_embedding_model
+from app.services.embedding_pool import EmbeddingPool, default_devices
+from app.services.ingestion import (
+    IngestManifest,
+    IngestionCheckpoint,
+    batched,
+    chunk_id,
+    extract_pdf_text,
+    iter_pdf_texts,
+)
+from app.services.lexical_index import PartitionedLexicalIndex, reciprocal_rank_fusion
+from app.services.partitions import Filter, normalize_filter
+from app.services.reranker import create_reranker
+from app.services.vector_store import create_vector_store
+
+RETRIEVAL_MODES = ("dense", "sparse", "hybrid")
 
 class RAGService:
+    UPSERT_BATCH_SIZE = 100  # Vectors per vector-store request
+
     def __init__(self, settings: Settings):
         """Initialize the RAG service with necessary components."""
         self.settings = settings
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')  # Efficient, good performance model
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=80,
-            separators=["\n\n", "\n", ". ", " ", ""]
+        # all-MiniLM-L6-v2 on PyTorch, or its int8 ONNX export (EMBEDDING_BACKEND)
+        self.model = create_embedding_model(settings)
+        # Chunks are measured in model tokens; the model reads max_seq_length
+        # tokens including [CLS]/[SEP], anything beyond would be truncated
+        self.model_max_tokens = self.model.max_seq_length - 2
+        self.chunker = TokenChunker(
+            self.model.tokenizer,
+            max_tokens=min(settings.CHUNK_MAX_TOKENS, self.model_max_tokens),
+            overlap_tokens=settings.CHUNK_OVERLAP_TOKENS,
+            histogram=LengthHistogram()
         )
-        
-        # Initialize Pinecone v4+
-        self.index_name = "therapy-knowledge"
-        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        
-        # Create index if it doesn't exist
-        if self.index_name not in self.pc.list_indexes().names():
-            self.pc.create_index(
-                name=self.index_name,
-                dimension=384,  # all-MiniLM-L6-v2 embedding dimension
-                metric="cosine",
-                spec=ServerlessSpec(cloud="aws", region="us-east-1")  # Adjust if needed
-            )
-        self.index = self.pc.Index(self.index_name)
+
+        # Pinecone or the in-process local index (see VECTOR_STORE_BACKEND),
+        # partitioned by corpus (metadata 'type')
+        self.vector_store = create_vector_store(settings)
+        # BM25 over the same chunks and partitions, for exact-term matches the embeddings miss
+        self.lexical_index = PartitionedLexicalIndex(settings.LEXICAL_INDEX_DIR)
+
+        # Bounded pool so CPU-bound query encoding never runs on the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.RAG_WORKER_THREADS,
+            thread_name_prefix="rag-embed"
+        )
+        self.embedding_batcher = EmbeddingBatcher(
+            self.embed_queries,
+            executor=self._executor,
+            max_batch_size=settings.EMBED_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBED_BATCH_MAX_WAIT_MS
+        )
+
+        # Caches keyed by normalized query text (and top_k, mode and filter for result lists).
+        # Cleared whenever this service writes to the index; the TTL bounds
+        # staleness after a re-ingest from another process.
+        self.embedding_cache = TTLCache(settings.QUERY_CACHE_SIZE, settings.QUERY_CACHE_TTL_SECONDS)
+        self.results_cache = TTLCache(settings.QUERY_CACHE_SIZE, settings.QUERY_CACHE_TTL_SECONDS)
+        self.retrieval_mode = self._check_mode(settings.RETRIEVAL_MODE)
+        # Optional cross-encoder over a deeper candidate list (RERANK_ENABLED)
+        self.reranker = create_reranker(settings)
+        # Merges, deduplicates and trims retrieved chunks before they go into the prompt
+        self.chunk_embedding_cache = TTLCache(settings.QUERY_CACHE_SIZE, settings.QUERY_CACHE_TTL_SECONDS)
+        self.context_assembler = ContextAssembler(
+            self.embed_chunks,
+            max_tokens=settings.CONTEXT_MAX_TOKENS,
+            mmr_lambda=settings.CONTEXT_MMR_LAMBDA,
+            duplicate_threshold=settings.CONTEXT_DUPLICATE_THRESHOLD
+        )
+
+        # Loaded on first ingestion, the API never needs them
+        self._deduper: Optional[MinHashDeduper] = None
+        self._embedding_pool: Optional[EmbeddingPool] = None
 
     def process_pdf(self, pdf_path: Path) -> List[Dict[str, str]]:
         """
@@ -50,37 +104,70 @@ class RAGService:
         Returns:
             List of dictionaries containing text chunks and metadata
         """
+        _, full_text = extract_pdf_text(str(pdf_path))
+        return self._chunk_pdf_text(pdf_path, full_text)
+
+    def _chunk_pdf_text(self, pdf_path: Path, full_text: str) -> List[Dict[str, str]]:
+        """Split extracted PDF text into chunks with metadata."""
         chunks = []
-        try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                # Extract text from each page
-                full_text = ""
-                for page in pdf_reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        full_text += text + "\n\n"
-                
-                # Split text into chunks
-                text_chunks = self.text_splitter.split_text(full_text)
-                
-                # Create chunks with metadata
-                for chunk in text_chunks:
-                    chunks.append({
-                        'text': chunk,
-                        'metadata': {
-                            'source': str(pdf_path),
-                            'type': 'pdf',
-                            'title': pdf_path.stem
-                        }
-                    })
-                
-        except Exception as e:
-            print(f"Error processing PDF {pdf_path}: {str(e)}")
-        
+        for chunk in self.chunker.split_text(full_text, source=str(pdf_path)):
+            chunks.append({
+                'text': chunk,
+                'metadata': {
+                    'source': str(pdf_path),
+                    'type': 'pdf',
+                    'title': pdf_path.stem
+                }
+            })
         return chunks
 
+    def chunk_web_documents(self, documents: List[Dict], keep_sources: Optional[Iterable[str]] = None) -> List[Dict]:
+        """
+        Turn scraped page documents into chunks sized for the embedding model.
+
+        Lines repeated across BOILERPLATE_MIN_PAGES pages of a site are dropped
+        and the rest packed into chunks of up to CHUNK_MAX_TOKENS tokens. Pages
+        are counted together with those of earlier crawls (BOILERPLATE_STATE_PATH),
+        so pages skipped as unchanged still count.
+
+        Args:
+            documents: One {"text", "metadata"} dict per page
+            keep_sources: When given, the pages of earlier crawls that are neither
+                in ``documents`` nor listed here are forgotten (e.g. when pruning)
+
+        Returns:
+            Chunks with the metadata of their page
+        """
+        boilerplate = BoilerplateFilter(
+            min_pages=self.settings.BOILERPLATE_MIN_PAGES,
+            path=self.settings.BOILERPLATE_STATE_PATH
+        )
+        if keep_sources is not None:
+            current = {doc["metadata"]["source"] for doc in documents} | set(keep_sources)
+            boilerplate.forget([source for source in boilerplate.sources() if source not in current])
+        chunker = WebChunker(self.chunker, boilerplate=boilerplate)
+        chunks = chunker.chunk_documents(documents)
+        boilerplate.save()
+        dropped = sum(chunker.boilerplate.stats().values())
+        print(f"Chunked {len(documents)} pages into {len(chunks)} chunks ({dropped} boilerplate lines dropped)")
+        return chunks
+
+    def iter_pdf_chunks(self, pdf_files: List[Path], workers: Optional[int] = None) -> Iterator[tuple]:
+        """
+        Parse PDFs across a process pool and yield their chunks file by file.
+
+        Args:
+            pdf_files: PDFs to process
+            workers: Parser processes (defaults to INGEST_WORKERS, 0 = CPU count)
+
+        Yields:
+            (pdf_path, chunks) per file
+        """
+        if workers is None:
+            workers = self.settings.INGEST_WORKERS
+        for pdf_path, text in tqdm(iter_pdf_texts(pdf_files, workers), total=len(pdf_files), desc="Processing PDFs"):
+            yield pdf_path, self._chunk_pdf_text(pdf_path, text)
+
     def process_all_pdfs(self, directory: Path) -> List[Dict[str, str]]:
         """
         Process all PDFs in the given directory.
@@ -92,67 +179,576 @@ class RAGService:
             List of all chunks with metadata
         """
         all_chunks = []
-        pdf_files = list(directory.glob('**/*.pdf'))
-        
-        for pdf_path in tqdm(pdf_files, desc="Processing PDFs"):
-            chunks = self.process_pdf(pdf_path)
+        for _, chunks in self.iter_pdf_chunks(sorted(directory.glob('**/*.pdf'))):
             all_chunks.extend(chunks)
-            
         return all_chunks
 
-    def embed_and_store(self, chunks: List[Dict[str, str]]) -> None:
+    def ingest_pdfs(
+        self,
+        directory: Path,
+        manifest: IngestManifest,
+        checkpoint: Optional[IngestionCheckpoint] = None,
+        workers: Optional[int] = None
+    ) -> Dict[str, int]:
         """
-        Embed text chunks and store them in Pinecone.
-        
+        Incrementally sync every PDF in a directory into the vector store.
+
+        PDFs are parsed in parallel and their chunks flow through
+        ``sync_sources``: only new or changed chunks are embedded, chunks that
+        disappeared from a file are deleted, and so are the vectors of PDFs
+        removed from the directory. Files are recorded in the checkpoint once
+        all their chunks are stored and flushed to disk, and files already
+        recorded are skipped.
+
+        Args:
+            directory: Path to directory containing PDFs
+            manifest: Record of the chunk ids already stored per source
+            checkpoint: Progress file for resuming interrupted runs
+            workers: Parser processes (defaults to INGEST_WORKERS, 0 = CPU count)
+
+        Returns:
+            Counts of added, unchanged and deleted chunks
+        """
+        pdf_files = sorted(directory.glob('**/*.pdf'))
+        skipped: List[str] = []
+        on_stored = None
+        if checkpoint is not None:
+            pending = [p for p in pdf_files if not checkpoint.is_done(p)]
+            skipped = [str(p) for p in pdf_files if checkpoint.is_done(p)]
+            if skipped:
+                print(f"Resuming: skipping {len(skipped)} already ingested PDFs")
+            pdf_files = pending
+            on_stored = lambda sources: checkpoint.mark_done([Path(s) for s in sources])
+
+        groups = ((str(pdf_path), chunks) for pdf_path, chunks in self.iter_pdf_chunks(pdf_files, workers))
+        return self.sync_sources(
+            groups,
+            manifest,
+            source_type='pdf',
+            prune_missing=True,
+            keep_sources=skipped,
+            on_stored=on_stored
+        )
+
+    def _get_deduper(self) -> Optional[MinHashDeduper]:
+        if not self.settings.DEDUPE_ENABLED:
+            return None
+        if self._deduper is None:
+            self._deduper = MinHashDeduper(
+                self.settings.DEDUPE_INDEX_PATH,
+                threshold=self.settings.DEDUPE_THRESHOLD
+            )
+        return self._deduper
+
+    def sync_sources(
+        self,
+        groups: Iterable[Tuple[str, List[Dict]]],
+        manifest: IngestManifest,
+        source_type: str,
+        prune_missing: bool = False,
+        keep_sources: Iterable[str] = (),
+        on_stored: Optional[Callable[[List[str]], None]] = None
+    ) -> Dict[str, int]:
+        """
+        Bring the vector store in line with a stream of (source, chunks) groups.
+
+        Every chunk gets a content-hash id. Chunks whose id the manifest already
+        holds for that source are skipped; new ones are embedded and upserted in
+        INGEST_BATCH_SIZE batches; ids the manifest holds for a source that the
+        run no longer produced are deleted. A source may appear in several groups.
+        The manifest is only saved right after the vector store and lexical index
+        were flushed (at most once per save interval during the run), so it never
+        lists chunks that are not on disk. With DEDUPE_ENABLED, new chunks that
+        nearly duplicate a stored chunk (from any source or corpus) are dropped
+        before embedding. A chunk that only resembles a stored chunk of its own
+        source waits until the whole stream was read: it is kept if that chunk
+        is being replaced (an edit), and dropped if the run still produces it.
+
         Args:
-            chunks: List of dictionaries containing text chunks and metadata
+            groups: (source, chunks) pairs, streamed
+            manifest: Record of the chunk ids already stored per source
+            source_type: Corpus of these sources ('pdf', 'web', 'hf')
+            prune_missing: Also delete sources of this type that the run did not produce
+            keep_sources: Sources to leave untouched when pruning (e.g. skipped as unchanged)
+            on_stored: Called with the sources whose new chunks have all been stored
+                and flushed to disk
+
+        Returns:
+            Counts of added, unchanged, deleted and near-duplicate (not stored) chunks
         """
-        batch_size = 100  # Process in batches to manage memory
+        batch_size = self.settings.INGEST_BATCH_SIZE
+        deduper = self._get_deduper()
+        stats = {"added": 0, "unchanged": 0, "deleted": 0, "duplicates": 0}
+        produced: Dict[str, set] = {}
+        stored: Dict[str, set] = {}
+        deferred: Dict[str, Dict[str, Dict]] = {}
+        buffer: List[Dict] = []
+        buffer_owners: List[str] = []
+        buffered_sources: List[str] = []
+        unflushed_sources: List[str] = []
+
+        def persist() -> None:
+            """Write the stores to disk, then the manifest (and checkpoint) that describe them."""
+            self.vector_store.flush()
+            self.lexical_index.flush()
+            manifest.save()
+            if on_stored is not None and unflushed_sources:
+                on_stored(list(dict.fromkeys(unflushed_sources)))
+            unflushed_sources.clear()
+
+        def flush() -> None:
+            chunks, owners = list(buffer), list(buffer_owners)
+            sources = list(dict.fromkeys(buffered_sources))
+
+            # Runs once the batch is upserted, while later batches are encoding
+            def record() -> None:
+                for source, chunk in zip(owners, chunks):
+                    manifest.add(source, source_type, [chunk['id']])
+                unflushed_sources.extend(sources)
+                if manifest.save_due():
+                    persist()
+
+            self._submit_chunks(chunks, on_done=record)
+            stats["added"] += len(chunks)
+            buffer.clear()
+            buffer_owners.clear()
+            buffered_sources.clear()
+
+        for source, chunks in groups:
+            seen = produced.setdefault(source, set())
+            if source not in stored:
+                stored[source] = manifest.ids(source)
+            stored_ids = stored[source]
+            for chunk in chunks:
+                chunk['id'] = chunk_id(source, chunk['text'])
+                if chunk['id'] in seen:
+                    continue
+                if chunk['id'] in stored_ids:
+                    seen.add(chunk['id'])
+                    stats["unchanged"] += 1
+                    if deduper is not None:
+                        deduper.add(chunk['id'], chunk['text'])
+                    if chunk['id'] not in self.lexical_index:
+                        self.lexical_index.add(chunk['id'], chunk['text'], chunk['metadata'])
+                    continue
+                if deduper is not None:
+                    duplicate_of = deduper.check_and_add(chunk['id'], chunk['text'])
+                    if duplicate_of in stored_ids and duplicate_of not in seen:
+                        # Maybe the old version of an edited chunk: decide once the source is complete
+                        deferred.setdefault(source, {})[chunk['id']] = chunk
+                        continue
+                    if duplicate_of is not None:
+                        stats["duplicates"] += 1
+                        continue
+                seen.add(chunk['id'])
+                buffer.append(chunk)
+                buffer_owners.append(source)
+            if source not in deferred:
+                buffered_sources.append(source)
+            if len(buffer) >= batch_size:
+                flush()
+
+        # Stored chunks the run no longer produced are being replaced and must not
+        # count as originals of their edited versions
+        for source, pending in deferred.items():
+            seen = produced[source]
+            replaced = stored[source] - seen
+            for chunk in pending.values():
+                if deduper.check_and_add(chunk['id'], chunk['text'], ignore=replaced) is not None:
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(chunk['id'])
+                buffer.append(chunk)
+                buffer_owners.append(source)
+            buffered_sources.append(source)
+            if len(buffer) >= batch_size:
+                flush()
+        if buffered_sources:
+            flush()
+        if self._embedding_pool is not None:
+            self._embedding_pool.drain()
+
+        # Reconcile: delete chunks that vanished from their source
+        to_delete = set()
+        for source, ids in produced.items():
+            to_delete |= manifest.ids(source) - ids
+            manifest.set(source, source_type, ids)
+        if prune_missing:
+            keep = set(keep_sources)
+            for source in manifest.sources(source_type):
+                if source not in produced and source not in keep:
+                    to_delete |= manifest.remove(source)
+        for ids in batched(sorted(to_delete), 1000):
+            self.vector_store.delete(ids, partition=source_type)
+        stats["deleted"] = len(to_delete)
+
+        self.lexical_index.remove(to_delete, partition=source_type)
+        persist()
+        if deduper is not None:
+            deduper.remove(to_delete)
+            deduper.save()
+        self.invalidate_caches()
+        return stats
+
+    def embed_and_store(self, chunks: Iterable[Dict[str, str]]) -> int:
+        """
+        Embed text chunks and store them in the vector store.
+
+        Accepts any iterable (including generators) and embeds it in batches of
+        INGEST_BATCH_SIZE without materializing the whole stream. Prefer
+        ``sync_sources`` to skip chunks that are already stored.
         
-        for i in tqdm(range(0, len(chunks), batch_size), desc="Storing embeddings"):
-            batch = chunks[i:i + batch_size]
-            
-            # Generate embeddings for the batch
-            texts = [chunk['text'] for chunk in batch]
-            embeddings = self.model.encode(texts)
-            
-            # Prepare vectors for Pinecone
-            vectors = []
-            for j, embedding in enumerate(embeddings):
-                vector = {
-                    'id': f"chunk_{i+j}",
-                    'values': embedding.tolist(),
-                    'metadata': batch[j]['metadata'] | {'text': batch[j]['text']}
-                }
-                vectors.append(vector)
-            
-            # Upsert to Pinecone
-            self.index.upsert(vectors=vectors)
+        Args:
+            chunks: Dictionaries containing text chunks and metadata
 
-    def query(self, query_text: str, top_k: int = 5) -> List[Dict]:
+        Returns:
+            Number of chunks stored
+        """
+        stored = 0
+        for batch in tqdm(batched(chunks, self.settings.INGEST_BATCH_SIZE), desc="Storing embeddings"):
+            self._submit_chunks(batch)
+            stored += len(batch)
+        self._get_embedding_pool().drain()
+
+        self.vector_store.flush()
+        self.lexical_index.flush()
+        self.invalidate_caches()
+        return stored
+
+    def _get_embedding_pool(self) -> EmbeddingPool:
+        if self._embedding_pool is None:
+            # ONNX Runtime parallelizes internally, only PyTorch gets worker processes
+            if isinstance(self.model, OnnxEmbedder):
+                devices = ["cpu"]
+            else:
+                devices = default_devices(self.settings.EMBED_PROCESSES)
+            self._embedding_pool = EmbeddingPool(
+                self.model,
+                devices=devices,
+                encode_batch_size=self.settings.EMBED_ENCODE_BATCH_SIZE,
+                upsert_workers=self.settings.EMBED_UPSERT_WORKERS
+            )
+        return self._embedding_pool
+
+    def _submit_chunks(self, chunks: List[Dict], on_done: Optional[Callable[[], None]] = None) -> None:
+        """
+        Embed chunks on the embedding pool and upsert them in the background.
+
+        Chunks without an 'id' get a content-hash id from their source and text.
+
+        Args:
+            chunks: Chunks to store
+            on_done: Called on this thread once the upsert succeeded
+        """
+        pool = self._get_embedding_pool()
+        embeddings = pool.encode([chunk['text'] for chunk in chunks])
+
+        # Prepare vectors in the Pinecone upsert format
+        vectors = []
+        for chunk, embedding in zip(chunks, embeddings):
+            vectors.append({
+                'id': chunk.get('id') or chunk_id(chunk['metadata']['source'], chunk['text']),
+                'values': embedding.tolist(),
+                'metadata': chunk['metadata'] | {'text': chunk['text']}
+            })
+
+        def upsert() -> None:
+            for part in batched(vectors, self.UPSERT_BATCH_SIZE):
+                self.vector_store.upsert(vectors=part)
+            for vector, chunk in zip(vectors, chunks):
+                self.lexical_index.add(vector['id'], chunk['text'], chunk['metadata'])
+
+        pool.submit_upsert(upsert, on_done)
+
+    def embedding_pool_stats(self) -> Dict:
+        """Ingestion throughput of the embedding pool (empty before any ingestion)."""
+        return self._embedding_pool.stats() if self._embedding_pool is not None else {}
+
+    def close_embedding_pool(self) -> None:
+        """Finish pending upserts and stop the encoder processes."""
+        if self._embedding_pool is not None:
+            self._embedding_pool.close()
+            self._embedding_pool = None
+
+    def close(self) -> None:
+        """Release worker threads and processes."""
+        self.close_embedding_pool()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def embed_query(self, query_text: str) -> List[float]:
+        """
+        Generate the embedding for a single query.
+
+        Args:
+            query_text: The query text
+
+        Returns:
+            The query embedding as a list of floats
+        """
+        return self.model.encode(query_text).tolist()
+
+    def embed_queries(self, query_texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for several queries in one batched forward pass.
+
+        Args:
+            query_texts: The query texts
+
+        Returns:
+            One embedding per query, as lists of floats
+        """
+        return self.model.encode(query_texts).tolist()
+
+    @staticmethod
+    def _check_mode(mode: str) -> str:
+        mode = mode.lower()
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode} (expected one of {', '.join(RETRIEVAL_MODES)})")
+        return mode
+
+    def _resolve_mode(self, mode: Optional[str]) -> str:
+        """The requested mode, or RETRIEVAL_MODE; dense while the lexical index is empty."""
+        mode = self._check_mode(mode) if mode else self.retrieval_mode
+        if mode != "dense" and not len(self.lexical_index):
+            return "dense"
+        return mode
+
+    def _candidates(self, mode: str, top_k: int) -> int:
+        """Results to fetch per ranking; fusion needs a deeper list than it returns."""
+        return max(top_k, self.settings.HYBRID_CANDIDATES) if mode == "hybrid" else top_k
+
+    def _fuse(self, dense: List[Dict], sparse: List[Dict], top_k: int) -> List[Dict]:
+        return reciprocal_rank_fusion([dense, sparse], k=self.settings.RRF_K)[:top_k]
+
+    def embed_chunks(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed retrieved chunk texts, encoding the ones not cached in one batch.
+
+        Args:
+            texts: Chunk texts
+
+        Returns:
+            A (len(texts), dimension) array
+        """
+        embeddings = [self.chunk_embedding_cache.get(text) for text in texts]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = self.model.encode([texts[i] for i in missing])
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+                self.chunk_embedding_cache.set(texts[i], embedding)
+        return np.stack(embeddings)
+
+    async def aassemble_context(self, query_text: str, matches: List[Dict]) -> List[Dict]:
+        """
+        Prepare retrieved chunks for the prompt (see ContextAssembler): merge
+        overlapping chunks of a source, drop near-repeats in MMR order and trim
+        to CONTEXT_MAX_TOKENS. Returns ``matches`` unchanged when
+        CONTEXT_ASSEMBLY_ENABLED is off.
+
+        Args:
+            query_text: The query the chunks were retrieved for
+            matches: Chunks from ``aquery``
+
+        Returns:
+            The chunks to put into the prompt
+        """
+        if not self.settings.CONTEXT_ASSEMBLY_ENABLED or not matches:
+            return matches
+        query_embedding = await self.aembed_query(query_text)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.context_assembler.assemble, query_embedding, matches)
+
+    async def aembed_query(self, query_text: str) -> List[float]:
+        """
+        Embedding of a query off the event loop, through the embedding cache
+        (and coalesced with concurrent queries when EMBED_BATCHING_ENABLED).
+
+        Args:
+            query_text: The query text
+
+        Returns:
+            The embedding of the query, cached under its normalized text
+        """
+        key = normalize_query(query_text)
+        query_embedding = self.embedding_cache.get(key)
+        if query_embedding is None:
+            if self.settings.EMBED_BATCHING_ENABLED:
+                query_embedding = await self.embedding_batcher.embed(query_text)
+            else:
+                loop = asyncio.get_running_loop()
+                query_embedding = await loop.run_in_executor(self._executor, self.embed_query, query_text)
+            self.embedding_cache.set(key, query_embedding)
+        return query_embedding
+
+    def query(
+        self,
+        query_text: str,
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        rerank: Optional[bool] = None,
+        filter: Optional[Dict] = None
+    ) -> List[Dict]:
         """
         Query the knowledge base for relevant content.
         
         Args:
             query_text: The query text
             top_k: Number of results to return
+            mode: "dense", "sparse" or "hybrid" (default: RETRIEVAL_MODE)
+            rerank: Rerank RERANK_CANDIDATES results with the cross-encoder
+                (default: whenever RERANK_ENABLED)
+            filter: Accepted metadata values, e.g. {"type": ["pdf", "web"]} or
+                {"source": "..."}; a 'type' condition only searches those partitions
             
         Returns:
             List of relevant chunks with their metadata
         """
-        # Generate embedding for the query
-        query_embedding = self.model.encode(query_text).tolist()
-        
-        # Query Pinecone
-        results = self.index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True
-        )
-        
-        # Format results
+        mode = self._resolve_mode(mode)
+        key = normalize_query(query_text)
+        filter = normalize_filter(filter)
+        if not self._use_reranker(rerank):
+            return self._search(query_text, key, top_k, mode, filter)
+
+        cached = self._cached_matches((key, top_k, mode, filter, "rerank"))
+        if cached is not None:
+            return cached
+        candidates = self._search(query_text, key, self.settings.RERANK_CANDIDATES, mode, filter)
+        matches, reranked = self.reranker.rerank(query_text, candidates, top_k, self._executor)
+        if reranked:
+            self._cache_matches((key, top_k, mode, filter, "rerank"), matches)
+        return matches
+
+    async def aquery(
+        self,
+        query_text: str,
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        rerank: Optional[bool] = None,
+        filter: Optional[Dict] = None
+    ) -> List[Dict]:
+        """
+        Async variant of ``query`` that never blocks the event loop.
+
+        Encoding runs on the service's bounded worker pool (coalesced with
+        concurrent queries when EMBED_BATCHING_ENABLED) and the vector store
+        lookup goes through its non-blocking ``aquery``. In hybrid mode the
+        BM25 lookup runs on the worker pool concurrently with the dense path,
+        as does reranking.
+
+        Args:
+            query_text: The query text
+            top_k: Number of results to return
+            mode: "dense", "sparse" or "hybrid" (default: RETRIEVAL_MODE)
+            rerank: Rerank RERANK_CANDIDATES results with the cross-encoder
+                (default: whenever RERANK_ENABLED)
+            filter: Accepted metadata values, e.g. {"type": ["pdf", "web"]} or
+                {"source": "..."}; a 'type' condition only searches those partitions
+
+        Returns:
+            List of relevant chunks with their metadata
+        """
+        mode = self._resolve_mode(mode)
+        key = normalize_query(query_text)
+        filter = normalize_filter(filter)
+        if not self._use_reranker(rerank):
+            return await self._asearch(query_text, key, top_k, mode, filter)
+
+        cached = self._cached_matches((key, top_k, mode, filter, "rerank"))
+        if cached is not None:
+            return cached
+        candidates = await self._asearch(query_text, key, self.settings.RERANK_CANDIDATES, mode, filter)
+        matches, reranked = await self.reranker.arerank(query_text, candidates, top_k, self._executor)
+        # A timed-out rerank is not cached, the next request gets another try
+        if reranked:
+            self._cache_matches((key, top_k, mode, filter, "rerank"), matches)
+        return matches
+
+    def _use_reranker(self, rerank: Optional[bool]) -> bool:
+        return self.reranker is not None and rerank is not False
+
+    def _cached_matches(self, cache_key: tuple) -> Optional[List[Dict]]:
+        """Copies of cached matches, so callers cannot alter what others are served."""
+        cached = self.results_cache.get(cache_key)
+        return [dict(match) for match in cached] if cached is not None else None
+
+    def _cache_matches(self, cache_key: tuple, matches: List[Dict]) -> None:
+        self.results_cache.set(cache_key, tuple(dict(match) for match in matches))
+
+    def _search(self, query_text: str, key: str, top_k: int, mode: str, filter: Optional[Filter]) -> List[Dict]:
+        """
+        Retrieval for a query through the results cache, which is keyed on the
+        normalized query ``key``; the embedding is taken of ``query_text`` itself.
+        """
+        cached = self._cached_matches((key, top_k, mode, filter))
+        if cached is not None:
+            return cached
+
+        candidates = self._candidates(mode, top_k)
+        conditions = dict(filter) if filter else None
+        dense = sparse = []
+        if mode != "sparse":
+            query_embedding = self.embedding_cache.get(key)
+            if query_embedding is None:
+                query_embedding = self.embed_query(query_text)
+                self.embedding_cache.set(key, query_embedding)
+            dense = self.vector_store.query(query_embedding, top_k=candidates, filter=conditions)
+        if mode != "dense":
+            sparse = self.lexical_index.query(key, top_k=candidates, filter=conditions)
+
+        matches = self._format_matches(self._fuse(dense, sparse, top_k) if mode == "hybrid" else dense or sparse)
+        self._cache_matches((key, top_k, mode, filter), matches)
+        return matches
+
+    async def _asearch(self, query_text: str, key: str, top_k: int, mode: str, filter: Optional[Filter]) -> List[Dict]:
+        """Async ``_search``."""
+        cached = self._cached_matches((key, top_k, mode, filter))
+        if cached is not None:
+            return cached
+
+        candidates = self._candidates(mode, top_k)
+        conditions = dict(filter) if filter else None
+        loop = asyncio.get_running_loop()
+
+        async def dense_query() -> List[Dict]:
+            query_embedding = await self.aembed_query(query_text)
+            return await self.vector_store.aquery(query_embedding, top_k=candidates, filter=conditions)
+
+        def sparse_query() -> List[Dict]:
+            return self.lexical_index.query(key, top_k=candidates, filter=conditions)
+
+        if mode == "dense":
+            results = await dense_query()
+        elif mode == "sparse":
+            results = await loop.run_in_executor(self._executor, sparse_query)
+        else:
+            dense, sparse = await asyncio.gather(dense_query(), loop.run_in_executor(self._executor, sparse_query))
+            results = self._fuse(dense, sparse, top_k)
+
+        matches = self._format_matches(results)
+        self._cache_matches((key, top_k, mode, filter), matches)
+        return matches
+
+    def invalidate_caches(self) -> None:
+        """Drop cached query embeddings and results, e.g. after the index changed."""
+        self.embedding_cache.clear()
+        self.results_cache.clear()
+
+    def stats(self) -> Dict:
+        """Runtime metrics for the retrieval path."""
+        return {
+            "embedding_batcher": self.embedding_batcher.stats(),
+            "embedding_cache": self.embedding_cache.stats(),
+            "results_cache": self.results_cache.stats(),
+            "chunk_embedding_cache": self.chunk_embedding_cache.stats(),
+            "reranker": self.reranker.stats() if self.reranker is not None else {},
+        }
+
+    @staticmethod
+    def _format_matches(results: List[Dict]) -> List[Dict]:
+        """Flatten vector store matches into text/source/score dicts."""
         matches = []
-        for match in results['matches']:
+        for match in results:
             matches.append({
                 'text': match['metadata']['text'],
                 'source': match['metadata']['source'],
@@ -161,18 +757,46 @@ class RAGService:
             
         return matches
 
-    def clear_index(self) -> None:
-        """Clear all vectors from the Pinecone index."""
-        try:
-            self.index.delete(delete_all=True)
-        except Exception as e:
-            # Ignore 'Namespace not found' errors, re-raise others
-            if "Namespace not found" not in str(e):
-                raise 
+    def clear_index(self, source_type: Optional[str] = None, manifest: Optional[IngestManifest] = None) -> None:
+        """
+        Clear the vector store and lexical index, or only one corpus partition.
+
+        Args:
+            source_type: Partition to clear ('pdf', 'web', 'hf'); None clears everything
+            manifest: Manifest to forget the cleared sources in
+        """
+        self.vector_store.clear(source_type)
+        self.lexical_index.clear(source_type)
+        deduper = self._get_deduper()
+        if source_type is None:
+            if deduper is not None:
+                deduper.reset()
+            if manifest is not None:
+                manifest.reset()
+        elif manifest is not None:
+            removed = set()
+            for source in manifest.sources(source_type):
+                removed |= manifest.remove(source)
+            # Chunks of this corpus stored before partitioning
+            for ids in batched(sorted(removed), 1000):
+                self.vector_store.delete(ids, partition=source_type)
+            self.lexical_index.remove(removed, partition=source_type)
+            if deduper is not None:
+                deduper.remove(removed)
+                deduper.save()
+        self.vector_store.flush()
+        self.lexical_index.flush()
+        # Only once the deletions are on disk, or a crash would orphan the vectors
+        if source_type is not None and manifest is not None:
+            manifest.save()
+        self.invalidate_caches()
 
-    def process_hf_dataset(self, dataset_name: str, text_fields: list, metadata_fields: list = None, split: str = "train", chunk: bool = False) -> None:
+    def process_hf_dataset(self, dataset_name: str, text_fields: list, metadata_fields: list = None, split: str = "train", chunk: bool = False, manifest: Optional[IngestManifest] = None) -> None:
         """
-        Load a Hugging Face dataset (from hub or local folder), extract text and metadata, chunk if needed, and store in Pinecone.
+        Load a Hugging Face dataset (from hub or local folder), extract text and metadata, chunk if needed, and store in the vector store.
+
+        Rows are read in Arrow record batches and streamed into the vector store
+        batch by batch, so the dataset is never materialized as Python dicts.
 
         Args:
             dataset_name (str): Hugging Face dataset repo name or local folder path (e.g., 'nbertagnolli/counsel-chat' or 'local_counsel_chat')
@@ -180,37 +804,156 @@ class RAGService:
             metadata_fields (list, optional): List of field names to include as metadata
             split (str): Which split to use (default 'train')
             chunk (bool): Whether to chunk the text (default False)
+            manifest (IngestManifest, optional): When given, only new or changed rows are embedded
         """
-        import uuid
+        from datasets import load_dataset
 
         print(f"Loading dataset: {dataset_name} [{split}]")
         if dataset_name.endswith(".csv"):
             ds = load_dataset("csv", data_files=dataset_name)["train"]
         else:
             ds = load_dataset(dataset_name, split=split)
-        chunks = []
-        for i, row in enumerate(ds):
-            # Concatenate text fields
-            text = "\n".join([str(row[f]) for f in text_fields if f in row and row[f] is not None])
-            if not text.strip():
-                continue
-            # Optionally chunk
-            if chunk:
-                text_chunks = self.text_splitter.split_text(text)
-            else:
-                text_chunks = [text]
-            for chunk_text in text_chunks:
-                metadata = {"source": dataset_name, "type": "hf", "row_id": i}
-                if metadata_fields:
-                    for f in metadata_fields:
-                        if f in row:
-                            metadata[f] = row[f]
-                chunks.append({
-                    "text": chunk_text,
-                    "metadata": metadata
-                })
-        print(f"Prepared {len(chunks)} chunks from {dataset_name}")
-        if chunks:
-            self.embed_and_store(chunks)
+
+        groups = self._iter_hf_chunks(ds, dataset_name, text_fields, metadata_fields or [], chunk)
+        if manifest is not None:
+            stats = self.sync_sources(groups, manifest, source_type='hf')
+            print(f"{dataset_name}: {stats['added']} added, {stats['unchanged']} unchanged, {stats['deleted']} deleted, {stats['duplicates']} near-duplicates skipped")
         else:
-            print(f"No valid chunks found for {dataset_name}") 
\ No newline at end of file
+            stored = self.embed_and_store(c for _, chunks in groups for c in chunks)
+            print(f"{dataset_name}: {stored} chunks stored")
+
+    def _iter_hf_chunks(
+        self,
+        ds,
+        dataset_name: str,
+        text_fields: list,
+        metadata_fields: list,
+        chunk: bool
+    ) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        Turn a dataset into chunks, one Arrow record batch at a time.
+
+        Each batch arrives as columns; texts are joined per row and split with a
+        single batched tokenizer call, so memory stays bounded by HF_BATCH_SIZE.
+
+        Yields:
+            (dataset_name, chunks) per batch, for ``sync_sources``
+        """
+        text_columns = [f for f in text_fields if f in ds.column_names]
+        meta_columns = [f for f in metadata_fields if f in ds.column_names]
+        if not text_columns:
+            print(f"No text fields {text_fields} in {dataset_name}")
+            return
+        columns = list(dict.fromkeys(text_columns + meta_columns))
+        row_offset = 0
+        prepared = 0
+        progress = tqdm(total=len(ds), desc=f"Chunking {dataset_name}", unit="rows")
+        for batch in ds.select_columns(columns).iter(batch_size=self.settings.HF_BATCH_SIZE):
+            rows = len(batch[columns[0]])
+            texts = [
+                "\n".join(str(value) for value in values if value is not None)
+                for values in zip(*(batch[f] for f in text_columns))
+            ]
+            kept = [j for j, text in enumerate(texts) if text.strip()]
+            # Chunk if asked to; otherwise only split rows the model would truncate
+            split = self.chunker.split_texts(
+                [texts[j] for j in kept],
+                [dataset_name] * len(kept),
+                max_tokens=None if chunk else self.model_max_tokens
+            )
+            chunks = []
+            for j, text_chunks in zip(kept, split):
+                metadata = {"source": dataset_name, "type": "hf", "row_id": row_offset + j}
+                for f in meta_columns:
+                    metadata[f] = batch[f][j]
+                chunks.extend({"text": chunk_text, "metadata": metadata} for chunk_text in text_chunks)
+            row_offset += rows
+            prepared += len(chunks)
+            progress.update(rows)
+            yield dataset_name, chunks
+        progress.close()
+        print(f"Prepared {prepared} chunks from {dataset_name}") 
+
+
+class RAGServiceProvider:
+    """
+    Builds the RAGService once, off the event loop, on warm-up or first use.
+
+    Loading the embedding model and connecting to the vector store takes
+    seconds, so the app starts without it: ``start`` kicks off a background
+    load, ``get`` waits for it (starting it if needed) and ``ready`` tells the
+    readiness probe whether requests can be served without waiting.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._future: Optional[Future] = None
+        self.load_seconds: Optional[float] = None
+
+    def start(self) -> Future:
+        """Begin loading in a background thread, unless already loading or loaded."""
+        with self._lock:
+            if self._future is None or (self._future.done() and self._future.exception() is not None):
+                self._future = Future()
+                threading.Thread(target=self._load, args=(self._future,), name="rag-warmup", daemon=True).start()
+            return self._future
+
+    def _load(self, future: Future) -> None:
+        started = time.perf_counter()
+        try:
+            service = RAGService(self.settings)
+        except BaseException as e:
+            logging.error(f"RAG service failed to load: {e}")
+            future.set_exception(e)
+            return
+        self.load_seconds = round(time.perf_counter() - started, 2)
+        logging.info(f"RAG service loaded in {self.load_seconds}s")
+        future.set_result(service)
+
+    @property
+    def ready(self) -> bool:
+        future = self._future
+        return future is not None and future.done() and future.exception() is None
+
+    def status(self) -> str:
+        """One of "ready", "loading", "failed" or "not_started"."""
+        future = self._future
+        if future is None:
+            return "not_started"
+        if not future.done():
+            return "loading"
+        return "failed" if future.exception() is not None else "ready"
+
+    @property
+    def service(self) -> Optional[RAGService]:
+        """The loaded service, or None while it is not ready."""
+        return self._future.result() if self.ready else None
+
+    async def get(self) -> RAGService:
+        """The service, waiting for (and if needed starting) the load."""
+        return await asyncio.wrap_future(self.start())
+
+    def close(self) -> None:
+        if self.ready:
+            self._future.result().close()
+
+
+def get_rag_service_provider(app) -> RAGServiceProvider:
+    """The app's provider, created on first use if the lifespan has not run."""
+    provider = getattr(app.state, "rag_provider", None)
+    if provider is None:
+        from app.core.config import settings
+        provider = RAGServiceProvider(settings)
+        app.state.rag_provider = provider
+    return provider
+
+
+async def get_rag_service(request: Request) -> RAGService:
+    """
+    Dependency injector for the RAGService.
+
+    Waits for the lifespan warm-up if it is still running; without warm-up
+    the service is loaded by the first request that needs it.
+    """
+    return await get_rag_service_provider(request.app).get()
@@ -0,0 +1,133 @@
+"""
+Cross-encoder reranking of retrieved chunks.
+
+The bi-encoder retrieval ranks chunks by comparing independent embeddings; a
+cross-encoder reads the query and each chunk together and orders them far
+more precisely, so fewer chunks need to go into the prompt. Reranking many
+candidates costs a forward pass per pair, so every call has a time budget:
+when it runs out, the caller keeps the retrieval order.
+"""
+from concurrent.futures import Executor, TimeoutError
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import threading
+import time
+
+from app.core.config import Settings
+
+
+class CrossEncoderReranker:
+    def __init__(self, model, batch_size: int = 64, timeout_ms: float = 150.0):
+        """
+        Args:
+            model: sentence-transformers CrossEncoder scoring (query, text) pairs
+            batch_size: Pairs per forward pass (one pass for the usual 50 candidates)
+            timeout_ms: Time budget per call, including the wait for a worker
+        """
+        self.model = model
+        self.batch_size = batch_size
+        self.timeout = timeout_ms / 1000.0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._calls = 0
+        self._fallbacks = 0
+        self._seconds_total = 0.0
+
+    def score(self, query: str, matches: List[Dict], deadline: Optional[float] = None) -> Optional[List[float]]:
+        """
+        Relevance of each match to the query, in one batched forward pass.
+
+        Returns:
+            One score per match, or None if ``deadline`` (time.monotonic) passed
+            before the model ran
+        """
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        pairs = [(query, match['text']) for match in matches]
+        return [float(s) for s in self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)]
+
+    @staticmethod
+    def _order(matches: List[Dict], scores: List[float], top_k: int) -> List[Dict]:
+        ranked = sorted(zip(scores, range(len(matches))), key=lambda pair: -pair[0])[:top_k]
+        return [matches[i] | {'score': float(score)} for score, i in ranked]
+
+    def _record(self, started: float, fallback: bool) -> None:
+        with self._lock:
+            self._calls += 1
+            self._fallbacks += fallback
+            self._seconds_total += time.monotonic() - started
+
+    def rerank(self, query: str, matches: List[Dict], top_k: int, executor: Executor) -> tuple:
+        """
+        Keep the ``top_k`` matches the cross-encoder scores highest.
+
+        Args:
+            query: The query text
+            matches: Retrieved chunks ('text', 'source', 'score'), best first
+            top_k: Number of matches to keep
+            executor: Pool the forward pass runs on
+
+        Returns:
+            (matches, reranked); on timeout the first ``top_k`` matches in
+            retrieval order and False
+        """
+        if len(matches) <= 1:
+            return matches[:top_k], True
+        started = time.monotonic()
+        deadline = started + self.timeout
+        future = executor.submit(self.score, query, matches, deadline)
+        try:
+            scores = future.result(timeout=self.timeout)
+        except TimeoutError:
+            scores = None
+        self._record(started, fallback=scores is None)
+        if scores is None:
+            logging.info(f"Reranking exceeded {self.timeout * 1000:.0f} ms, keeping retrieval order")
+            return matches[:top_k], False
+        return self._order(matches, scores, top_k), True
+
+    async def arerank(self, query: str, matches: List[Dict], top_k: int, executor: Executor) -> tuple:
+        """Async variant of ``rerank``; the event loop keeps running during the forward pass."""
+        if len(matches) <= 1:
+            return matches[:top_k], True
+        started = time.monotonic()
+        deadline = started + self.timeout
+        loop = asyncio.get_running_loop()
+        try:
+            scores = await asyncio.wait_for(
+                loop.run_in_executor(executor, self.score, query, matches, deadline),
+                timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            scores = None
+        self._record(started, fallback=scores is None)
+        if scores is None:
+            logging.info(f"Reranking exceeded {self.timeout * 1000:.0f} ms, keeping retrieval order")
+            return matches[:top_k], False
+        return self._order(matches, scores, top_k), True
+
+    def stats(self) -> Dict[str, float]:
+        """Calls, timeouts that fell back to retrieval order, and mean latency."""
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "fallbacks": self._fallbacks,
+                "mean_ms": round(self._seconds_total / self._calls * 1000, 2) if self._calls else 0.0,
+            }
+
+
+def create_reranker(settings: Settings) -> Optional[CrossEncoderReranker]:
+    """The reranker configured by RERANK_*, or None when RERANK_ENABLED is off."""
+    if not settings.RERANK_ENABLED:
+        return None
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError as e:
+        raise ImportError("RERANK_ENABLED requires the 'sentence-transformers' package") from e
+    return CrossEncoderReranker(
+        CrossEncoder(settings.RERANK_MODEL, max_length=settings.RERANK_MAX_LENGTH, device="cpu"),
+        batch_size=settings.RERANK_CANDIDATES,
+        timeout_ms=settings.RERANK_TIMEOUT_MS,
+    )
@@ -0,0 +1,129 @@
+"""
+Semantic cache of complete chat responses.
+
+Common opening messages ("I feel anxious all the time", "i'm always anxious")
+differ in wording but not in meaning. For those, the full pipeline (embed,
+retrieve, generate) can be skipped: ``SemanticResponseCache`` returns an
+earlier answer when a new message's embedding is close enough to a cached
+one for the same key (persona and retrieval filter). Only messages without
+(or with very little) conversation history are cached, since later turns
+depend on the conversation.
+"""
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+import threading
+import time
+
+import numpy as np
+
+from app.core.config import Settings
+
+
+class SemanticResponseCache:
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 3600.0, threshold: float = 0.95):
+        """
+        Args:
+            max_size: Responses kept across all keys (least recently used are evicted); 0 disables
+            ttl_seconds: Age after which a response is no longer served
+            threshold: Cosine similarity a message needs to reuse a cached response
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        # entry id -> (key, unit embedding, response, expires_at), in LRU order
+        self._entries: "OrderedDict[int, Tuple[Hashable, np.ndarray, str, float]]" = OrderedDict()
+        # key -> (entry ids, stacked embeddings), rebuilt after the key's entries change
+        self._matrices: Dict[Hashable, Tuple[List[int], np.ndarray]] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _matrix(self, key: Hashable) -> Tuple[List[int], np.ndarray]:
+        """Entry ids and embeddings of a key. Caller holds the lock."""
+        cached = self._matrices.get(key)
+        if cached is None:
+            ids = [entry_id for entry_id, entry in self._entries.items() if entry[0] == key]
+            matrix = np.stack([self._entries[i][1] for i in ids]) if ids else np.zeros((0, 0), dtype=np.float32)
+            cached = self._matrices[key] = (ids, matrix)
+        return cached
+
+    def _remove(self, entry_id: int) -> None:
+        """Caller holds the lock."""
+        key = self._entries.pop(entry_id)[0]
+        self._matrices.pop(key, None)
+
+    def get(self, key: Hashable, embedding) -> Optional[str]:
+        """
+        The cached response for the most similar earlier message, if similar enough.
+
+        Args:
+            key: What else the response depends on (e.g. persona and filter)
+            embedding: Embedding of the new message
+
+        Returns:
+            The response, or None on a miss
+        """
+        query = self._unit(embedding)
+        with self._lock:
+            ids, matrix = self._matrix(key)
+            if ids:
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry_id = ids[best]
+                    _, _, response, expires_at = self._entries[entry_id]
+                    if expires_at > time.monotonic():
+                        self._entries.move_to_end(entry_id)
+                        self.hits += 1
+                        return response
+                    self._remove(entry_id)
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, embedding, response: str) -> None:
+        """Cache a response for a message embedding."""
+        if self.max_size <= 0 or not response:
+            return
+        with self._lock:
+            self._entries[self._next_id] = (key, self._unit(embedding), response, time.monotonic() + self.ttl_seconds)
+            self._next_id += 1
+            self._matrices.pop(key, None)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def create_response_cache(settings: Settings) -> SemanticResponseCache:
+    """The response cache configured by RESPONSE_CACHE_* (disabled with RESPONSE_CACHE_SIZE=0)."""
+    return SemanticResponseCache(
+        max_size=settings.RESPONSE_CACHE_SIZE,
+        ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+        threshold=settings.RESPONSE_CACHE_THRESHOLD,
+    )
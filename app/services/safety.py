@@ -0,0 +1,50 @@
+"""
+Lightweight safety screening of user messages.
+
+A keyword check, not a classifier: it flags messages that mention crisis
+topics so the chat pipeline never answers them from a cache or other shortcut
+and always sends them to the model with the persona's safety instructions.
+It errs on the side of flagging.
+"""
+from typing import Dict, Set
+import re
+
+CATEGORIES: Dict[str, re.Pattern] = {
+    "self_harm": re.compile(
+        r"\b(suicid\w*|kill(ing)? my ?self|end(ing)? (it all|my life)|self[- ]?harm\w*|"
+        r"cut(ting)? my ?self|hurt(ing)? my ?self|overdos\w*|want to die|wanna die|"
+        r"better off dead|no reason to live|don'?t want to (live|be here))\b",
+        re.IGNORECASE,
+    ),
+    "harm_to_others": re.compile(
+        r"\b(kill(ing)? (him|her|them|someone|somebody|people)|hurt(ing)? (him|her|them|someone|somebody|people)|"
+        r"murder\w*|shoot(ing)? (up|him|her|them|people))\b",
+        re.IGNORECASE,
+    ),
+    "abuse": re.compile(
+        r"\b(abus(e|ed|ing|ive)|rap(e|ed|ing)|sexual(ly)? assault\w*|domestic violence|beat(s|ing)? me|hits? me)\b",
+        re.IGNORECASE,
+    ),
+    "emergency": re.compile(
+        r"\b(emergency|can'?t breathe|chest pain|took too many|poison\w*)\b",
+        re.IGNORECASE,
+    ),
+}
+
+
+def check_message(text: str) -> Set[str]:
+    """
+    Safety categories a message touches.
+
+    Args:
+        text: The user's message
+
+    Returns:
+        Names from CATEGORIES; empty when nothing was flagged
+    """
+    return {name for name, pattern in CATEGORIES.items() if pattern.search(text)}
+
+
+def is_flagged(text: str) -> bool:
+    """Whether any safety category matches the message."""
+    return bool(check_message(text))
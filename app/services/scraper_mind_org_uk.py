@@ -1,26 +1,32 @@
-import requests
 from bs4 import BeautifulSoup
 from typing import List, Dict
+from app.services.crawler import AsyncCrawler
 
 BASE_URL = "https://www.mind.org.uk"
 SELF_HELP_URL = f"{BASE_URL}/information-support/types-of-mental-health-problems/"
 
 
-def scrape_mind_org_uk_guides() -> List[Dict]:
+async def scrape_mind_org_uk_guides(crawler: AsyncCrawler) -> List[Dict]:
     """
     Scrape worksheet/self-guide titles and content from Mind.org.uk.
+    Args:
+        crawler: Open crawler used for all requests
     Returns:
         List of dicts: {"text": ..., "metadata": {"source": ..., "title": ..., "type": "web"}}
     """
     results = []
-    resp = requests.get(SELF_HELP_URL)
+    resp = await crawler.fetch(SELF_HELP_URL)
+    if resp is None:
+        return results
     soup = BeautifulSoup(resp.text, "html.parser")
-    guide_links = [a['href'] for a in soup.select('a') if a['href'].startswith('/information-support/types-of-mental-health-problems/')]
-    for link in set(guide_links):
-        url = BASE_URL + link
-        page = requests.get(url)
+    guide_links = [a['href'] for a in soup.select('a[href]') if a['href'].startswith('/information-support/types-of-mental-health-problems/')]
+    urls = [BASE_URL + link for link in set(guide_links)]
+    for url, page in zip(urls, await crawler.fetch_all(urls)):
+        if page is None or crawler.is_unchanged(url, page):
+            continue
         page_soup = BeautifulSoup(page.text, "html.parser")
-        title = page_soup.find('h1').get_text(strip=True)
+        h1 = page_soup.find('h1')
+        title = h1.get_text(separator=' ', strip=True) if h1 else url
         content_div = page_soup.find('div', class_='rich-text')
         if content_div:
             text = content_div.get_text(separator='\n', strip=True)
@@ -32,4 +38,4 @@ def scrape_mind_org_uk_guides() -> List[Dict]:
                     "type": "web"
                 }
             })
-    return results 
\ No newline at end of file
+    return results
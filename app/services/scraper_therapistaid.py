@@ -1,23 +1,23 @@
-import requests
 from bs4 import BeautifulSoup
 from typing import List, Dict
+from app.services.crawler import AsyncCrawler
 
 BASE_URL = "https://www.therapistaid.com"
 WORKSHEETS_URL = f"{BASE_URL}/therapy-worksheets"
-HEADERS = {"User-Agent": "Mozilla/5.0"}
 
 
-def scrape_therapistaid_worksheets() -> List[Dict]:
+async def scrape_therapistaid_worksheets(crawler: AsyncCrawler) -> List[Dict]:
     """
     Scrape worksheet titles and content from TherapistAid.
+    Args:
+        crawler: Open crawler used for all requests
     Returns:
         List of dicts: {"text": ..., "metadata": {"source": ..., "title": ..., "type": "web"}}
     """
     results = []
-    resp = requests.get(WORKSHEETS_URL, headers=HEADERS)
-    print("--- HTML received from server (first 2000 chars) ---")
-    print(resp.text[:2000])
-    print("--- END HTML ---")
+    resp = await crawler.fetch(WORKSHEETS_URL)
+    if resp is None:
+        return results
     soup = BeautifulSoup(resp.text, "html.parser")
     # Find all anchor tags that link to worksheet detail pages
     worksheet_links = [
@@ -26,11 +26,13 @@ def scrape_therapistaid_worksheets() -> List[Dict]:
         if a['href'].startswith('/worksheet/')
     ]
     print(f"Extracted {len(worksheet_links)} worksheet links: {worksheet_links}")
-    for link in set(worksheet_links):
-        url = BASE_URL + link
-        page = requests.get(url, headers=HEADERS)
+    urls = [BASE_URL + link for link in set(worksheet_links)]
+    for url, page in zip(urls, await crawler.fetch_all(urls)):
+        if page is None or crawler.is_unchanged(url, page):
+            continue
         page_soup = BeautifulSoup(page.text, "html.parser")
-        title = page_soup.find('h1').get_text(strip=True) if page_soup.find('h1') else url
+        h1 = page_soup.find('h1')
+        title = h1.get_text(separator=' ', strip=True) if h1 else url
         content_div = page_soup.find('div', class_='worksheet-content')
         if content_div:
             print(f"Content found for {url}")
@@ -45,4 +47,4 @@ def scrape_therapistaid_worksheets() -> List[Dict]:
             })
         else:
             print(f"No content found for {url}")
-    return results 
\ No newline at end of file
+    return results
@@ -1,114 +1,92 @@
-import requests
 from bs4 import BeautifulSoup
-from typing import List, Dict
-import time
+from typing import List, Dict, Optional
+from app.services.crawler import AsyncCrawler, FetchResult
+from app.services.html_extract import get_extractor
 
 BASE_URL = "https://www.verywellmind.com"
 GUIDES_URL = f"{BASE_URL}/mental-health-4157281"
-HEADERS = {"User-Agent": "Mozilla/5.0"}
 A_Z_URL = "https://www.verywellmind.com/conditions-a-z-4797402"
+ARTICLE_SELECTOR = "div.comp.article-body-content"
 
 
-def scrape_verywellmind_guides() -> List[Dict]:
+def _article_links(html: str, exclude: str = None) -> List[str]:
+    """Collect VerywellMind article links from a listing page."""
+    soup = BeautifulSoup(html, "html.parser")
+    return [
+        a['href']
+        for a in soup.find_all('a', href=True)
+        if a['href'].startswith('https://www.verywellmind.com/') and not (exclude and exclude in a['href'])
+    ]
+
+
+def _parse_article(link: str, page: Optional[FetchResult]) -> Optional[Dict]:
+    """Extract title and body text of an article page as a single document."""
+    if page is None:
+        return None
+    article = get_extractor().extract(page.text, ARTICLE_SELECTOR)
+    if not article.text:
+        print(f"No content found for {link}")
+        return None
+    print(f"Content found for {link}")
+    return {
+        "text": article.text,
+        "metadata": {
+            "source": link,
+            "title": article.title or link,
+            "type": "web"
+        }
+    }
+
+
+async def _scrape_articles(crawler: AsyncCrawler, links: List[str]) -> List[Dict]:
+    """Fetch article pages concurrently and parse the ones with new content."""
+    pages = await crawler.fetch_all(links)
+    documents = [
+        _parse_article(link, page)
+        for link, page in zip(links, pages)
+        if not crawler.is_unchanged(link, page)
+    ]
+    return [doc for doc in documents if doc is not None]
+
+
+async def scrape_verywellmind_guides(crawler: AsyncCrawler) -> List[Dict]:
     """
     Scrape topic guide titles and content from VerywellMind.
+    Args:
+        crawler: Open crawler used for all requests
     Returns:
         List of dicts: {"text": ..., "metadata": {"source": ..., "title": ..., "type": "web"}}
     """
-    results = []
-    resp = requests.get(GUIDES_URL, headers=HEADERS)
-    soup = BeautifulSoup(resp.text, "html.parser")
-    article_links = [
-        a['href']
-        for a in soup.find_all('a', href=True)
-        if a['href'].startswith('https://www.verywellmind.com/')
-    ]
+    resp = await crawler.fetch(GUIDES_URL)
+    if resp is None:
+        return []
+    article_links = _article_links(resp.text)
     print(f"Extracted {len(article_links)} article links: {article_links}")
-    for link in set(article_links):
-        page = requests.get(link, headers=HEADERS)
-        page_soup = BeautifulSoup(page.text, "html.parser")
-        title = page_soup.find('h1').get_text(strip=True) if page_soup.find('h1') else link
-        content_div = page_soup.find('div', class_='comp article-body-content')
-        if content_div:
-            print(f"Content found for {link}")
-            text = content_div.get_text(separator='\n', strip=True)
-            results.append({
-                "text": text,
-                "metadata": {
-                    "source": link,
-                    "title": title,
-                    "type": "web"
-                }
-            })
-        else:
-            print(f"No content found for {link}")
-    return results
+    return await _scrape_articles(crawler, list(set(article_links)))
 
-def scrape_verywellmind_topics() -> List[Dict]:
-    results = []
+async def scrape_verywellmind_topics(crawler: AsyncCrawler) -> List[Dict]:
+    """
+    Scrape every topic article linked from the A-Z page, one document per article.
+    Chunking happens at ingestion time.
+    """
     # Step 1: Get all topic links from the A-Z page
-    resp = requests.get(A_Z_URL, headers=HEADERS)
-    soup = BeautifulSoup(resp.text, "html.parser")
-    topic_links = [
-        a['href']
-        for a in soup.find_all('a', href=True)
-        if a['href'].startswith('https://www.verywellmind.com/') and '/-4797402' not in a['href']
-    ]
+    resp = await crawler.fetch(A_Z_URL)
+    if resp is None:
+        return []
+    topic_links = list(set(_article_links(resp.text, exclude='/-4797402')))
     print(f"Found {len(topic_links)} topic links.")
-    for link in set(topic_links):
-        page = requests.get(link, headers=HEADERS)
-        page_soup = BeautifulSoup(page.text, "html.parser")
-        title = page_soup.find('h1').get_text(strip=True) if page_soup.find('h1') else link
-        content_div = page_soup.find('div', class_='comp article-body-content')
-        if content_div:
-            text = content_div.get_text(separator='\n', strip=True)
-            paragraphs = [p.strip() for p in text.split('\n') if p.strip()]
-            for para in paragraphs:
-                results.append({
-                    "text": para,
-                    "metadata": {
-                        "source": link,
-                        "title": title,
-                        "type": "web"
-                    }
-                })
-            print(f"Extracted {len(paragraphs)} paragraphs from {link}")
-        else:
-            print(f"No content found for {link}")
-    return results
+    return await _scrape_articles(crawler, topic_links)
 
-def scrape_verywellmind_section(section_url: str) -> List[Dict]:
-    results = []
-    resp = requests.get(section_url, headers=HEADERS)
-    soup = BeautifulSoup(resp.text, "html.parser")
+async def scrape_verywellmind_section(crawler: AsyncCrawler, section_url: str) -> List[Dict]:
+    resp = await crawler.fetch(section_url)
+    if resp is None:
+        return []
     # Find all article links
-    article_links = [
-        a['href']
-        for a in soup.find_all('a', href=True)
-        if a['href'].startswith('https://www.verywellmind.com/')
-    ]
+    article_links = _article_links(resp.text)
     print(f"Extracted {len(article_links)} article links: {article_links}")
-    for link in set(article_links):
-        page = requests.get(link, headers=HEADERS)
-        page_soup = BeautifulSoup(page.text, "html.parser")
-        title = page_soup.find('h1').get_text(strip=True) if page_soup.find('h1') else link
-        content_div = page_soup.find('div', class_='comp article-body-content')
-        if content_div:
-            print(f"Content found for {link}")
-            text = content_div.get_text(separator='\n', strip=True)
-            results.append({
-                "text": text,
-                "metadata": {
-                    "source": link,
-                    "title": title,
-                    "type": "web"
-                }
-            })
-        else:
-            print(f"No content found for {link}")
-    return results
+    return await _scrape_articles(crawler, list(set(article_links)))
 
-def scrape_verywellmind_section_paginated(section_url: str, max_pages: int = 20) -> List[Dict]:
+async def scrape_verywellmind_section_paginated(crawler: AsyncCrawler, section_url: str, max_pages: int = 20) -> List[Dict]:
     results = []
     seen_links = set()
     page_num = 1
@@ -120,44 +98,19 @@ def scrape_verywellmind_section_paginated(section_url: str, max_pages: int = 20)
             else:
                 url = f"{section_url}?page={page_num}"
         print(f"Scraping page {page_num}: {url}")
-        resp = requests.get(url, headers=HEADERS)
-        soup = BeautifulSoup(resp.text, "html.parser")
+        resp = await crawler.fetch(url)
+        if resp is None:
+            break
         # Find all article links
-        article_links = [
-            a['href']
-            for a in soup.find_all('a', href=True)
-            if a['href'].startswith('https://www.verywellmind.com/')
-        ]
-        new_links = set(article_links) - seen_links
+        new_links = set(_article_links(resp.text)) - seen_links
         print(f"Extracted {len(new_links)} new article links on page {page_num}")
         if not new_links:
             break
-        for link in new_links:
-            page = requests.get(link, headers=HEADERS)
-            page_soup = BeautifulSoup(page.text, "html.parser")
-            title = page_soup.find('h1').get_text(strip=True) if page_soup.find('h1') else link
-            content_div = page_soup.find('div', class_='comp article-body-content')
-            if content_div:
-                print(f"Content found for {link}")
-                text = content_div.get_text(separator='\n', strip=True)
-                results.append({
-                    "text": text,
-                    "metadata": {
-                        "source": link,
-                        "title": title,
-                        "type": "web"
-                    }
-                })
-            else:
-                print(f"No content found for {link}")
-            time.sleep(0.5)  # Be polite to the server
+        # The crawler's per-domain rate limit replaces the old fixed sleep
+        results.extend(await _scrape_articles(crawler, list(new_links)))
         seen_links.update(new_links)
-        # Check for a next page link (optional: can also just increment page_num)
-        next_link = soup.find('a', attrs={'aria-label': 'Next'})
-        if not next_link and len(new_links) == 0:
-            break
         page_num += 1
         if page_num > max_pages:
             print("Reached max_pages limit.")
             break
-    return results 
\ No newline at end of file
+    return results
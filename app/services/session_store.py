@@ -0,0 +1,182 @@
+"""
+Server-side conversation session storage.
+
+Each session is an ordered list of turns ``{"role": "user" | "model", "text": ...}``
+so clients only have to send the new message plus their session id.
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from app.core.config import Settings
+
+Turn = Dict[str, str]
+
+
+class SessionStore(ABC):
+    """Interface shared by the session store backends."""
+
+    @abstractmethod
+    def get_history(self, session_id: str) -> Optional[List[Turn]]:
+        """Return the turns of a session, or None if it is unknown or expired."""
+
+    @abstractmethod
+    def append(self, session_id: str, turns: List[Turn]) -> None:
+        """Append turns to a session, creating it if needed."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        ...
+
+    @staticmethod
+    def new_session_id() -> str:
+        return uuid.uuid4().hex
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local store. Sessions expire after ``ttl_seconds`` of inactivity and
+    the least recently used ones are dropped beyond ``max_sessions``.
+    """
+
+    def __init__(self, ttl_seconds: float = 86400.0, max_sessions: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_history(self, session_id: str) -> Optional[List[Turn]]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            updated_at, turns = entry
+            if updated_at + self.ttl_seconds < time.monotonic():
+                del self._sessions[session_id]
+                return None
+            return list(turns)
+
+    def append(self, session_id: str, turns: List[Turn]) -> None:
+        with self._lock:
+            _, existing = self._sessions.get(session_id, (0.0, []))
+            self._sessions[session_id] = (time.monotonic(), existing + list(turns))
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Store sessions in a SQLite file so they survive restarts and can be shared
+    by several workers on one host.
+    """
+
+    def __init__(self, db_path: str = "sessions.db", ttl_seconds: float = 86400.0):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS session_turns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT,
+            role TEXT,
+            text TEXT,
+            created_at REAL
+        )''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_session_turns_session ON session_turns (session_id, id)')
+        conn.commit()
+        conn.close()
+
+    def get_history(self, session_id: str) -> Optional[List[Turn]]:
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        rows = c.execute(
+            "SELECT role, text, created_at FROM session_turns WHERE session_id = ? ORDER BY id",
+            (session_id,)
+        ).fetchall()
+        conn.close()
+        if not rows:
+            return None
+        if rows[-1][2] + self.ttl_seconds < time.time():
+            self.delete(session_id)
+            return None
+        return [{"role": role, "text": text} for role, text, _ in rows]
+
+    def append(self, session_id: str, turns: List[Turn]) -> None:
+        now = time.time()
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.executemany(
+            "INSERT INTO session_turns (session_id, role, text, created_at) VALUES (?, ?, ?, ?)",
+            [(session_id, turn["role"], turn["text"], now) for turn in turns]
+        )
+        conn.commit()
+        conn.close()
+
+    def delete(self, session_id: str) -> None:
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+        conn.commit()
+        conn.close()
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Store sessions in Redis (or any Redis-protocol server) as one list per session.
+    Requires the optional ``redis`` package.
+    """
+
+    def __init__(self, url: str, ttl_seconds: float = 86400.0, prefix: str = "session:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("SESSION_BACKEND=redis requires the 'redis' package") from e
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = int(ttl_seconds)
+        self.prefix = prefix
+
+    def get_history(self, session_id: str) -> Optional[List[Turn]]:
+        items = self.client.lrange(self.prefix + session_id, 0, -1)
+        if not items:
+            return None
+        return [json.loads(item) for item in items]
+
+    def append(self, session_id: str, turns: List[Turn]) -> None:
+        key = self.prefix + session_id
+        pipe = self.client.pipeline()
+        pipe.rpush(key, *[json.dumps(turn) for turn in turns])
+        pipe.expire(key, self.ttl_seconds)
+        pipe.execute()
+
+    def delete(self, session_id: str) -> None:
+        self.client.delete(self.prefix + session_id)
+
+
+def create_session_store(settings: Settings) -> SessionStore:
+    """
+    Build the session store selected by ``settings.SESSION_BACKEND``.
+
+    Args:
+        settings: Application settings
+
+    Returns:
+        A SessionStore
+    """
+    backend = settings.SESSION_BACKEND.lower()
+    if backend == "memory":
+        return InMemorySessionStore(settings.SESSION_TTL_SECONDS, settings.SESSION_MAX_SESSIONS)
+    if backend == "sqlite":
+        return SQLiteSessionStore(settings.SESSION_DB_PATH, settings.SESSION_TTL_SECONDS)
+    if backend == "redis":
+        return RedisSessionStore(settings.SESSION_REDIS_URL, settings.SESSION_TTL_SECONDS)
+    raise ValueError(f"Unknown SESSION_BACKEND: {settings.SESSION_BACKEND}")
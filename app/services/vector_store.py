@@ -0,0 +1,495 @@
+"""
+Vector store backends used by the RAG service.
+
+``PineconeVectorStore`` talks to the hosted Pinecone index, while
+``LocalVectorStore`` keeps the embeddings in-process as a NumPy matrix that is
+memory-mapped from disk, so retrieval needs no network round-trip.
+``PartitionedVectorStore`` keeps one of either per corpus (see partitions.py).
+"""
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+import asyncio
+import heapq
+import json
+import os
+import threading
+
+import numpy as np
+
+from app.core.config import Settings
+from app.services.partitions import partition_of, split_filter
+
+EMBEDDING_DIMENSION = 384  # all-MiniLM-L6-v2 embedding dimension
+
+
+class VectorStore(ABC):
+    """
+    Minimal interface shared by all vector store backends.
+
+    Vectors are dicts with 'id', 'values' and 'metadata' keys (the Pinecone
+    upsert format) and matches are dicts with 'id', 'score' and 'metadata'.
+    Query filters map metadata fields to the accepted values.
+    """
+
+    @abstractmethod
+    def upsert(self, vectors: List[Dict]) -> None:
+        ...
+
+    @abstractmethod
+    def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Iterable]] = None) -> List[Dict]:
+        ...
+
+    async def aquery(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Iterable]] = None) -> List[Dict]:
+        """
+        Non-blocking variant of ``query`` for use from the event loop.
+
+        The default implementation runs ``query`` in a worker thread, which keeps
+        blocking HTTP clients and large matrix products off the event loop.
+        """
+        return await asyncio.to_thread(self.query, vector, top_k, filter)
+
+    @abstractmethod
+    def delete(self, ids: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    def flush(self) -> None:
+        """Persist pending writes. Remote backends write through, so this is a no-op."""
+
+
+class PineconeVectorStore(VectorStore):
+    """Vector store backed by one namespace of a Pinecone serverless index."""
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        index_name: str,
+        dimension: int = EMBEDDING_DIMENSION,
+        namespace: str = "",
+        index=None,
+    ):
+        """
+        Args:
+            api_key: Pinecone API key (unused when ``index`` is given)
+            index_name: Index to use, created if missing
+            dimension: Embedding dimension for a new index
+            namespace: Namespace all operations go to ("" = default)
+            index: Already opened index to share between namespaces
+        """
+        self.index_name = index_name
+        self.namespace = namespace
+        if index is not None:
+            self.index = index
+            return
+        if not api_key:
+            raise ValueError("PINECONE_API_KEY is required for the 'pinecone' vector store backend")
+        # Imported here so the local backend works without the pinecone package
+        from pinecone import Pinecone, ServerlessSpec
+
+        self.pc = Pinecone(api_key=api_key)
+
+        # Create index if it doesn't exist
+        if self.index_name not in self.pc.list_indexes().names():
+            self.pc.create_index(
+                name=self.index_name,
+                dimension=dimension,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region="us-east-1")  # Adjust if needed
+            )
+        self.index = self.pc.Index(self.index_name)
+
+    def namespaces(self) -> List[str]:
+        """Namespaces holding vectors in the index."""
+        return list(self.index.describe_index_stats()['namespaces'] or {})
+
+    def upsert(self, vectors: List[Dict]) -> None:
+        self.index.upsert(vectors=vectors, namespace=self.namespace)
+
+    def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Iterable]] = None) -> List[Dict]:
+        results = self.index.query(
+            vector=vector,
+            top_k=top_k,
+            namespace=self.namespace,
+            filter={field: {'$in': list(values)} for field, values in filter.items()} if filter else None,
+            include_metadata=True
+        )
+        return [
+            {'id': match['id'], 'score': match['score'], 'metadata': match['metadata']}
+            for match in results['matches']
+        ]
+
+    def delete(self, ids: List[str]) -> None:
+        if ids:
+            self.index.delete(ids=ids, namespace=self.namespace)
+
+    def clear(self) -> None:
+        try:
+            self.index.delete(delete_all=True, namespace=self.namespace)
+        except Exception as e:
+            # Ignore 'Namespace not found' errors, re-raise others
+            if "Namespace not found" not in str(e):
+                raise
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store holding L2-normalised embeddings in a NumPy matrix.
+
+    On disk the index is a directory containing:
+        embeddings.npy  float32 matrix of shape (n, dimension), memory-mapped on load
+        records.jsonl   one {"id", "metadata"} line per matrix row
+        ivf.npz         optional inverted-file (IVF) partitioning of the rows
+
+    Search is an exact dot product over the matrix. When ``nlist`` > 0 an IVF
+    coarse quantizer is built on ``flush()`` and only the ``nprobe`` closest
+    clusters are scanned, trading a little recall for sub-linear query time.
+    Filtered queries scan exactly the rows whose metadata matches.
+    """
+
+    EMBEDDINGS_FILE = "embeddings.npy"
+    RECORDS_FILE = "records.jsonl"
+    IVF_FILE = "ivf.npz"
+
+    def __init__(self, path: str, dimension: int = EMBEDDING_DIMENSION, nlist: int = 0, nprobe: int = 8):
+        self.path = Path(path)
+        self.dimension = dimension
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+
+        self._ids: List[str] = []
+        self._metadata: List[Dict] = []
+        self._positions: Dict[str, int] = {}
+        self._matrix = np.zeros((0, dimension), dtype=np.float32)
+        self._pending: List[np.ndarray] = []
+        self._ivf: Optional[Dict[str, np.ndarray]] = None
+        # Matching rows per filter, dropped on every write
+        self._filter_rows: Dict[tuple, np.ndarray] = {}
+        self._dirty = False
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _load(self) -> None:
+        """Memory-map a previously flushed index, if there is one."""
+        embeddings_path = self.path / self.EMBEDDINGS_FILE
+        records_path = self.path / self.RECORDS_FILE
+        if not embeddings_path.exists() or not records_path.exists():
+            return
+
+        self._matrix = np.load(embeddings_path, mmap_mode='r')
+        with open(records_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                self._positions[record['id']] = len(self._ids)
+                self._ids.append(record['id'])
+                self._metadata.append(record['metadata'])
+
+        ivf_path = self.path / self.IVF_FILE
+        if ivf_path.exists():
+            with np.load(ivf_path) as data:
+                self._ivf = {key: data[key] for key in data.files}
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def _materialize(self) -> None:
+        """Fold pending appended rows into the main matrix. Caller holds the lock."""
+        if self._pending:
+            self._matrix = np.concatenate([np.asarray(self._matrix)] + self._pending, axis=0)
+            self._pending = []
+
+    def upsert(self, vectors: List[Dict]) -> None:
+        if not vectors:
+            return
+        values = self._normalize(np.asarray([v['values'] for v in vectors], dtype=np.float32))
+        with self._lock:
+            new_rows = []
+            for vector, row in zip(vectors, values):
+                position = self._positions.get(vector['id'])
+                if position is None:
+                    self._positions[vector['id']] = len(self._ids)
+                    self._ids.append(vector['id'])
+                    self._metadata.append(vector.get('metadata', {}))
+                    new_rows.append(row)
+                else:
+                    # Overwriting a row: make sure it lives in a writable matrix
+                    if position >= len(self._matrix):
+                        if new_rows:
+                            self._pending.append(np.stack(new_rows))
+                            new_rows = []
+                        self._materialize()
+                    if not self._matrix.flags.writeable:
+                        self._matrix = np.array(self._matrix)
+                    self._matrix[position] = row
+                    self._metadata[position] = vector.get('metadata', {})
+            if new_rows:
+                self._pending.append(np.stack(new_rows))
+            self._ivf = None
+            self._filter_rows = {}
+            self._dirty = True
+
+    def _rows_matching(self, filter: Dict[str, Iterable]) -> np.ndarray:
+        """Row indices whose metadata passes the filter. Caller holds the lock."""
+        key = tuple(sorted((field, tuple(values)) for field, values in filter.items()))
+        rows = self._filter_rows.get(key)
+        if rows is None:
+            accepted = [(field, set(values)) for field, values in filter.items()]
+            rows = np.array([
+                row for row, metadata in enumerate(self._metadata)
+                if all(metadata.get(field) in values for field, values in accepted)
+            ], dtype=np.int64)
+            self._filter_rows[key] = rows
+        return rows
+
+    def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Iterable]] = None) -> List[Dict]:
+        query = self._normalize(np.asarray(vector, dtype=np.float32))
+        with self._lock:
+            self._materialize()
+            matrix, ids, metadata, ivf = self._matrix, self._ids, self._metadata, self._ivf
+            rows_matching = self._rows_matching(filter) if filter else None
+
+        if not ids or top_k <= 0:
+            return []
+
+        if rows_matching is not None:
+            candidates = rows_matching
+            scores = matrix[candidates] @ query
+        elif ivf is not None:
+            centroid_scores = ivf['centroids'] @ query
+            probes = np.argsort(-centroid_scores)[:self.nprobe]
+            offsets, order = ivf['offsets'], ivf['order']
+            candidates = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes])
+            scores = matrix[candidates] @ query
+        else:
+            candidates = None
+            scores = matrix @ query
+
+        k = min(top_k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = candidates[top] if candidates is not None else top
+
+        return [
+            {'id': ids[row], 'score': float(scores[i]), 'metadata': metadata[row]}
+            for i, row in zip(top, rows)
+        ]
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            remove = {self._positions[i] for i in ids if i in self._positions}
+            if not remove:
+                return
+            self._materialize()
+            keep = [p for p in range(len(self._ids)) if p not in remove]
+            self._matrix = np.asarray(self._matrix)[keep]
+            self._ids = [self._ids[p] for p in keep]
+            self._metadata = [self._metadata[p] for p in keep]
+            self._positions = {vector_id: p for p, vector_id in enumerate(self._ids)}
+            self._ivf = None
+            self._filter_rows = {}
+            self._dirty = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids, self._metadata, self._positions = [], [], {}
+            self._matrix = np.zeros((0, self.dimension), dtype=np.float32)
+            self._pending = []
+            self._ivf = None
+            self._filter_rows = {}
+            self._dirty = True
+
+    def flush(self) -> None:
+        """Write the index to disk atomically and re-open it memory-mapped."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._materialize()
+            self.path.mkdir(parents=True, exist_ok=True)
+            matrix = np.ascontiguousarray(self._matrix, dtype=np.float32)
+
+            tmp_embeddings = self.path / (self.EMBEDDINGS_FILE + ".tmp")
+            with open(tmp_embeddings, 'wb') as f:
+                np.save(f, matrix)
+            tmp_records = self.path / (self.RECORDS_FILE + ".tmp")
+            with open(tmp_records, 'w', encoding='utf-8') as f:
+                for vector_id, metadata in zip(self._ids, self._metadata):
+                    f.write(json.dumps({'id': vector_id, 'metadata': metadata}) + "\n")
+
+            ivf_path = self.path / self.IVF_FILE
+            self._ivf = self._build_ivf(matrix) if self.nlist > 0 else None
+            if self._ivf is not None:
+                tmp_ivf = self.path / (self.IVF_FILE + ".tmp")
+                with open(tmp_ivf, 'wb') as f:
+                    np.savez(f, **self._ivf)
+                os.replace(tmp_ivf, ivf_path)
+            elif ivf_path.exists():
+                ivf_path.unlink()
+
+            os.replace(tmp_embeddings, self.path / self.EMBEDDINGS_FILE)
+            os.replace(tmp_records, self.path / self.RECORDS_FILE)
+            self._matrix = np.load(self.path / self.EMBEDDINGS_FILE, mmap_mode='r')
+            self._dirty = False
+
+    def _build_ivf(self, matrix: np.ndarray, iterations: int = 10) -> Optional[Dict[str, np.ndarray]]:
+        """Cluster the rows with spherical k-means and group row indices by cluster."""
+        n = len(matrix)
+        nlist = min(self.nlist, n)
+        if nlist < 2:
+            return None
+
+        rng = np.random.default_rng(0)
+        centroids = matrix[rng.choice(n, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = self._assign(matrix, centroids)
+            for c in range(nlist):
+                members = matrix[assignments == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = self._normalize(centroids)
+
+        assignments = self._assign(matrix, centroids)
+        order = np.argsort(assignments, kind='stable')
+        offsets = np.searchsorted(assignments[order], np.arange(nlist + 1))
+        return {'centroids': centroids.astype(np.float32), 'order': order, 'offsets': offsets}
+
+    @staticmethod
+    def _assign(matrix: np.ndarray, centroids: np.ndarray, block_size: int = 8192) -> np.ndarray:
+        """Nearest centroid per row, computed in blocks to bound memory."""
+        assignments = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), block_size):
+            block = matrix[start:start + block_size]
+            assignments[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+
+class PartitionedVectorStore(VectorStore):
+    """
+    One vector store per partition (``metadata['type']``).
+
+    Upserts are routed by the vectors' partition, queries fan out to the
+    partitions the filter's 'type' allows (all by default) and merge by score,
+    and each partition can be cleared and rebuilt on its own.
+    """
+
+    def __init__(self, open_partition: Callable[[str], VectorStore], partitions: Iterable[str] = ()):
+        """
+        Args:
+            open_partition: Opens (or creates) the store of a partition
+            partitions: Partitions that already hold vectors
+        """
+        self._open_partition = open_partition
+        self._lock = threading.Lock()
+        self._partitions: Dict[str, VectorStore] = {}
+        for partition in partitions:
+            self.partition(partition)
+
+    def partitions(self) -> List[str]:
+        return sorted(self._partitions)
+
+    def partition(self, name: str) -> VectorStore:
+        """The store of a partition, opened on first use."""
+        with self._lock:
+            store = self._partitions.get(name)
+            if store is None:
+                store = self._partitions[name] = self._open_partition(name)
+            return store
+
+    def _targets(self, partitions: Optional[Iterable[str]]) -> List[VectorStore]:
+        if partitions is None:
+            return list(self._partitions.values())
+        return [self._partitions[p] for p in partitions if p in self._partitions]
+
+    def _searches(self, filter: Optional[Dict[str, Iterable]]) -> List[tuple]:
+        """(store, filter) per partition a query has to search."""
+        partitions, rest = split_filter(filter)
+        if partitions is None:
+            return [(store, rest) for store in self._targets(None)]
+        searches = [(store, rest) for store in self._targets(p for p in partitions if p)]
+        # Vectors stored before partitioning are only told apart by their metadata
+        if "" in self._partitions:
+            searches.append((self._partitions[""], filter))
+        return searches
+
+    def upsert(self, vectors: List[Dict]) -> None:
+        groups: Dict[str, List[Dict]] = {}
+        for vector in vectors:
+            groups.setdefault(partition_of(vector.get('metadata', {})), []).append(vector)
+        for name, group in groups.items():
+            self.partition(name).upsert(group)
+
+    @staticmethod
+    def _merge(results: List[List[Dict]], top_k: int) -> List[Dict]:
+        return heapq.nlargest(top_k, (match for matches in results for match in matches), key=lambda m: m['score'])
+
+    def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Iterable]] = None) -> List[Dict]:
+        return self._merge([store.query(vector, top_k, f) for store, f in self._searches(filter)], top_k)
+
+    async def aquery(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Iterable]] = None) -> List[Dict]:
+        results = await asyncio.gather(*(store.aquery(vector, top_k, f) for store, f in self._searches(filter)))
+        return self._merge(list(results), top_k)
+
+    def delete(self, ids: List[str], partition: Optional[str] = None) -> None:
+        """
+        Delete vectors from one partition (and the unnamed legacy partition), or from all.
+        """
+        targets = None if partition is None else {partition, ""}
+        for store in self._targets(targets):
+            store.delete(ids)
+
+    def clear(self, partition: Optional[str] = None) -> None:
+        """Remove every vector of one partition, or of all of them."""
+        for store in self._targets(None if partition is None else [partition]):
+            store.clear()
+
+    def flush(self) -> None:
+        for store in self._targets(None):
+            store.flush()
+
+
+def create_vector_store(settings: Settings) -> PartitionedVectorStore:
+    """
+    Build the vector store backend selected by ``settings.VECTOR_STORE_BACKEND``,
+    partitioned by corpus: Pinecone namespaces, or one local index per
+    sub-directory of LOCAL_INDEX_DIR.
+
+    Args:
+        settings: Application settings
+
+    Returns:
+        A ready-to-use PartitionedVectorStore
+    """
+    backend = settings.VECTOR_STORE_BACKEND.lower()
+    if backend == "local":
+        root = Path(settings.LOCAL_INDEX_DIR)
+
+        def open_local(name: str) -> LocalVectorStore:
+            return LocalVectorStore(
+                str(root / name if name else root),
+                nlist=settings.LOCAL_INDEX_NLIST,
+                nprobe=settings.LOCAL_INDEX_NPROBE,
+            )
+
+        existing = [d.name for d in root.glob("*") if (d / LocalVectorStore.EMBEDDINGS_FILE).exists()]
+        if (root / LocalVectorStore.EMBEDDINGS_FILE).exists():
+            existing.append("")
+        return PartitionedVectorStore(open_local, existing)
+    if backend == "pinecone":
+        default = PineconeVectorStore(settings.PINECONE_API_KEY, settings.PINECONE_INDEX_NAME)
+
+        def open_namespace(name: str) -> PineconeVectorStore:
+            if not name:
+                return default
+            return PineconeVectorStore(None, settings.PINECONE_INDEX_NAME, namespace=name, index=default.index)
+
+        return PartitionedVectorStore(open_namespace, default.namespaces())
+    raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {settings.VECTOR_STORE_BACKEND}")
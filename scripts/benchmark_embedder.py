@@ -0,0 +1,92 @@
+"""
+Compare the int8 ONNX embedder against the fp32 SentenceTransformer.
+
+Accuracy: recall@k of ONNX retrieval against the fp32 top-k, both with the
+corpus re-embedded by ONNX and with ONNX queries against an fp32-built index
+(switching the API backend without re-ingesting).
+Latency: single-query encode time (p50 / p95), as the API sees it.
+"""
+from pathlib import Path
+import statistics
+import sys
+import time
+
+import numpy as np
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.core.config import Settings
+from app.services.embedders import OnnxEmbedder
+
+# Local dataset folders as used by ingest_hf.py: (path, query field, corpus field)
+DEFAULT_DATASET = ("local_counsel_chat", "question_text", "answer_text")
+
+
+def load_texts(dataset: str, query_field: str, corpus_field: str, limit: int) -> tuple:
+    from datasets import load_dataset
+
+    ds = load_dataset(dataset, split="train")
+    rows = ds.select(range(min(limit, len(ds))))
+    queries = [q for q in rows[query_field] if q]
+    corpus = list(dict.fromkeys(c for c in rows[corpus_field] if c))
+    return queries, corpus
+
+
+def top_k(queries: np.ndarray, corpus: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall_at_k(reference: np.ndarray, candidate: np.ndarray) -> float:
+    hits = [len(set(r) & set(c)) / len(r) for r, c in zip(reference, candidate)]
+    return float(np.mean(hits))
+
+
+def latency_ms(model, queries: list, runs: int) -> tuple:
+    model.encode(queries[0])  # warm-up
+    timings = []
+    for query in (queries * (runs // len(queries) + 1))[:runs]:
+        start = time.perf_counter()
+        model.encode(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main(limit: int = 2000, k: int = 5, runs: int = 200):
+    from sentence_transformers import SentenceTransformer
+
+    settings = Settings()
+    dataset, query_field, corpus_field = DEFAULT_DATASET
+    queries, corpus = load_texts(dataset, query_field, corpus_field, limit)
+    print(f"{len(queries)} queries against {len(corpus)} passages from {dataset}")
+
+    fp32 = SentenceTransformer(settings.EMBEDDING_MODEL)
+    onnx = OnnxEmbedder(settings.ONNX_MODEL_DIR, model_file=settings.ONNX_MODEL_FILE, num_threads=settings.ONNX_THREADS)
+
+    fp32_queries = fp32.encode(queries, normalize_embeddings=True)
+    fp32_corpus = fp32.encode(corpus, normalize_embeddings=True)
+    onnx_queries = onnx.encode(queries)
+    onnx_corpus = onnx.encode(corpus)
+
+    reference = top_k(fp32_queries, fp32_corpus, k)
+    cosine = float(np.mean(np.sum(fp32_queries * onnx_queries, axis=1)))
+    print(f"Mean cosine(fp32, int8) of query embeddings: {cosine:.4f}")
+    print(f"recall@{k}, int8 queries + int8 corpus: {recall_at_k(reference, top_k(onnx_queries, onnx_corpus, k)):.3f}")
+    print(f"recall@{k}, int8 queries + fp32 corpus: {recall_at_k(reference, top_k(onnx_queries, fp32_corpus, k)):.3f}")
+
+    for name, model in (("fp32 torch", fp32), ("int8 onnx", onnx)):
+        p50, p95 = latency_ms(model, queries, runs)
+        print(f"{name:>10}: single-query encode p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Recall@k and latency of the int8 ONNX embedder vs fp32")
+    parser.add_argument("--limit", type=int, default=2000, help="Dataset rows to sample")
+    parser.add_argument("--k", type=int, default=5, help="k for recall@k")
+    parser.add_argument("--runs", type=int, default=200, help="Single-query encodes per backend")
+    args = parser.parse_args()
+    main(limit=args.limit, k=args.k, runs=args.runs)
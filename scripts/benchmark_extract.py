@@ -0,0 +1,77 @@
+"""
+Benchmark the HTML extraction engines on saved pages.
+
+Pages come from the crawler's HTTP cache (content selector chosen per domain
+from DOMAIN_SCRAPE_CONFIG) or from a directory of saved ``.html`` fixtures.
+Reports pages/second per engine and how often its output matches the
+original BeautifulSoup ``html.parser`` path.
+"""
+from pathlib import Path
+import sys
+import time
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(Path(__file__).parent))
+
+from app.core.config import Settings
+from app.services.html_extract import available_extractors
+from app.services.http_cache import HTTPCache
+from ingest_web import DEFAULT_CONTENT_SELECTOR, DOMAIN_SCRAPE_CONFIG, get_domain
+
+
+def load_cached_pages(cache_dir: str) -> list:
+    """(html, selector) for every page in the HTTP cache."""
+    cache = HTTPCache(cache_dir)
+    pages = []
+    for url in cache.urls():
+        html = cache.load(url)
+        if html is not None:
+            config = DOMAIN_SCRAPE_CONFIG.get(get_domain(url), {})
+            pages.append((html, config.get("content_selector", DEFAULT_CONTENT_SELECTOR)))
+    return pages
+
+
+def load_fixture_pages(fixtures_dir: str, selector: str) -> list:
+    """(html, selector) for every .html file in a directory."""
+    return [
+        (path.read_text(encoding='utf-8', errors='replace'), selector)
+        for path in sorted(Path(fixtures_dir).glob("*.html"))
+    ]
+
+
+def main(fixtures_dir: str = None, selector: str = DEFAULT_CONTENT_SELECTOR, repeat: int = 3):
+    if fixtures_dir:
+        pages = load_fixture_pages(fixtures_dir, selector)
+    else:
+        pages = load_cached_pages(Settings().HTTP_CACHE_DIR)
+    if not pages:
+        print("No pages to benchmark; crawl once with ingest_web.py or pass --fixtures")
+        return
+    print(f"Benchmarking {len(pages)} pages, {repeat} rounds each")
+
+    extractors = available_extractors()
+    baseline = extractors.get("soup")
+    expected = [baseline.extract(html, sel) for html, sel in pages] if baseline else None
+
+    for name, extractor in extractors.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            results = [extractor.extract(html, sel) for html, sel in pages]
+        elapsed = time.perf_counter() - start
+        line = f"{name:>12}: {len(pages) * repeat / elapsed:8.1f} pages/sec"
+        if expected is not None:
+            matching = sum(r == e for r, e in zip(results, expected))
+            line += f"  ({matching}/{len(pages)} identical to soup)"
+        print(line)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compare HTML extraction engines in pages/second")
+    parser.add_argument("--fixtures", help="Directory of saved .html pages (default: the HTTP cache)")
+    parser.add_argument("--selector", default=DEFAULT_CONTENT_SELECTOR, help="Content selector for --fixtures pages")
+    parser.add_argument("--repeat", type=int, default=3, help="Rounds over the page set per engine")
+    args = parser.parse_args()
+    main(fixtures_dir=args.fixtures, selector=args.selector, repeat=args.repeat)
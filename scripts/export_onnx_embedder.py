@@ -0,0 +1,66 @@
+"""
+Export the embedding model to ONNX and quantize it to int8.
+
+Writes model.onnx (fp32), model_int8.onnx (dynamic int8 quantization of the
+weights) and the tokenizer files to ONNX_MODEL_DIR, ready for
+EMBEDDING_BACKEND=onnx. Requires the optional 'onnx' and 'onnxruntime' packages.
+"""
+from pathlib import Path
+import sys
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.core.config import Settings
+
+
+def main(output_dir: str = None, opset: int = 14):
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    settings = Settings()
+    output = Path(output_dir or settings.ONNX_MODEL_DIR)
+    output.mkdir(parents=True, exist_ok=True)
+    model_name = settings.EMBEDDING_MODEL
+    if "/" not in model_name:
+        model_name = f"sentence-transformers/{model_name}"
+
+    print(f"Loading {model_name}...")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(output)
+
+    # The transformer only; mean pooling and normalization run in OnnxEmbedder
+    sample = tokenizer(["an example sentence"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    fp32_path = output / "model.onnx"
+    print(f"Exporting {fp32_path}...")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+
+    int8_path = output / settings.ONNX_MODEL_FILE
+    print(f"Quantizing to {int8_path}...")
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+    print(f"Done. fp32: {fp32_path.stat().st_size / 1e6:.1f} MB, int8: {int8_path.stat().st_size / 1e6:.1f} MB")
+    print("Check accuracy and latency with scripts/benchmark_embedder.py before switching EMBEDDING_BACKEND=onnx")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Export the embedding model to int8 ONNX")
+    parser.add_argument("--output-dir", default=None, help="Target directory (default: ONNX_MODEL_DIR)")
+    parser.add_argument("--opset", type=int, default=14, help="ONNX opset version")
+    args = parser.parse_args()
+    main(output_dir=args.output_dir, opset=args.opset)
@@ -9,6 +9,7 @@ project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
 from app.core.config import Settings
+from app.services.ingestion import IngestManifest
 from app.services.rag_service import RAGService
 
 # List of datasets to ingest: (dataset_path, text_fields, metadata_fields, split, chunk)
@@ -21,10 +22,11 @@ DATASETS = [
 def main(clear_existing: bool = False):
     settings = Settings()
     rag_service = RAGService(settings)
+    manifest = IngestManifest(settings.INGEST_MANIFEST_PATH)
 
     if clear_existing:
-        print("Clearing existing vectors from Pinecone...")
-        rag_service.clear_index()
+        print("Clearing existing Hugging Face chunks (other corpora are kept)...")
+        rag_service.clear_index("hf", manifest)
 
     for dataset_path, text_fields, metadata_fields, split, chunk in DATASETS:
         print(f"\n--- Ingesting {dataset_path} ---")
@@ -34,16 +36,21 @@ def main(clear_existing: bool = False):
                 text_fields=text_fields,
                 metadata_fields=metadata_fields,
                 split=split,
-                chunk=chunk
+                chunk=chunk,
+                manifest=manifest
             )
         except Exception as e:
             print(f"Error ingesting {dataset_path}: {e}")
 
+    print("Chunk lengths (tokens):")
+    print(rag_service.chunker.histogram.report())
+    print(f"Embedding throughput: {rag_service.embedding_pool_stats()}")
+    rag_service.close_embedding_pool()
     print("\nDone! Hugging Face datasets are ingested into Pinecone.")
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Ingest Hugging Face datasets into Pinecone knowledge base")
-    parser.add_argument("--clear", action="store_true", help="Clear existing vectors before ingestion")
+    parser.add_argument("--clear", action="store_true", help="Clear the existing Hugging Face vectors before ingestion")
     args = parser.parse_args()
     main(clear_existing=args.clear) 
\ No newline at end of file
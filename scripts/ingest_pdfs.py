@@ -10,14 +10,17 @@ project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
 from app.core.config import Settings
+from app.services.ingestion import IngestManifest, IngestionCheckpoint
 from app.services.rag_service import RAGService
 
-def main(clear_existing: bool = False):
+def main(clear_existing: bool = False, resume: bool = True, workers: Optional[int] = None):
     """
     Main function to ingest PDFs and store them in Pinecone.
     
     Args:
         clear_existing: Whether to clear existing vectors from the index
+        resume: Skip PDFs recorded in the checkpoint by an earlier run
+        workers: Number of PDF parser processes (default: INGEST_WORKERS)
     """
     # Load settings
     settings = Settings()
@@ -25,10 +28,16 @@ def main(clear_existing: bool = False):
     # Initialize RAG service
     rag_service = RAGService(settings)
     
+    manifest = IngestManifest(settings.INGEST_MANIFEST_PATH)
+    checkpoint = IngestionCheckpoint(settings.INGEST_CHECKPOINT_PATH)
+    if not resume:
+        checkpoint.reset()
+
     # Clear existing vectors if requested
     if clear_existing:
-        print("Clearing existing vectors from Pinecone...")
-        rag_service.clear_index()
+        print("Clearing existing PDF chunks (other corpora are kept)...")
+        rag_service.clear_index("pdf", manifest)
+        checkpoint.reset()
     
     # Process PDFs
     pdf_dir = Path(settings.THERAPY_GUIDES_DIR)
@@ -36,25 +45,24 @@ def main(clear_existing: bool = False):
         print(f"Error: Directory {pdf_dir} does not exist!")
         return
     
+    # Parse, embed and store in one streaming pass; only changed chunks are embedded
     print(f"Processing PDFs from {pdf_dir}...")
-    chunks = rag_service.process_all_pdfs(pdf_dir)
-    
-    if not chunks:
-        print("No chunks were generated from PDFs!")
-        return
-    
-    print(f"Generated {len(chunks)} chunks from PDFs")
-    
-    # Store chunks in Pinecone
-    print("Storing chunks in Pinecone...")
-    rag_service.embed_and_store(chunks)
+    stats = rag_service.ingest_pdfs(pdf_dir, manifest, checkpoint=checkpoint, workers=workers)
     
+    print("Chunk lengths (tokens):")
+    print(rag_service.chunker.histogram.report())
+    print(f"Embedding throughput: {rag_service.embedding_pool_stats()}")
+    rag_service.close_embedding_pool()
+    print(f"Added {stats['added']}, unchanged {stats['unchanged']}, deleted {stats['deleted']} chunks")
+    print(f"Skipped {stats['duplicates']} near-duplicate chunks (vectors saved)")
     print("Done! Knowledge base is ready for querying.")
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Ingest PDFs into Pinecone knowledge base")
-    parser.add_argument("--clear", action="store_true", help="Clear existing vectors before ingestion")
+    parser.add_argument("--clear", action="store_true", help="Clear the existing PDF vectors before ingestion")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore the checkpoint and re-ingest every PDF")
+    parser.add_argument("--workers", type=int, default=None, help="Number of PDF parser processes")
     args = parser.parse_args()
     
-    main(clear_existing=args.clear) 
\ No newline at end of file
+    main(clear_existing=args.clear, resume=not args.no_resume, workers=args.workers) 
\ No newline at end of file
@@ -1,4 +1,5 @@
 from pathlib import Path
+import asyncio
 import sys
 import re
 
@@ -7,39 +8,51 @@ project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
 from app.core.config import Settings
+from app.services.crawler import AsyncCrawler, create_crawler
+from app.services.html_extract import get_extractor
+from app.services.ingestion import IngestManifest
 from app.services.rag_service import RAGService
-from app.services.scraper_therapistaid import scrape_therapistaid_worksheets
-from app.services.scraper_verywellmind import scrape_verywellmind_section, scrape_verywellmind_topics
-from app.services.scraper_mind_org_uk import scrape_mind_org_uk_guides
-from app.services.scraper_nhs import scrape_nhs_guides
-import requests
+from app.services.scraper_verywellmind import (
+    ARTICLE_SELECTOR as VERYWELLMIND_ARTICLE_SELECTOR,
+    scrape_verywellmind_section,
+    scrape_verywellmind_topics,
+)
 from bs4 import BeautifulSoup
 
 SITES_FILE = Path(project_root) / "sitesURL.txt"
 
-# Helper: extract all links from a hub page for a given domain
+# Per domain: hub link selector, base for relative links and the article content container
 DOMAIN_SCRAPE_CONFIG = {
     "therapistaid.com": {
         "subtopic_selector": "a[href^='/worksheet/'], a[href^='/activity/'], a[href^='/tool/'], a[href^='/audio-resource/']",
-        "base_url": "https://www.therapistaid.com"
+        "base_url": "https://www.therapistaid.com",
+        "content_selector": "div.worksheet-content"
     },
     "mind.org.uk": {
         "subtopic_selector": "a[href^='/information-support/types-of-mental-health-problems/']",
-        "base_url": "https://www.mind.org.uk"
+        "base_url": "https://www.mind.org.uk",
+        "content_selector": "div.rich-text"
     },
     "nhs.uk": {
         "subtopic_selector": "a[href^='/mental-health/']",
-        "base_url": "https://www.nhs.uk"
+        "base_url": "https://www.nhs.uk",
+        "content_selector": "div.nhsuk-u-reading-width"
+    },
+    "verywellmind.com": {
+        "content_selector": VERYWELLMIND_ARTICLE_SELECTOR
     },
 }
+DEFAULT_CONTENT_SELECTOR = "body"
 
-def extract_links_from_hub(url: str, domain: str) -> list:
+async def extract_links_from_hub(crawler: AsyncCrawler, url: str, domain: str) -> list:
     config = DOMAIN_SCRAPE_CONFIG.get(domain)
-    if not config:
+    if not config or "subtopic_selector" not in config:
         print(f"No config for domain: {domain}")
         return []
     try:
-        resp = requests.get(url)
+        resp = await crawler.fetch(url)
+        if resp is None:
+            return []
         soup = BeautifulSoup(resp.text, "html.parser")
         links = [a['href'] for a in soup.select(config['subtopic_selector']) if a.get('href')]
         # Make full URLs
@@ -58,44 +71,34 @@ def get_domain(url: str) -> str:
     match = re.search(r'https?://(?:www\.)?([^/]+)', url)
     return match.group(1) if match else ""
 
-def scrape_article(url: str) -> list:
+async def scrape_article(crawler: AsyncCrawler, url: str) -> list:
     domain = get_domain(url)
     if "therapistaid.com" in domain:
-        from app.services.scraper_therapistaid import scrape_therapistaid_worksheets
-        return generic_scrape(url, domain)
+        return await generic_scrape(crawler, url, domain)
     elif "verywellmind.com" in domain:
         print(f"Using section scraper for Verywell Mind: {url}")
-        return scrape_verywellmind_section(url)
+        return await scrape_verywellmind_section(crawler, url)
     elif "mind.org.uk" in domain:
-        return generic_scrape(url, domain)
+        return await generic_scrape(crawler, url, domain)
     elif "nhs.uk" in domain:
-        return generic_scrape(url, domain)
+        return await generic_scrape(crawler, url, domain)
     else:
         print(f"No scraper for domain: {domain}")
         return []
 
-def generic_scrape(url: str, domain: str) -> list:
+async def generic_scrape(crawler: AsyncCrawler, url: str, domain: str) -> list:
     try:
-        resp = requests.get(url)
-        soup = BeautifulSoup(resp.text, "html.parser")
-        title = soup.find('h1').get_text(strip=True) if soup.find('h1') else url
-        if "therapistaid.com" in domain:
-            content_div = soup.find('div', class_='worksheet-content')
-        elif "verywellmind.com" in domain:
-            content_div = soup.find('div', class_='comp article-body-content')
-        elif "mind.org.uk" in domain:
-            content_div = soup.find('div', class_='rich-text')
-        elif "nhs.uk" in domain:
-            content_div = soup.find('div', class_='nhsuk-u-reading-width')
-        else:
-            content_div = soup.find('body')
-        if content_div:
-            text = content_div.get_text(separator='\n', strip=True)
+        resp = await crawler.fetch(url)
+        if resp is None or crawler.is_unchanged(url, resp):
+            return []
+        selector = DOMAIN_SCRAPE_CONFIG.get(domain, {}).get("content_selector", DEFAULT_CONTENT_SELECTOR)
+        page = get_extractor().extract(resp.text, selector)
+        if page.text:
             return [{
-                "text": text,
+                "text": page.text,
                 "metadata": {
                     "source": url,
-                    "title": title,
+                    "title": page.title or url,
                     "type": "web"
                 }
             }]
@@ -106,15 +109,16 @@ def generic_scrape(url: str, domain: str) -> list:
         print(f"Error scraping {url}: {e}")
         return []
 
-def main():
-    settings = Settings()
-    rag_service = RAGService(settings)
-    all_chunks = []
-
-    # Read URLs from sitesURL.txt
-    with open(SITES_FILE, 'r', encoding='utf-8') as f:
-        lines = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+async def crawl_sites(crawler: AsyncCrawler, lines: list) -> list:
+    """
+    Crawl every entry of sitesURL.txt concurrently.
 
+    Hub pages are expanded into article links first; the unique articles are
+    then scraped in one concurrent pass, throttled per domain by the crawler.
+    """
+    direct_tasks = []
+    hub_tasks = []
+    article_urls = []
     for line in lines:
         url = line.split('(')[0].strip()
         is_hub = '(All sub' in line or '(all Sub' in line or '(all sub' in line
@@ -122,33 +126,94 @@ def main():
         # Special handling for Verywell Mind A-Z topics page
         if url == "https://www.verywellmind.com/conditions-a-z-4797402":
             print(f"Using A-Z topics scraper for Verywell Mind: {url}")
-            all_chunks.extend(scrape_verywellmind_topics())
-            continue
-        if is_hub:
+            direct_tasks.append(scrape_verywellmind_topics(crawler))
+        elif "verywellmind.com" in domain:
+            print(f"Using section scraper for Verywell Mind: {url}")
+            direct_tasks.append(scrape_verywellmind_section(crawler, url))
+        elif is_hub:
             print(f"Crawling hub page: {url}")
-            if "verywellmind.com" in domain:
-                print(f"Using section scraper for Verywell Mind hub: {url}")
-                all_chunks.extend(scrape_verywellmind_section(url))
-            else:
-                links = extract_links_from_hub(url, domain)
-                print(f"  Found {len(links)} subtopic/article links.")
-                for link in links:
-                    all_chunks.extend(scrape_article(link))
+            hub_tasks.append(extract_links_from_hub(crawler, url, domain))
         else:
             print(f"Scraping direct article: {url}")
-            if "verywellmind.com" in domain:
-                all_chunks.extend(scrape_verywellmind_section(url))
-            else:
-                all_chunks.extend(scrape_article(url))
+            article_urls.append(url)
 
-    print(f"Total web documents to ingest: {len(all_chunks)}")
-    if not all_chunks:
-        print("No web documents found!")
+    for links in await asyncio.gather(*hub_tasks):
+        print(f"  Found {len(links)} subtopic/article links.")
+        article_urls.extend(links)
+
+    article_tasks = [scrape_article(crawler, url) for url in dict.fromkeys(article_urls)]
+    documents = []
+    for page_documents in await asyncio.gather(*direct_tasks, *article_tasks):
+        documents.extend(page_documents)
+    return documents
+
+async def crawl(settings: Settings, lines: list, manifest: IngestManifest, refresh: bool = False) -> tuple:
+    """
+    Run the crawl with conditional requests.
+
+    Returns:
+        (documents of new or changed pages, sources skipped as unchanged)
+    """
+    crawler = create_crawler(
+        settings,
+        use_cache=not refresh,
+        is_ingested=lambda url: bool(manifest.ids(url))
+    )
+    async with crawler:
+        documents = await crawl_sites(crawler, lines)
+        return documents, crawler.unchanged_sources
+
+def main(prune: bool = False, refresh: bool = False):
+    """
+    Crawl the sites in sitesURL.txt and sync their content into the vector store.
+
+    Args:
+        prune: Also delete stored pages that were not produced by this crawl
+        refresh: Ignore the HTTP cache and re-download every page
+    """
+    settings = Settings()
+    rag_service = RAGService(settings)
+    manifest = IngestManifest(settings.INGEST_MANIFEST_PATH)
+
+    # Read URLs from sitesURL.txt
+    with open(SITES_FILE, 'r', encoding='utf-8') as f:
+        lines = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+    documents, unchanged = asyncio.run(crawl(settings, lines, manifest, refresh=refresh))
+
+    print(f"Total web documents to ingest: {len(documents)} ({len(unchanged)} pages unchanged since last crawl)")
+    if not documents and not prune:
+        print("No new or changed web documents found!")
         return
 
+    # Unchanged pages count towards boilerplate from the lines seen on earlier crawls
+    all_chunks = rag_service.chunk_web_documents(documents, keep_sources=unchanged if prune else None)
+
+    # Group by page so unchanged pages are skipped and vanished chunks deleted
+    by_source = {}
+    for chunk in all_chunks:
+        by_source.setdefault(chunk["metadata"]["source"], []).append(chunk)
+
     print("Embedding and storing in Pinecone...")
-    rag_service.embed_and_store(all_chunks)
+    stats = rag_service.sync_sources(
+        by_source.items(),
+        manifest,
+        source_type="web",
+        prune_missing=prune,
+        keep_sources=unchanged
+    )
+    print("Chunk lengths (tokens):")
+    print(rag_service.chunker.histogram.report())
+    print(f"Embedding throughput: {rag_service.embedding_pool_stats()}")
+    rag_service.close_embedding_pool()
+    print(f"Added {stats['added']}, unchanged {stats['unchanged']}, deleted {stats['deleted']} chunks")
+    print(f"Skipped {stats['duplicates']} near-duplicate chunks (vectors saved)")
     print("Done! Web knowledge base is ready.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Ingest web pages from sitesURL.txt into Pinecone knowledge base")
+    parser.add_argument("--prune", action="store_true", help="Delete stored pages that this crawl did not produce")
+    parser.add_argument("--refresh", action="store_true", help="Ignore the HTTP cache and re-download every page")
+    args = parser.parse_args()
+    main(prune=args.prune, refresh=args.refresh) 
\ No newline at end of file
@@ -1,5 +1,6 @@
 import streamlit as st
 import requests
+import json
 
 # Persona options
 PERSONAS = {
@@ -11,6 +12,26 @@ PERSONAS = {
 # Update API URLs to Railway deployment
 RAILWAY_API_BASE = "https://therapy-bot-production.up.railway.app/api/v1"
 
+
+def stream_chat(payload: dict):
+    """
+    Yield response tokens from the backend's Server-Sent Events chat stream.
+    """
+    with requests.post(
+        f"{RAILWAY_API_BASE}/chat/stream",
+        json=payload,
+        stream=True,
+        timeout=30
+    ) as response:
+        response.raise_for_status()
+        # The server keeps the conversation; remember which session we are in
+        st.session_state.session_id = response.headers.get("X-Session-Id")
+        for line in response.iter_lines(decode_unicode=True):
+            if line and line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if "token" in data:
+                    yield data["token"]
+
 st.title("Therapeutic Chatbot")
 
 # Session state for chat history and persona
@@ -18,6 +39,8 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "persona" not in st.session_state:
     st.session_state.persona = "professional"
+if "session_id" not in st.session_state:
+    st.session_state.session_id = None
 
 # Persona selection (locked after first message)
 if not st.session_state.messages:
@@ -69,26 +92,24 @@ if user_input := st.chat_input("Type your message..."):
     # Add user message to history
     st.session_state.messages.append({"text": user_input, "sender": "user"})
 
-    # Prepare payload for FastAPI backend
+    # Prepare payload for FastAPI backend; history lives server-side in the session
     payload = {
         "message": user_input,
-        "history": [m["text"] for m in st.session_state.messages if m["sender"] == "user"],
-        "persona": st.session_state.persona
+        "persona": st.session_state.persona,
+        "session_id": st.session_state.session_id
     }
+    # Render tokens as they arrive instead of waiting for the full reply
+    st.markdown(f"**You:** {user_input}")
+    placeholder = st.empty()
+    placeholder.markdown("**Healix:** _Thinking..._")
+    reply = ""
     try:
-        with st.spinner("Thinking..."):
-            response = requests.post(
-                f"{RAILWAY_API_BASE}/chat",
-                json=payload,
-                timeout=30
-            )
-            if response.ok:
-                data = response.json()
-                st.session_state.messages.append({"text": data["response"], "sender": "bot"})
-            else:
-                st.session_state.messages.append({"text": "Sorry, backend error.", "sender": "bot"})
+        for token in stream_chat(payload):
+            reply += token
+            placeholder.markdown(f"**Healix:** {reply}")
+        st.session_state.messages.append({"text": reply or "Sorry, backend error.", "sender": "bot"})
     except Exception as e:
-        st.session_state.messages.append({"text": f"Error: {e}", "sender": "bot"})
+        st.session_state.messages.append({"text": reply or f"Error: {e}", "sender": "bot"})
     
     st.rerun()
 
@@ -96,4 +117,5 @@ if user_input := st.chat_input("Type your message..."):
 if st.button("New Session"):
     st.session_state.messages = []
     st.session_state.persona = "professional"
+    st.session_state.session_id = None
     st.rerun()
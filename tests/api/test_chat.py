@@ -1,6 +1,12 @@
+from types import SimpleNamespace
+import json
+
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.services.gemini_service import EMPTY_RESPONSE, ERROR_RESPONSE, GeminiService, get_gemini_service
+from app.services.rag_service import get_rag_service
 
 client = TestClient(app)
 
@@ -73,4 +79,125 @@ def test_chat_endpoint_no_message():
         "/api/v1/chat",
         json={"history": [], "persona": "professional"}
     )
-    assert response.status_code == 422  # Validation error
\ No newline at end of file
+    assert response.status_code == 422  # Validation error
+
+def test_chat_stream_endpoint():
+    """
+    Tests that /chat/stream returns Server-Sent Events ending with a done event.
+    """
+    with client.stream(
+        "POST",
+        "/api/v1/chat/stream",
+        json={"message": "Hello, I need some support.", "history": [], "persona": "professional"}
+    ) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+    assert "data: " in body
+    assert body.rstrip().endswith("event: done\ndata: {}")
+
+
+def test_chat_endpoint_continues_server_side_session():
+    """
+    Tests that a returned session id can be reused without resending history.
+    """
+    first = client.post(
+        "/api/v1/chat",
+        json={"message": "My name is Sam.", "persona": "companion"}
+    )
+    assert first.status_code == 200
+    session_id = first.json()["session_id"]
+    assert session_id
+
+    second = client.post(
+        "/api/v1/chat",
+        json={"message": "What did I just tell you?", "persona": "companion", "session_id": session_id}
+    )
+    assert second.status_code == 200
+    assert second.json()["session_id"] == session_id
+
+
+def test_unknown_session_id_is_replaced_by_a_server_id():
+    """
+    Tests that a client cannot pick the id of a new session (session fixation).
+    """
+    from app.api.v1.chat import _resolve_session, session_store
+    from app.models.chat import ChatMessage
+
+    chosen = "attacker-chosen-id"
+    session_id, history = _resolve_session(
+        ChatMessage(message="Hi", persona="companion", session_id=chosen, history=["earlier"])
+    )
+    assert session_id != chosen
+    assert session_store.get_history(chosen) is None
+    assert [turn["text"] for turn in history] == ["earlier"]
+    assert _resolve_session(ChatMessage(message="Hi again", persona="companion", session_id=session_id))[1] == history
+
+
+class FakeGeminiModel:
+    """Streams the given fragments, then raises ``error`` if one is given."""
+
+    def __init__(self, texts, error=None):
+        self.texts = texts
+        self.error = error
+
+    def start_chat(self, history):
+        return self
+
+    async def send_message_async(self, content, stream=False):
+        async def chunks():
+            for text in self.texts:
+                yield SimpleNamespace(text=text)
+            if self.error is not None:
+                raise self.error
+        return chunks()
+
+
+class FakeRAGService:
+    reranker = None
+
+    def __init__(self, embedding):
+        self.embedding = embedding
+
+    async def aembed_query(self, text):
+        return self.embedding
+
+    async def aquery(self, text, top_k=5, filter=None):
+        return []
+
+    async def aassemble_context(self, text, matches):
+        return matches
+
+
+@pytest.mark.parametrize("texts, error, sent", [
+    (["I hear ", "you."], None, ["I hear ", "you."]),
+    (["I hear ", "you"], RuntimeError("connection reset"), ["I hear ", "you", ERROR_RESPONSE]),
+    ([], None, [EMPTY_RESPONSE]),
+])
+def test_failed_or_empty_stream_is_not_cached_or_recorded_as_the_reply(monkeypatch, texts, error, sent):
+    """
+    Tests that a stream cut short by an error, or without any text, is not cached as an answer.
+    """
+    from app.api.v1 import chat
+    from app.models.chat import ChatMessage
+    from app.services.response_cache import create_response_cache
+
+    gemini = GeminiService(api_key="test")
+    gemini.model = FakeGeminiModel(texts, error)
+    embedding = np.ones(8, dtype=np.float32) / np.sqrt(8)
+    monkeypatch.setattr(chat, "response_cache", create_response_cache(chat.settings))
+    monkeypatch.setitem(app.dependency_overrides, get_gemini_service, lambda: gemini)
+    monkeypatch.setitem(app.dependency_overrides, get_rag_service, lambda: FakeRAGService(embedding))
+    request = {"message": "I can't stop worrying.", "persona": "companion"}
+
+    with client.stream("POST", "/api/v1/chat/stream", json=request) as response:
+        body = "".join(response.iter_text())
+        session_id = response.headers["X-Session-Id"]
+
+    tokens = [json.loads(line[len("data: "):])["token"] for line in body.split("\n") if line.startswith('data: {"token"')]
+    assert tokens == sent
+    reply = "".join(texts)
+    key = chat._response_cache_key(ChatMessage(**request), [])
+    complete = error is None and bool(texts)
+    assert chat.response_cache.get(key, embedding) == (reply if complete else None)
+    assert chat.session_store.get_history(session_id)[-1] == {"role": "model", "text": reply or EMPTY_RESPONSE}
@@ -0,0 +1,23 @@
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_health_does_not_wait_for_models():
+    """
+    Liveness answers immediately, whether or not the RAG service has loaded.
+    """
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_ready_reports_rag_status():
+    """
+    Readiness is 200 only once the RAG service is loaded, 503 otherwise.
+    """
+    response = client.get("/ready")
+    status = response.json()["status"]
+    assert status in {"ready", "loading", "failed", "not_started"}
+    assert response.status_code == (200 if status == "ready" else 503)
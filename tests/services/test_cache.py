@@ -0,0 +1,28 @@
+import time
+from app.services.cache import TTLCache, normalize_query
+
+
+def test_normalize_query_collapses_case_whitespace_and_punctuation():
+    assert normalize_query("  I feel   ANXIOUS. ") == normalize_query("i feel anxious")
+
+
+def test_lru_eviction_and_counters():
+    """
+    The least recently used entry is evicted once the cache is full.
+    """
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(max_size=10, ttl_seconds=0.01)
+    cache.set("hi", [0.1, 0.2])
+    time.sleep(0.02)
+    assert cache.get("hi") is None
@@ -0,0 +1,129 @@
+import re
+
+from app.services.chunking import BoilerplateFilter, LengthHistogram, TokenChunker, WebChunker, split_lines
+
+
+class FakeTokenizer:
+    """Word-piece-like: words and punctuation, words cut into 3-character pieces."""
+
+    def _offsets(self, text):
+        offsets = []
+        for match in re.finditer(r"\w+|[^\w\s]", text):
+            for start in range(match.start(), match.end(), 3):
+                offsets.append((start, min(start + 3, match.end())))
+        return offsets
+
+    def __call__(self, texts, add_special_tokens=False, return_offsets_mapping=False, verbose=True):
+        offsets = [self._offsets(text) for text in texts]
+        encoded = {"input_ids": [list(range(len(o))) for o in offsets]}
+        if return_offsets_mapping:
+            encoded["offset_mapping"] = offsets
+        return encoded
+
+
+def word_count(text):
+    return len(text.split())
+
+
+def chunker(max_tokens, overlap_tokens=0):
+    return TokenChunker(FakeTokenizer(), max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+
+def test_token_chunker_never_exceeds_limit_or_cuts_words():
+    text = " ".join(f"word{i}." if i % 7 == 0 else f"w{i}" for i in range(200))
+    tc = chunker(max_tokens=20, overlap_tokens=4)
+
+    chunks = tc.split_text(text, source="doc")
+
+    assert max(tc.count_tokens(chunks)) <= 20
+    words = set(text.split())
+    assert all(set(chunk.split()) <= words for chunk in chunks)
+    assert chunks[0].split()[0] == "w0" or chunks[0].startswith("word0")
+    assert chunks[-1].endswith(text.split()[-1])
+    assert tc.histogram.summary()["doc"]["chunks"] == len(chunks)
+
+
+def test_token_chunker_overlaps_consecutive_chunks():
+    text = " ".join(f"t{i}" for i in range(50))
+    chunks = chunker(max_tokens=10, overlap_tokens=3).split_text(text)
+    for previous, following in zip(chunks, chunks[1:]):
+        assert previous.split()[-1] in following.split()
+
+
+def test_texts_that_fit_are_returned_unchanged():
+    tc = chunker(max_tokens=50)
+    assert tc.split_texts(["short text ", "   "]) == [["short text "], []]
+
+
+def test_histogram_buckets_lengths_per_source():
+    histogram = LengthHistogram(bin_width=10)
+    histogram.add("a", [3, 12, 15])
+    summary = histogram.summary()["a"]
+    assert summary["chunks"] == 3
+    assert summary["max_tokens"] == 15
+    assert summary["bins"] == {"0-9": 1, "10-19": 2}
+    assert histogram.report().startswith("a: 3 chunks")
+
+
+def page(url, *lines):
+    return {"text": "\n".join(lines), "metadata": {"source": url, "type": "web"}}
+
+
+def test_lines_are_packed_up_to_the_token_limit():
+    web = WebChunker(chunker(max_tokens=8))
+    doc = page("https://example.org/a", "one two three", "four five", "six seven eight")
+
+    chunks = web.chunk_document(doc)
+
+    assert [c["text"] for c in chunks] == ["one two three\nfour five", "six seven eight"]
+    assert all(c["metadata"]["source"] == "https://example.org/a" for c in chunks)
+
+
+def test_long_lines_are_split_instead_of_truncated():
+    web = WebChunker(chunker(max_tokens=4))
+    doc = page("https://example.org/a", "a b c d e f g h i j")
+
+    texts = [c["text"] for c in web.chunk_document(doc)]
+
+    assert texts == ["a b c d", "e f g h", "i j"]
+    assert all(word_count(t) <= 4 for t in texts)
+
+
+def test_boilerplate_repeated_across_pages_is_dropped():
+    footer = "Sign up for our weekly newsletter today"
+    docs = [
+        page(f"https://www.example.org/{i}", f"Unique article body number {i} here", footer)
+        for i in range(3)
+    ]
+    docs.append(page("https://other.org/x", "Some other site text", footer))
+    web = WebChunker(chunker(max_tokens=50), boilerplate=BoilerplateFilter(min_pages=3))
+
+    chunks = web.chunk_documents(docs)
+
+    example_texts = [c["text"] for c in chunks if "example.org" in c["metadata"]["source"]]
+    assert all(footer not in text for text in example_texts)
+    # Counted per domain: the single page on other.org keeps it
+    assert footer in [c["text"] for c in chunks if "other.org" in c["metadata"]["source"]][0]
+
+
+def test_short_fragments_are_never_boilerplate():
+    docs = [page(f"https://example.org/{i}", "Read", f"body {i}") for i in range(5)]
+    bp = BoilerplateFilter(min_pages=3).fit(docs)
+    assert bp.clean("https://example.org/0", ["Read", "body 0"]) == ["Read", "body 0"]
+
+
+def test_boilerplate_counts_persist_across_incremental_crawls(tmp_path):
+    path = str(tmp_path / "boilerplate.json")
+    footer = "Sign up for our weekly newsletter today"
+    docs = [page(f"https://example.org/{i}", f"Unique article body number {i} here", footer) for i in range(3)]
+    BoilerplateFilter(min_pages=3, path=path).fit(docs).save()
+
+    # Next crawl: only one page changed, the other two were skipped as unchanged
+    changed = page("https://example.org/0", "A rewritten article body for page zero", footer)
+    bp = BoilerplateFilter(min_pages=3, path=path).fit([changed])
+    assert bp.clean("https://example.org/0", split_lines(changed["text"])) == ["A rewritten article body for page zero"]
+
+    # Pages that are gone no longer count
+    bp.forget(["https://example.org/2"])
+    bp.fit([])
+    assert footer in bp.clean("https://example.org/0", [footer])
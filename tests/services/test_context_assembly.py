@@ -0,0 +1,59 @@
+import numpy as np
+
+from app.services.context_assembly import ContextAssembler, merge_overlapping, mmr_order, trim_to_budget
+from app.services.context_budget import count_tokens
+
+GUIDE = (
+    "Grounding helps when panic rises. Name five things you can see around you. "
+    "Then four things you can touch, three you can hear, two you can smell and one you can taste. "
+    "Breathe slowly while you do it."
+)
+
+
+def chunk(text, source="guide.pdf", score=0.5):
+    return {"text": text, "source": source, "score": score}
+
+
+def test_overlapping_neighbours_of_a_source_are_merged():
+    first, second = GUIDE[:120], GUIDE[80:]
+    merged = merge_overlapping([chunk(second, score=0.9), chunk("Unrelated.", "other.pdf"), chunk(first, score=0.4)])
+    assert merged == [chunk(GUIDE, score=0.9), chunk("Unrelated.", "other.pdf")]
+
+
+def test_other_sources_and_contained_chunks():
+    same_text_elsewhere = chunk(GUIDE[:120], source="web")
+    merged = merge_overlapping([chunk(GUIDE), chunk(GUIDE[40:100]), same_text_elsewhere])
+    assert merged == [chunk(GUIDE), same_text_elsewhere]
+
+
+def test_mmr_drops_near_duplicates_and_prefers_diversity():
+    query = np.array([1.0, 0.2, 0.0])
+    embeddings = np.array([
+        [1.0, 0.0, 0.0],
+        [0.99, 0.01, 0.0],  # repeat of the first
+        [0.7, 0.7, 0.0],
+        [0.8, 0.0, 0.6],
+    ])
+    order = mmr_order(query, embeddings, lambda_=0.5, duplicate_threshold=0.95)
+    assert order[0] in (0, 1)
+    assert len(set(order) & {0, 1}) == 1
+    assert sorted(order)[1:] == [2, 3]
+
+
+def test_trim_keeps_whole_chunks_then_cuts_at_a_sentence():
+    long_text = " ".join(f"Sentence number {i} is here." for i in range(100))
+    matches = [chunk("Short chunk."), chunk(long_text), chunk("Never reached.")]
+    trimmed = trim_to_budget(matches, max_tokens=120)
+    assert [m["text"] for m in trimmed][0] == "Short chunk."
+    assert len(trimmed) == 2
+    assert trimmed[1]["text"].endswith("here.")
+    assert sum(count_tokens(m["text"]) + count_tokens(m["source"]) + 8 for m in trimmed) <= 120
+
+
+def test_assembler_pipeline():
+    def encode(texts):
+        return np.array([[1.0, float(len(t) % 3)] for t in texts])
+
+    assembler = ContextAssembler(encode, max_tokens=1000)
+    context = assembler.assemble([1.0, 0.0], [chunk(GUIDE[:120]), chunk(GUIDE[80:])])
+    assert context == [chunk(GUIDE)]
@@ -0,0 +1,37 @@
+from app.services.context_budget import SUMMARY_PREFIX, ContextBudget, count_tokens
+
+
+def test_short_history_is_kept_verbatim():
+    budget = ContextBudget(max_tokens=1000, recent_turns=10)
+    history = ["hello", {"role": "model", "text": "hi there"}]
+    assert budget.fit("prompt", "message", history) == [
+        {"role": "user", "text": "hello"},
+        {"role": "model", "text": "hi there"},
+    ]
+
+
+def test_long_history_is_summarized_within_budget():
+    """
+    Older turns collapse into one summary turn and the request fits the budget.
+    """
+    budget = ContextBudget(max_tokens=300, recent_turns=4, summary_max_tokens=80)
+    history = [f"Message {i}. With some extra detail that is not needed." for i in range(50)]
+    fitted = budget.fit("prompt", "message", history)
+    assert fitted[0]["text"].startswith(SUMMARY_PREFIX)
+    assert [t["text"] for t in fitted[1:]] == history[-4:]
+    total = count_tokens("prompt") + count_tokens("message") + sum(count_tokens(t["text"]) for t in fitted)
+    assert total <= 300
+
+
+def test_summary_is_reused_incrementally():
+    calls = []
+
+    def summarizer(turns):
+        calls.append(len(turns))
+        return [t["text"] for t in turns]
+
+    budget = ContextBudget(max_tokens=10000, recent_turns=2, summarizer=summarizer)
+    history = [f"m{i}" for i in range(6)]
+    budget.fit("p", "m", history)
+    budget.fit("p", "m", history + ["m6"])
+    assert calls == [4, 1]
@@ -0,0 +1,82 @@
+import asyncio
+
+import httpx
+
+from app.services.crawler import AsyncCrawler
+
+
+def crawl(handler, urls, **kwargs):
+    """Fetch ``urls`` through a crawler whose requests are answered by ``handler``."""
+    async def run():
+        crawler = AsyncCrawler(transport=httpx.MockTransport(handler), **{"min_interval_seconds": 0, **kwargs})
+        async with crawler:
+            return await crawler.fetch_all(urls)
+
+    return asyncio.run(run())
+
+
+def test_transient_failures_are_retried_with_backoff(monkeypatch):
+    attempts = []
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def record_sleep(delay):
+        sleeps.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", record_sleep)
+
+    def handler(request):
+        attempts.append(request.url.path)
+        if len(attempts) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, text="recovered")
+
+    [page] = crawl(handler, ["https://example.org/page"], max_retries=3, backoff_seconds=1.0)
+
+    assert page.status_code == 200 and page.text == "recovered"
+    assert len(attempts) == 3
+    # Doubled per retry, with up to 50% jitter
+    assert 1.0 <= sleeps[0] <= 1.5 and 2.0 <= sleeps[1] <= 3.0
+
+
+def test_gives_up_after_max_retries_and_on_client_errors(monkeypatch):
+    monkeypatch.setattr(AsyncCrawler, "_retry_delay", lambda self, attempt, response=None: 0.0)
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.url.path)
+        return httpx.Response(503 if request.url.path == "/flaky" else 404)
+
+    assert crawl(handler, ["https://example.org/flaky", "https://example.org/missing"], max_retries=2) == [None, None]
+    assert attempts.count("/flaky") == 3
+    assert attempts.count("/missing") == 1
+
+
+def test_retry_after_is_honoured_up_to_a_cap():
+    crawler = AsyncCrawler(backoff_seconds=1.0, max_retry_after_seconds=30.0)
+    assert crawler._retry_delay(0, httpx.Response(429, headers={"Retry-After": "5"})) == 5.0
+    assert crawler._retry_delay(0, httpx.Response(429, headers={"Retry-After": "86400"})) == 30.0
+
+
+def test_per_domain_concurrency_and_interval():
+    active = {"example.org": 0, "other.org": 0}
+    peak = dict(active)
+    starts = []
+
+    async def handler(request):
+        host = request.url.host
+        starts.append((host, asyncio.get_running_loop().time()))
+        active[host] += 1
+        peak[host] = max(peak[host], active[host])
+        await asyncio.sleep(0.05)
+        active[host] -= 1
+        return httpx.Response(200, text=str(request.url))
+
+    urls = [f"https://example.org/{i}" for i in range(6)] + [f"https://other.org/{i}" for i in range(2)]
+    pages = crawl(handler, urls, per_domain_concurrency=2, min_interval_seconds=0.01)
+
+    assert [page.text for page in pages] == urls
+    assert peak == {"example.org": 2, "other.org": 2}
+    example_starts = [t for host, t in starts if host == "example.org"]
+    assert all(b - a >= 0.009 for a, b in zip(example_starts, example_starts[1:]))
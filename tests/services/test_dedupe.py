@@ -0,0 +1,42 @@
+from app.services.dedupe import MinHashDeduper
+
+ANSWER = (
+    "It sounds like you are carrying a lot right now. Try to notice when the anxious "
+    "thoughts begin, write them down, and talk them through with someone you trust. "
+    "If the feelings persist for weeks, a counsellor can help you work through them."
+)
+
+
+def test_near_duplicates_are_detected_and_distinct_text_is_kept():
+    deduper = MinHashDeduper()
+    assert deduper.check_and_add("a", ANSWER) is None
+    near_copy = ANSWER.replace("work through them", "work through these")
+    assert deduper.check_and_add("b", near_copy) == "a"
+    assert deduper.check_and_add("c", "Sleep hygiene starts with a consistent bedtime and a dark, quiet room.") is None
+    assert len(deduper) == 2
+
+
+def test_removed_chunks_no_longer_match():
+    deduper = MinHashDeduper()
+    deduper.add("a", ANSWER)
+    deduper.remove(["a"])
+    assert deduper.check_and_add("b", ANSWER) is None
+
+
+def test_signatures_persist(tmp_path):
+    path = tmp_path / "dedupe.npz"
+    deduper = MinHashDeduper(str(path))
+    deduper.add("a", ANSWER)
+    deduper.save()
+
+    reloaded = MinHashDeduper(str(path))
+    assert "a" in reloaded
+    assert reloaded.check_and_add("b", ANSWER + " ") == "a"
+
+
+def test_ignored_chunks_do_not_match():
+    deduper = MinHashDeduper()
+    deduper.add("old", ANSWER)
+    edited = ANSWER.replace("work through them", "work through these")
+    assert deduper.check_and_add("new", edited, ignore={"old"}) is None
+    assert "new" in deduper
@@ -0,0 +1,70 @@
+import numpy as np
+
+from app.services.embedders import OnnxEmbedder
+
+PAD_VECTOR = [100.0, 100.0, 100.0, 100.0]
+
+
+class StubTokenizer:
+    """One token per word, id = word length, right-padded with 0 like a Hugging Face tokenizer."""
+
+    def __call__(self, texts, padding, truncation, max_length, return_tensors):
+        ids = [[len(word) for word in text.split()][:max_length] for text in texts]
+        width = max(len(row) for row in ids)
+        return {
+            "input_ids": np.array([row + [0] * (width - len(row)) for row in ids]),
+            "attention_mask": np.array([[1] * len(row) + [0] * (width - len(row)) for row in ids]),
+            "token_type_ids": np.zeros((len(ids), width), dtype=np.int64),
+        }
+
+
+class StubSession:
+    """Token embedding [id, 1, 0, 0]; padding gets a vector that would skew an unmasked mean."""
+
+    def __init__(self):
+        self.batches = []
+
+    def run(self, output_names, inputs):
+        self.batches.append(inputs)
+        ids = inputs["input_ids"]
+        tokens = np.zeros(ids.shape + (4,), dtype=np.float32)
+        tokens[..., 0] = ids
+        tokens[..., 1] = 1.0
+        tokens[ids == 0] = PAD_VECTOR
+        return [tokens]
+
+
+def make_embedder(max_seq_length=8):
+    embedder = OnnxEmbedder.__new__(OnnxEmbedder)
+    embedder.session = StubSession()
+    embedder.tokenizer = StubTokenizer()
+    embedder._input_names = {"input_ids", "attention_mask"}
+    embedder.max_seq_length = max_seq_length
+    embedder.normalize = True
+    embedder._dimension = None
+    return embedder
+
+
+def test_mean_pools_real_tokens_normalizes_and_keeps_input_order():
+    embedder = make_embedder()
+    texts = ["a bb", "a bb ccc dddd", "eeeee", "a bb ccc"]
+
+    embeddings = embedder.encode(texts, batch_size=2)
+
+    # Longest first: one batch of the two longest, one of the two shortest
+    assert [batch["input_ids"].shape[1] for batch in embedder.session.batches] == [4, 2]
+    assert all(set(batch) == {"input_ids", "attention_mask"} for batch in embedder.session.batches)
+    means = np.array([[1.5, 1, 0, 0], [2.5, 1, 0, 0], [5, 1, 0, 0], [2, 1, 0, 0]], dtype=np.float32)
+    expected = means / np.linalg.norm(means, axis=1, keepdims=True)
+    np.testing.assert_allclose(embeddings, expected, rtol=1e-6)
+    np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, rtol=1e-6)
+    assert embedder.get_sentence_embedding_dimension() == 4
+
+
+def test_single_string_returns_a_vector():
+    embedder = make_embedder()
+
+    vector = embedder.encode("a bb")
+
+    assert vector.shape == (4,)
+    np.testing.assert_allclose(vector, embedder.encode(["a bb", "ccc"])[0], rtol=1e-6)
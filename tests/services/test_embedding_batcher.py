@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import time
+
+import pytest
+
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+class FakeEncoder:
+    """Embeds a text as [len(text)] and records every batch it was called with."""
+
+    def __init__(self, fail_on: str = None):
+        self.fail_on = fail_on
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        if self.fail_on in texts:
+            raise RuntimeError("encoder failed")
+        return [[float(len(text))] for text in texts]
+
+
+def test_concurrent_queries_share_one_encode_call():
+    encoder = FakeEncoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=8, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed("x" * n) for n in range(1, 6)))
+
+    with ThreadPoolExecutor(1) as executor:
+        batcher.executor = executor
+        embeddings = asyncio.run(run())
+
+    assert embeddings == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert encoder.batches == [["x", "xx", "xxx", "xxxx", "xxxxx"]]
+    assert batcher.stats()["max_batch_size"] == 5
+
+
+def test_full_batch_flushes_without_waiting():
+    encoder = FakeEncoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=2, max_wait_ms=10_000)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed(text) for text in ["a", "b", "c", "d"]))
+
+    started = time.perf_counter()
+    assert asyncio.run(run()) == [[1.0]] * 4
+    assert time.perf_counter() - started < 5
+    assert encoder.batches == [["a", "b"], ["c", "d"]]
+
+
+def test_lone_query_is_flushed_after_max_wait():
+    encoder = FakeEncoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=32, max_wait_ms=20)
+
+    async def run():
+        first = await batcher.embed("alone")
+        second = await batcher.embed("later")
+        return first, second
+
+    assert asyncio.run(run()) == ([5.0], [5.0])
+    assert encoder.batches == [["alone"], ["later"]]
+
+
+def test_encode_errors_reach_every_caller_of_the_batch():
+    encoder = FakeEncoder(fail_on="bad")
+    batcher = EmbeddingBatcher(encoder, max_batch_size=8, max_wait_ms=50)
+
+    async def run():
+        failed = await asyncio.gather(batcher.embed("bad"), batcher.embed("good"), return_exceptions=True)
+        # The worker survives the failure and serves the next batch
+        return failed, await batcher.embed("next")
+
+    failed, recovered = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in failed)
+    assert recovered == [4.0]
+    with pytest.raises(RuntimeError):
+        asyncio.run(batcher.embed("bad"))
@@ -0,0 +1,84 @@
+import os
+import sys
+import threading
+
+import numpy as np
+
+from app.services import embedding_pool
+from app.services.embedding_pool import EmbeddingPool, default_devices
+
+
+class FakeModel:
+    def __init__(self):
+        self.batches = []
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+    def encode(self, texts, batch_size=32):
+        self.batches.append(list(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_encode_sorts_by_length_but_returns_input_order():
+    model = FakeModel()
+    pool = EmbeddingPool(model, devices=["cpu"])
+    texts = ["aa", "a", "aaaa", "aaa"]
+
+    embeddings = pool.encode(texts)
+
+    assert model.batches == [["aaaa", "aaa", "aa", "a"]]
+    assert embeddings[:, 0].tolist() == [2, 1, 4, 3]
+    assert pool.stats()["chunks"] == 4
+    pool.close()
+
+
+def test_upsert_callbacks_run_in_submission_order_on_caller_thread():
+    pool = EmbeddingPool(FakeModel(), devices=["cpu"], upsert_workers=3, max_pending_upserts=2)
+    upserted, recorded, threads = [], [], set()
+
+    for i in range(6):
+        pool.submit_upsert(
+            lambda i=i: upserted.append(i),
+            lambda i=i: (recorded.append(i), threads.add(threading.get_ident())),
+        )
+    pool.drain()
+
+    assert sorted(upserted) == list(range(6))
+    assert recorded == list(range(6))
+    assert threads == {threading.get_ident()}
+    pool.close()
+
+
+def test_default_devices_use_every_core_without_a_gpu(monkeypatch):
+    monkeypatch.setitem(sys.modules, "torch", None)
+    monkeypatch.setattr(embedding_pool.os, "cpu_count", lambda: 6)
+
+    assert default_devices() == ["cpu"] * 6
+    assert default_devices(2) == ["cpu"] * 2
+
+
+def test_worker_processes_split_the_cores_between_them(monkeypatch):
+    class MultiProcessModel(FakeModel):
+        def start_multi_process_pool(self, target_devices):
+            self.threads = {name: os.environ.get(name) for name in embedding_pool.THREAD_ENV_VARS}
+            return {"devices": target_devices}
+
+        def encode_multi_process(self, texts, pool, batch_size, chunk_size):
+            return self.encode(texts, batch_size)
+
+        def stop_multi_process_pool(self, pool):
+            pass
+
+    for name in embedding_pool.THREAD_ENV_VARS:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("MKL_NUM_THREADS", "3")
+    monkeypatch.setattr(embedding_pool.os, "cpu_count", lambda: 8)
+    model = MultiProcessModel()
+    pool = EmbeddingPool(model, devices=["cpu"] * 4)
+
+    pool.encode(["a", "bb"])
+
+    assert model.threads == {"OMP_NUM_THREADS": "2", "MKL_NUM_THREADS": "3"}
+    assert "OMP_NUM_THREADS" not in os.environ
+    pool.close()
@@ -0,0 +1,52 @@
+import pytest
+
+from app.services.html_extract import EXTRACTORS, get_extractor
+
+PAGE = """
+<html><head><title>ignored</title><script>var x = 1;</script></head>
+<body>
+  <h1>Coping with <em>anxiety</em></h1>
+  <nav>Menu</nav>
+  <div class="comp article-body-content">
+    <p>First paragraph.</p>
+    <script>tracking();</script>
+    <p>Second <a href="#">paragraph</a>.</p>
+  </div>
+</body></html>
+"""
+
+
+@pytest.mark.parametrize("name", list(EXTRACTORS))
+def test_extractors_agree_on_title_and_content(name):
+    try:
+        extractor = get_extractor(name)
+    except ImportError:
+        pytest.skip(f"{name} extractor is not installed")
+
+    page = extractor.extract(PAGE, "div.comp.article-body-content")
+
+    assert page.title == "Coping with anxiety"
+    assert page.text.split("\n") == ["First paragraph.", "Second", "paragraph", "."]
+
+
+@pytest.mark.parametrize("name", list(EXTRACTORS))
+def test_missing_container_returns_no_text(name):
+    try:
+        extractor = get_extractor(name)
+    except ImportError:
+        pytest.skip(f"{name} extractor is not installed")
+
+    page = extractor.extract("<html><body><p>hi</p></body></html>", "div.rich-text")
+
+    assert page.title is None
+    assert page.text is None
+
+
+def test_engine_without_extract_cannot_be_created():
+    from app.services.html_extract import HTMLExtractor
+
+    class Unfinished(HTMLExtractor):
+        name = "unfinished"
+
+    with pytest.raises(TypeError):
+        Unfinished()
@@ -0,0 +1,34 @@
+from app.services.http_cache import HTTPCache
+
+
+def test_store_and_conditional_headers(tmp_path):
+    cache = HTTPCache(str(tmp_path))
+    url = "https://example.org/page"
+    assert cache.conditional_headers(url) == {}
+    assert cache.load(url) is None
+
+    cache.store(url, {"ETag": '"abc"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}, "<html>hi</html>")
+
+    assert cache.conditional_headers(url) == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+    assert cache.load(url) == "<html>hi</html>"
+
+
+def test_responses_without_validators_are_not_cached(tmp_path):
+    cache = HTTPCache(str(tmp_path))
+    url = "https://example.org/page"
+    cache.store(url, {}, "<html>hi</html>")
+    assert cache.conditional_headers(url) == {}
+    assert cache.load(url) is None
+
+
+def test_missing_body_invalidates_entry(tmp_path):
+    cache = HTTPCache(str(tmp_path))
+    url = "https://example.org/page"
+    cache.store(url, {"ETag": '"abc"'}, "body")
+    _, body_path = cache._paths(url)
+    body_path.unlink()
+    assert cache.conditional_headers(url) == {}
+    assert cache.load(url) is None
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services import ingestion
+from app.services.ingestion import IngestManifest, IngestionCheckpoint, batched, chunk_id, iter_pdf_texts
+
+
+def test_chunk_id_is_deterministic_and_source_scoped():
+    assert chunk_id("a.pdf", "text") == chunk_id("a.pdf", "text")
+    assert chunk_id("a.pdf", "text") != chunk_id("b.pdf", "text")
+    assert chunk_id("a.pdf", "text") != chunk_id("a.pdf", "other text")
+
+
+def test_batched_handles_generators():
+    assert list(batched((i for i in range(5)), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_manifest_round_trip(tmp_path):
+    """
+    Stored ids per source survive a save/load cycle and can be pruned by type.
+    """
+    path = tmp_path / "manifest.json"
+    manifest = IngestManifest(str(path))
+    manifest.add("a.pdf", "pdf", ["1", "2"])
+    manifest.set("https://example.com", "web", ["3"])
+    manifest.save()
+
+    reloaded = IngestManifest(str(path))
+    assert reloaded.ids("a.pdf") == {"1", "2"}
+    assert reloaded.sources("pdf") == ["a.pdf"]
+    assert reloaded.remove("a.pdf") == {"1", "2"}
+    assert reloaded.ids("a.pdf") == set()
+
+
+def test_checkpoint_detects_modified_files(tmp_path):
+    pdf = tmp_path / "guide.pdf"
+    pdf.write_bytes(b"v1")
+    checkpoint = IngestionCheckpoint(str(tmp_path / "checkpoint.json"))
+    checkpoint.mark_done([pdf])
+    assert IngestionCheckpoint(str(tmp_path / "checkpoint.json")).is_done(pdf)
+
+    pdf.write_bytes(b"version 2")
+    assert not checkpoint.is_done(pdf)
+
+
+def test_pdf_extraction_keeps_a_bounded_window_in_flight(tmp_path, monkeypatch):
+    submitted = []
+
+    class RecordingExecutor(ThreadPoolExecutor):
+        def submit(self, fn, *args):
+            submitted.append(args[0])
+            return super().submit(fn, *args)
+
+    monkeypatch.setattr(ingestion, "ProcessPoolExecutor", RecordingExecutor)
+    monkeypatch.setattr(ingestion, "extract_pdf_text", lambda path: (path, f"text of {path}"))
+    pdf_files = [tmp_path / f"{i}.pdf" for i in range(20)]
+
+    texts = iter_pdf_texts(pdf_files, workers=2)
+    first_path, first_text = next(texts)
+    assert (first_path, first_text) == (pdf_files[0], f"text of {pdf_files[0]}")
+    assert len(submitted) == 5  # 2 per worker, plus the refill for the result taken
+
+    assert [path for path, _ in texts] == pdf_files[1:]
+    assert len(submitted) == 20
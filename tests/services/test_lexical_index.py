@@ -0,0 +1,103 @@
+import pytest
+
+from app.services.lexical_index import BM25Index, PartitionedLexicalIndex, reciprocal_rank_fusion, tokenize
+from app.services.partitions import normalize_filter
+
+DOCS = {
+    "ptsd": "PTSD can follow a traumatic event. Flashbacks and nightmares are common symptoms of PTSD.",
+    "sleep": "Sleep hygiene starts with a consistent bedtime and a dark, quiet room.",
+    "dbt": "DBT skills such as distress tolerance help people manage intense emotions.",
+}
+
+
+def build(path) -> BM25Index:
+    index = BM25Index(str(path))
+    for chunk_id, text in DOCS.items():
+        index.add(chunk_id, text, {"source": f"{chunk_id}.pdf"})
+    index.flush()
+    return index
+
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize("What is DBT and how does it work?") == ["dbt", "how", "does", "work"]
+
+
+def test_exact_terms_rank_first(tmp_path):
+    index = build(tmp_path)
+    matches = index.query("symptoms of PTSD", top_k=2)
+    assert [m["id"] for m in matches] == ["ptsd"]
+    assert matches[0]["metadata"] == {"source": "ptsd.pdf", "text": DOCS["ptsd"]}
+    assert index.query("unrelated words entirely") == []
+
+
+def test_index_persists_and_applies_removals(tmp_path):
+    build(tmp_path)
+    index = BM25Index(str(tmp_path))
+    assert len(index) == 3 and "sleep" in index
+    index.remove(["sleep"])
+    index.add("bedtime", "A regular bedtime routine helps sleep.", {"source": "web"})
+    index.flush()
+
+    reloaded = BM25Index(str(tmp_path))
+    assert "sleep" not in reloaded
+    assert [m["id"] for m in reloaded.query("bedtime")] == ["bedtime"]
+    # The replaced generation stays for readers that have not reloaded yet
+    assert sorted(p.name for p in tmp_path.glob("docs-*.jsonl")) == ["docs-1.jsonl", "docs-2.jsonl"]
+    index.remove(["dbt"])
+    index.flush()
+    assert sorted(p.name for p in tmp_path.glob("docs-*.jsonl")) == ["docs-2.jsonl", "docs-3.jsonl"]
+
+
+def test_reader_catches_up_with_flushes_from_another_process(tmp_path):
+    server = build(tmp_path)
+    assert [m["id"] for m in server.query("PTSD")] == ["ptsd"]
+
+    ingest = BM25Index(str(tmp_path))
+    for chunk_id, text in [("panic", "Panic attacks peak within minutes."), ("grief", "Grief comes in waves.")]:
+        ingest.add(chunk_id, text, {"source": f"{chunk_id}.pdf"})
+        ingest.flush()
+
+    assert not (tmp_path / "docs-1.jsonl").exists()
+    assert [m["id"] for m in server.query("PTSD")] == ["ptsd"]
+    assert [m["id"] for m in server.query("panic attacks")] == ["panic"]
+
+
+def test_clear_empties_the_index(tmp_path):
+    index = build(tmp_path)
+    index.clear()
+    index.flush()
+    assert len(index) == 0
+    assert index.query("PTSD") == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    def ranking(*ids):
+        return [{"id": i, "score": 1.0, "metadata": {"text": i}} for i in ids]
+
+    fused = reciprocal_rank_fusion([ranking("a", "b", "c"), ranking("b", "d")], k=60)
+    assert [m["id"] for m in fused] == ["b", "a", "d", "c"]
+    assert fused[0]["score"] == 1 / 62 + 1 / 61
+
+
+def test_partitions_and_source_filters(tmp_path):
+    index = PartitionedLexicalIndex(str(tmp_path))
+    index.add("guide", "Grounding exercises for panic attacks.", {"type": "pdf", "source": "guide.pdf"})
+    index.add("page", "Panic attacks: what they feel like.", {"type": "web", "source": "https://nhs.uk/panic"})
+    index.add("answer", "When panic starts, slow your breathing.", {"type": "hf", "source": "counsel_chat"})
+    index.flush()
+
+    reloaded = PartitionedLexicalIndex(str(tmp_path))
+    assert reloaded.partitions() == ["hf", "pdf", "web"]
+    assert {m["id"] for m in reloaded.query("panic", top_k=5)} == {"guide", "page", "answer"}
+    assert [m["id"] for m in reloaded.query("panic", filter={"type": ["pdf", "hf"], "source": ["guide.pdf"]})] == ["guide"]
+
+    reloaded.clear("web")
+    reloaded.flush()
+    assert "page" not in reloaded and "guide" in reloaded
+
+
+def test_normalize_filter():
+    assert normalize_filter(None) is None
+    assert normalize_filter({"type": "pdf", "source": ["b", "a", "b"]}) == (("source", ("a", "b")), ("type", ("pdf",)))
+    with pytest.raises(ValueError):
+        normalize_filter({"persona": "yap"})
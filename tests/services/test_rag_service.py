@@ -0,0 +1,231 @@
+from pathlib import Path
+import re
+import zlib
+
+import numpy as np
+import pytest
+
+from app.core.config import Settings
+from app.services import ingestion, rag_service
+from app.services.ingestion import IngestManifest, IngestionCheckpoint
+from app.services.rag_service import RAGService
+from tests.services.test_chunking import FakeTokenizer
+
+DIMENSION = 384
+
+
+class FakeEmbeddingModel:
+    """Hashed bag of words in the SentenceTransformer interface; records what it encodes."""
+
+    max_seq_length = 256
+
+    def __init__(self):
+        self.tokenizer = FakeTokenizer()
+        self.encoded = []
+
+    def get_sentence_embedding_dimension(self):
+        return DIMENSION
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        self.encoded.extend(texts)
+        embeddings = np.zeros((len(texts), DIMENSION), dtype=np.float32)
+        for row, text in zip(embeddings, texts):
+            for word in re.findall(r"\w+", text.lower()):
+                row[zlib.crc32(word.encode()) % DIMENSION] += 1.0
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
+
+
+@pytest.fixture
+def make_service(tmp_path, monkeypatch):
+    """Builds RAGServices on the local backends under tmp_path, with a fake embedding model."""
+    services = []
+
+    def make(**overrides) -> RAGService:
+        monkeypatch.setattr(rag_service, "create_embedding_model", lambda settings: FakeEmbeddingModel())
+        settings = Settings(**{
+            "GEMINI_API_KEY": "test",
+            "VECTOR_STORE_BACKEND": "local",
+            "LOCAL_INDEX_DIR": str(tmp_path / "vectors"),
+            "LEXICAL_INDEX_DIR": str(tmp_path / "lexical"),
+            "DEDUPE_INDEX_PATH": str(tmp_path / "dedupe.npz"),
+            "EMBED_PROCESSES": 1,
+            "EMBED_BATCHING_ENABLED": False,
+            "RETRIEVAL_MODE": "dense",
+            **overrides,
+        })
+        service = RAGService(settings)
+        services.append(service)
+        return service
+
+    yield make
+    for service in services:
+        service.close()
+
+
+def chunks(source, *texts, source_type="pdf"):
+    return [{"text": text, "metadata": {"source": source, "type": source_type}} for text in texts]
+
+
+def test_query_embeds_original_text_and_hands_out_copies(make_service):
+    service = make_service()
+    service.embed_and_store(chunks("guide.pdf", "Feeling anxious is common.", "Sleep hygiene helps."))
+    service.model.encoded.clear()
+
+    first = service.query("I feel Anxious!", top_k=2)
+    assert service.model.encoded == ["I feel Anxious!"]
+    first[0]["text"] = "changed by a caller"
+    first.clear()
+
+    # Same normalized query: served from the caches, unaffected by the caller's edits
+    second = service.query("i feel anxious", top_k=2)
+    assert service.model.encoded == ["I feel Anxious!"]
+    assert second[0]["text"] == "Feeling anxious is common."
+    assert len(second) == 2
+
+
+def test_manifest_is_saved_only_after_the_stores_are_flushed(make_service, tmp_path, monkeypatch):
+    service = make_service(INGEST_BATCH_SIZE=1)
+    manifest = IngestManifest(str(tmp_path / "manifest.json"), save_interval_seconds=0)
+    events = []
+
+    def record(name, method):
+        monkeypatch.setattr(method.__self__, method.__name__, lambda **kwargs: (events.append(name), method(**kwargs)))
+
+    record("vectors", service.vector_store.flush)
+    record("lexical", service.lexical_index.flush)
+    record("manifest", manifest.save)
+
+    names = ("panic", "sleep", "grief")
+    service.sync_sources(
+        [(f"{name}.pdf", chunks(f"{name}.pdf", f"All about {name} and how it feels.")) for name in names],
+        manifest,
+        source_type="pdf"
+    )
+
+    saves = [i for i, event in enumerate(events) if event == "manifest"]
+    assert len(saves) > 1
+    assert all(events[i - 2:i] == ["vectors", "lexical"] for i in saves)
+    stored = IngestManifest(str(tmp_path / "manifest.json"))
+    reopened = make_service()
+    assert len(reopened.vector_store.partition("pdf")) == 3
+    assert all(len(stored.ids(f"{name}.pdf")) == 1 for name in names)
+
+
+@pytest.mark.parametrize("save_interval", [0, 3600])
+def test_interrupted_pdf_ingest_resumes_without_losing_files(make_service, tmp_path, monkeypatch, save_interval):
+    topics = ["panic", "sleep", "grief", "anger", "stress", "phobia", "burnout", "loneliness", "trauma", "shame"]
+    directory = tmp_path / "guides"
+    directory.mkdir()
+    for topic in topics:
+        (directory / f"{topic}.pdf").write_text(f"A short guide on {topic}: what {topic} is and how to cope with {topic}.")
+    crash_on = {"trauma.pdf"}
+
+    def extract(pdf_path):
+        if Path(pdf_path).name in crash_on:
+            raise RuntimeError("interrupted")
+        return pdf_path, Path(pdf_path).read_text()
+
+    monkeypatch.setattr(ingestion, "extract_pdf_text", extract)
+
+    def ingest(service):
+        manifest = IngestManifest(str(tmp_path / "manifest.json"), save_interval_seconds=save_interval)
+        checkpoint = IngestionCheckpoint(str(tmp_path / "checkpoint.json"))
+        return service.ingest_pdfs(directory, manifest, checkpoint=checkpoint, workers=1)
+
+    with pytest.raises(RuntimeError):
+        ingest(make_service(INGEST_BATCH_SIZE=1))
+
+    # Every file the checkpoint records as done is on disk
+    checkpoint = IngestionCheckpoint(str(tmp_path / "checkpoint.json"))
+    done = [p for p in sorted(directory.glob("*.pdf")) if checkpoint.is_done(p)]
+    assert done
+    restarted = make_service(INGEST_BATCH_SIZE=1)
+    assert len(restarted.vector_store.partition("pdf")) >= len(done)
+
+    crash_on.clear()
+    stats = ingest(restarted)
+    assert stats["added"] == len(topics) - len(done)
+    assert not any(p.stem in text for p in done for text in restarted.model.encoded)
+    assert len(restarted.vector_store.partition("pdf")) == len(topics)
+    checkpoint = IngestionCheckpoint(str(tmp_path / "checkpoint.json"))
+    assert all(checkpoint.is_done(p) for p in directory.glob("*.pdf"))
+
+
+def test_edited_chunk_replaces_its_old_version_on_resync(make_service, tmp_path):
+    service = make_service()
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    original = (
+        "Grounding exercises can help you stay present when anxiety rises and thoughts start to race. "
+        "Name five things you can see, four you can touch, three you can hear, two you can smell and one "
+        "you can taste. Breathe slowly while you do it, and remind yourself that the feeling will pass "
+        "even if it seems overwhelming right now."
+    )
+    edited = original.replace("can help you", "may help you")
+
+    service.sync_sources([("guide.pdf", chunks("guide.pdf", original))], manifest, source_type="pdf")
+    stats = service.sync_sources([("guide.pdf", chunks("guide.pdf", edited))], manifest, source_type="pdf")
+
+    assert stats["duplicates"] == 0
+    [match] = service.query("grounding exercises", top_k=5)
+    assert match["text"] == edited
+    assert len(manifest.ids("guide.pdf")) == 1
+
+
+
+def test_resync_of_a_multi_batch_source_keeps_edits_and_drops_new_duplicates(make_service, tmp_path):
+    service = make_service()
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    breathing = (
+        "Box breathing means breathing in for four counts, holding for four, breathing out for four and "
+        "holding again for four. Repeat the cycle a few times whenever you notice your heart racing or your "
+        "shoulders tensing, and let your attention rest on the counting rather than on the worry."
+    )
+    sleep = (
+        "Going to bed and getting up at the same time every day trains your body clock. Keep the bedroom "
+        "dark, cool and quiet, avoid screens for an hour before bed, and if you cannot fall asleep after "
+        "twenty minutes, get up and do something calm until you feel drowsy again."
+    )
+    edited_sleep = sleep.replace("every day", "each day")
+    breathing_copy = breathing.replace("heart racing", "heart pounding")
+
+    def sync(*batches):
+        groups = [("qa", chunks("qa", *texts, source_type="hf")) for texts in batches]
+        return service.sync_sources(groups, manifest, source_type="hf")
+
+    sync([breathing], [sleep])
+    # The unchanged row only arrives after its near-copy
+    stats = sync([edited_sleep, breathing_copy], [breathing])
+
+    assert stats == {"added": 1, "unchanged": 1, "deleted": 1, "duplicates": 1}
+    texts = {match["text"] for match in service.query("sleep bedroom breathing", top_k=5)}
+    assert texts == {breathing, edited_sleep}
+    assert len(manifest.ids("qa")) == 2
+
+
+def test_hf_rows_are_chunked_one_record_batch_at_a_time(make_service):
+    datasets = pytest.importorskip("datasets")
+    service = make_service(HF_BATCH_SIZE=2)
+    long_answer = " ".join(["Breathe in slowly and out again."] * 60)
+    ds = datasets.Dataset.from_dict({
+        "question": ["How do I sleep?", "", "Why do I panic?", "What helps?", "Any tips?"],
+        "answer": ["Keep a routine.", "", None, long_answer, "Walk daily."],
+        "topic": ["sleep", "none", "panic", "breathing", "exercise"],
+        "ignored": [1, 2, 3, 4, 5],
+    })
+
+    groups = list(service._iter_hf_chunks(ds, "qa", ["question", "answer"], ["topic"], chunk=False))
+
+    assert [source for source, _ in groups] == ["qa"] * 3
+    batches = [[(c["metadata"]["row_id"], c["metadata"]["topic"]) for c in batch] for _, batch in groups]
+    assert batches[0] == [(0, "sleep")]
+    assert batches[2] == [(4, "exercise")]
+    # Rows the model would truncate are split even without chunking
+    assert batches[1][0] == (2, "panic") and len(batches[1]) > 2
+    assert {row for row, _ in batches[1][1:]} == {3}
+    texts = [c["text"] for _, batch in groups for c in batch]
+    assert texts[0] == "How do I sleep?\nKeep a routine."
+    assert texts[1] == "Why do I panic?"
+    assert all(set(c["metadata"]) == {"source", "type", "row_id", "topic"} for _, batch in groups for c in batch)
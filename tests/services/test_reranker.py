@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import time
+
+from app.services.reranker import CrossEncoderReranker
+
+MATCHES = [
+    {"text": "Grounding exercises for panic", "source": "a", "score": 0.9},
+    {"text": "Sleep and anxiety", "source": "b", "score": 0.8},
+    {"text": "Breathing exercises calm panic attacks", "source": "c", "score": 0.7},
+]
+
+
+class FakeCrossEncoder:
+    """Scores a pair by the number of query words in the text."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.calls.append(len(pairs))
+        time.sleep(self.delay)
+        return [len(set(query.split()) & set(text.lower().split())) for query, text in pairs]
+
+
+def test_rerank_orders_by_cross_encoder_in_one_pass():
+    model = FakeCrossEncoder()
+    reranker = CrossEncoderReranker(model, timeout_ms=1000)
+    with ThreadPoolExecutor(1) as executor:
+        matches, reranked = reranker.rerank("breathing exercises panic", MATCHES, 2, executor)
+    assert reranked
+    assert [m["source"] for m in matches] == ["c", "a"]
+    assert matches[0]["score"] == 3.0
+    assert model.calls == [3]
+
+
+def test_timeout_falls_back_to_retrieval_order():
+    reranker = CrossEncoderReranker(FakeCrossEncoder(delay=0.2), timeout_ms=20)
+    with ThreadPoolExecutor(1) as executor:
+        matches, reranked = asyncio.run(reranker.arerank("breathing exercises panic", MATCHES, 2, executor))
+    assert not reranked
+    assert [m["source"] for m in matches] == ["a", "b"]
+    assert reranker.stats()["fallbacks"] == 1
+
+
+def test_expired_deadline_skips_the_model():
+    model = FakeCrossEncoder()
+    reranker = CrossEncoderReranker(model)
+    assert reranker.score("panic", MATCHES, deadline=time.monotonic() - 1) is None
+    assert model.calls == []
@@ -0,0 +1,39 @@
+import time
+
+from app.services.response_cache import SemanticResponseCache
+
+
+def test_similar_message_reuses_response_per_key():
+    cache = SemanticResponseCache(threshold=0.9)
+    cache.set(("companion", None), [1.0, 0.0, 0.0], "It's okay to feel anxious.")
+
+    assert cache.get(("companion", None), [0.95, 0.1, 0.0]) == "It's okay to feel anxious."
+    assert cache.get(("companion", None), [0.5, 0.5, 0.5]) is None
+    assert cache.get(("professional", None), [1.0, 0.0, 0.0]) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_expired_responses_are_not_served():
+    cache = SemanticResponseCache(ttl_seconds=0.01)
+    cache.set("key", [0.0, 1.0], "answer")
+    time.sleep(0.02)
+    assert cache.get("key", [0.0, 1.0]) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = SemanticResponseCache(max_size=2)
+    cache.set("key", [1.0, 0.0, 0.0], "a")
+    cache.set("key", [0.0, 1.0, 0.0], "b")
+    assert cache.get("key", [1.0, 0.0, 0.0]) == "a"
+    cache.set("key", [0.0, 0.0, 1.0], "c")
+
+    assert cache.get("key", [0.0, 1.0, 0.0]) is None
+    assert cache.get("key", [1.0, 0.0, 0.0]) == "a"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disabled_cache_stores_nothing():
+    cache = SemanticResponseCache(max_size=0)
+    cache.set("key", [1.0], "answer")
+    assert cache.get("key", [1.0]) is None
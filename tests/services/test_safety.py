@@ -0,0 +1,13 @@
+from app.services.safety import check_message, is_flagged
+
+
+def test_crisis_messages_are_flagged():
+    assert check_message("Sometimes I think about ending my life") == {"self_harm"}
+    assert "self_harm" in check_message("I've been self-harming again")
+    assert "abuse" in check_message("My partner hits me when he is angry")
+    assert is_flagged("I want to die")
+
+
+def test_everyday_messages_pass():
+    assert not is_flagged("I feel anxious before exams, any tips?")
+    assert not is_flagged("How can I sleep better?")
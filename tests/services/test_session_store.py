@@ -0,0 +1,38 @@
+import pytest
+from app.services.session_store import InMemorySessionStore, SQLiteSessionStore, SessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemorySessionStore(ttl_seconds=60, max_sessions=2)
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=60)
+
+
+def test_append_and_get_history(store):
+    """
+    Turns are returned in the order they were appended.
+    """
+    assert store.get_history("abc") is None
+    store.append("abc", [{"role": "user", "text": "hi"}, {"role": "model", "text": "hello"}])
+    store.append("abc", [{"role": "user", "text": "how are you?"}])
+    assert [t["text"] for t in store.get_history("abc")] == ["hi", "hello", "how are you?"]
+    store.delete("abc")
+    assert store.get_history("abc") is None
+
+
+def test_in_memory_store_evicts_least_recent_session():
+    store = InMemorySessionStore(ttl_seconds=60, max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        store.append(session_id, [{"role": "user", "text": session_id}])
+    assert store.get_history("a") is None
+    assert store.get_history("c") is not None
+
+
+def test_incomplete_backend_cannot_be_created():
+    class AppendOnlyStore(SessionStore):
+        def append(self, session_id, turns):
+            pass
+
+    with pytest.raises(TypeError):
+        AppendOnlyStore()
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from app.services.vector_store import LocalVectorStore, PartitionedVectorStore, VectorStore
+
+
+def _vectors(n: int, dimension: int = 8, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    return [
+        {"id": f"v{i}", "values": rng.normal(size=dimension).tolist(), "metadata": {"text": f"doc {i}", "source": "test"}}
+        for i in range(n)
+    ]
+
+
+def test_incomplete_backend_cannot_be_created():
+    """
+    A backend missing one of the abstract methods fails at construction, not on first use.
+    """
+    class QueryOnlyStore(VectorStore):
+        def query(self, vector, top_k=5, filter=None):
+            return []
+
+    with pytest.raises(TypeError):
+        QueryOnlyStore()
+
+
+def test_local_store_returns_exact_match_first(tmp_path):
+    """
+    A stored vector should be its own nearest neighbour.
+    """
+    store = LocalVectorStore(str(tmp_path), dimension=8)
+    vectors = _vectors(20)
+    store.upsert(vectors)
+    matches = store.query(vectors[7]["values"], top_k=3)
+    assert matches[0]["id"] == "v7"
+    assert matches[0]["metadata"]["text"] == "doc 7"
+    assert len(matches) == 3
+
+
+def test_local_store_persists_and_memory_maps(tmp_path):
+    """
+    Flushed indexes reload from disk memory-mapped, with upserts and deletes applied.
+    """
+    store = LocalVectorStore(str(tmp_path), dimension=8)
+    vectors = _vectors(10)
+    store.upsert(vectors)
+    store.delete(["v3"])
+    store.flush()
+
+    reloaded = LocalVectorStore(str(tmp_path), dimension=8)
+    assert len(reloaded) == 9
+    assert isinstance(reloaded._matrix, np.memmap)
+    assert "v3" not in [m["id"] for m in reloaded.query(vectors[3]["values"], top_k=9)]
+
+
+def test_local_store_ivf_search(tmp_path):
+    """
+    With IVF enabled and every cluster probed, results match exact search.
+    """
+    vectors = _vectors(200)
+    exact = LocalVectorStore(str(tmp_path / "exact"), dimension=8)
+    ivf = LocalVectorStore(str(tmp_path / "ivf"), dimension=8, nlist=4, nprobe=4)
+    for store in (exact, ivf):
+        store.upsert(vectors)
+        store.flush()
+    assert ivf._ivf is not None
+    query = vectors[42]["values"]
+    assert [m["id"] for m in ivf.query(query, top_k=5)] == [m["id"] for m in exact.query(query, top_k=5)]
+
+
+def _typed_vectors(n: int) -> list:
+    vectors = _vectors(n)
+    for i, vector in enumerate(vectors):
+        vector["metadata"] |= {"type": ("pdf", "web", "hf")[i % 3], "source": f"s{i % 2}"}
+    return vectors
+
+
+def test_local_store_filters_on_metadata(tmp_path):
+    """
+    Filtered queries only return rows whose metadata matches.
+    """
+    store = LocalVectorStore(str(tmp_path), dimension=8)
+    vectors = _typed_vectors(30)
+    store.upsert(vectors)
+    matches = store.query(vectors[4]["values"], top_k=30, filter={"source": ["s1"]})
+    assert len(matches) == 15
+    assert all(m["metadata"]["source"] == "s1" for m in matches)
+    assert store.query(vectors[4]["values"], top_k=5, filter={"source": ["missing"]}) == []
+
+
+def test_partitioned_store_routes_and_searches_partitions(tmp_path):
+    """
+    Vectors land in their type's partition; 'type' filters select partitions
+    and each partition can be cleared on its own.
+    """
+    store = PartitionedVectorStore(lambda name: LocalVectorStore(str(tmp_path / name), dimension=8))
+    vectors = _typed_vectors(30)
+    store.upsert(vectors)
+    store.flush()
+    assert store.partitions() == ["hf", "pdf", "web"]
+    assert len(store.partition("pdf")) == 10
+
+    query = vectors[3]["values"]  # a 'pdf' vector
+    assert store.query(query, top_k=1)[0]["id"] == "v3"
+    web = store.query(query, top_k=5, filter={"type": ["web"], "source": ["s0"]})
+    assert len(web) == 5
+    assert all(m["metadata"]["type"] == "web" and m["metadata"]["source"] == "s0" for m in web)
+
+    store.clear("pdf")
+    assert len(store.partition("pdf")) == 0
+    assert len(store.partition("web")) == 10
+    assert "v3" not in [m["id"] for m in store.query(query, top_k=30)]